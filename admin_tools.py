@@ -0,0 +1,329 @@
+"""`users` ও `withdrawals` কালেকশনের স্ট্রিমিং এক্সপোর্ট ও বাল্ক ইমপোর্ট।
+
+    python admin_tools.py export withdrawals -o out.csv --status pending --method Bkash \\
+        --since 2026-01-01 --until 2026-01-31 --checkpoint out.ckpt
+    python admin_tools.py export users -o users.ndjson
+    python admin_tools.py import users users.ndjson
+
+এক্সপোর্ট cursor দিয়ে পাতা ধরে পড়ে এবং প্রতিটি পাতা সাথে সাথে ফাইলে লেখে,
+তাই কালেকশন যত বড়ই হোক মেমরিতে একবারে শুধু এক পাতা থাকে। `--checkpoint`
+দিলে প্রতিটি পাতার পরে cursor ও ফাইলের অবস্থান (byte offset) লেখা হয়; মাঝপথে
+থেমে গেলে একই কমান্ড আবার চালালে সেখান থেকেই চলে, কোনো সারি দুবার আসে না।
+
+ফরম্যাট ফাইলের এক্সটেনশন থেকে (`.csv`, বাকি সব NDJSON)। NDJSON হুবহু পুরো
+ডকুমেন্ট রাখে; CSV শুধু `EXPORTS` এর কলামগুলো, স্প্রেডশিটের জন্য। সময়
+(timestamp) ISO-8601 UTC হিসেবে লেখা হয় এবং ইমপোর্টে আবার ব্যাকএন্ডের সময়ে
+ফেরত যায়। তারিখ ফিল্টার শুধু withdrawals এ (`timestamp` অনুযায়ী); শুধু
+তারিখ দিলে DAY_TIMEZONE এর দিন ধরা হয় এবং `--until` সেই দিনসহ।
+
+ইমপোর্ট batched write এ লেখে (প্রতি commit-এ সর্বোচ্চ ৫০০টি)। প্রতিটি সারিতে
+`id` লাগবে। NDJSON এর সারি পুরো ডকুমেন্ট, আগেরটি থাকলে প্রতিস্থাপিত হয়; CSV
+এর সারি শুধু তার কলামগুলো আপডেট করে (নতুন ইউজার হলে বাকি ফিল্ড ডিফল্ট)।
+
+Environment ভেরিয়েবল:
+    EXPORT_PAGE_SIZE  প্রতি পাতায় কতটি ডকুমেন্ট পড়া হবে (ডিফল্ট: 500)
+"""
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from rewards import new_user_profile
+from rollover import DAY_TIMEZONE
+from storage import BATCH_LIMIT
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 500))
+
+EXPORTS = {
+    'users': {
+        'order_by': None,
+        'columns': ('id', 'username', 'balance', 'gems', 'unclaimedGems', 'refs', 'refsL2', 'refsL3', 'adWatch',
+                    'totalWithdrawn', 'referredBy', 'joinedTelegram'),
+        'filters': (),
+        'times': (),
+    },
+    'withdrawals': {
+        'order_by': 'timestamp',
+        'columns': ('id', 'userId', 'amount', 'method', 'account', 'requiredGems', 'status', 'timestamp',
+                    'processedAt', 'processedBy', 'rejectReason'),
+        'filters': ('status', 'method', 'userId'),
+        'times': ('timestamp', 'processedAt'),
+    },
+}
+# CSV থেকে ইমপোর্টের সময় এগুলো লেখা হিসেবেই থাকে (যেমন সংখ্যার মতো দেখতে username)
+TEXT_COLUMNS = {'id', 'username', 'userId', 'referredBy', 'method', 'account', 'status', 'rejectReason'}
+
+
+def parse_time(text, end=False):
+    """'2026-01-31' বা ISO-8601 সময় থেকে timezone সহ datetime; end=True হলে শুধু তারিখে পরের দিনের শুরু।"""
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=DAY_TIMEZONE)
+    if end and len(text) == 10:
+        value += timedelta(days=1)
+    return value
+
+
+def parse_filters(items, collection):
+    """`['status=pending', 'since=2026-01-01']` থেকে ফিল্টার ডিকশনারি (বট কমান্ডের জন্য)।"""
+    filters = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep or key not in EXPORTS[collection]['filters'] + (('since', 'until') if EXPORTS[collection]['times'] else ()):
+            raise ValueError(f"Unknown filter for {collection}: {item}")
+        filters[key] = value
+    return filters
+
+
+def _epoch(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return value
+
+
+def _iso(value):
+    epoch = _epoch(value)
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat() if epoch is not None else None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_pages(storage, collection, filters=None, cursor=None, page_size=EXPORT_PAGE_SIZE):
+    """ফিল্টার মেলা ডকুমেন্টগুলো পাতা ধরে দেয়: `(rows, last_id)`; last_id পরের বারের cursor।"""
+    spec, filters = EXPORTS[collection], dict(filters or {})
+    equals = {key: filters[key] for key in spec['filters'] if filters.get(key) not in (None, '')}
+    since = parse_time(filters['since']) if filters.get('since') else None
+    until = _epoch(parse_time(filters['until'], end=True)) if filters.get('until') else None
+    while True:
+        rows, next_cursor = storage.page_documents(collection, equals, spec['order_by'], page_size, cursor, start=since)
+        if not rows:
+            return
+        cursor = rows[-1][0]
+        if until is not None:
+            # timestamp অনুযায়ী সাজানো, তাই সীমা পার হলেই শেষ
+            kept = [(doc_id, data) for doc_id, data in rows if (_epoch(data.get('timestamp')) or 0) < until]
+            if len(kept) < len(rows):
+                if kept:
+                    yield kept, kept[-1][0]
+                return
+        yield rows, cursor
+        if next_cursor is None:
+            return
+
+
+# --- ফাইল ফরম্যাট ---
+def file_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def _export_row(collection, doc_id, data):
+    row = {'id': doc_id, **data}
+    for field in EXPORTS[collection]['times']:
+        if row.get(field) is not None:
+            row[field] = _iso(row[field])
+    return row
+
+
+def _write_rows(handle, fmt, collection, rows, header):
+    if fmt == 'csv':
+        writer = csv.DictWriter(handle, EXPORTS[collection]['columns'], extrasaction='ignore')
+        if header:
+            writer.writeheader()
+        for doc_id, data in rows:
+            row = _export_row(collection, doc_id, data)
+            writer.writerow({key: json.dumps(value, default=_json_default) if isinstance(value, (dict, list)) else value
+                             for key, value in row.items()})
+    else:
+        for doc_id, data in rows:
+            handle.write(json.dumps(_export_row(collection, doc_id, data), ensure_ascii=False, default=_json_default))
+            handle.write('\n')
+
+
+def _read_rows(handle, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(handle):
+            yield {key: _parse_cell(key, value) for key, value in row.items()}
+    else:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_cell(key, value):
+    if value == '':
+        return None
+    if key in TEXT_COLUMNS:
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+# --- চেকপয়েন্ট ---
+def _load_checkpoint(path, state):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        saved = json.load(f)
+    if any(saved.get(key) != state[key] for key in ('collection', 'format', 'filters', 'output')):
+        raise ValueError(f"Checkpoint {path} belongs to a different export")
+    return saved
+
+
+def _save_checkpoint(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# --- এক্সপোর্ট ও ইমপোর্ট ---
+def export_collection(storage, collection, output, filters=None, checkpoint=None, page_size=EXPORT_PAGE_SIZE):
+    """কালেকশন output ফাইলে স্ট্রিম করে; রিপোর্ট (rows, pages, perSec ...) ফেরত দেয়।"""
+    started = time.perf_counter()
+    state = {'collection': collection, 'format': file_format(output), 'filters': dict(filters or {}),
+             'output': os.path.abspath(output), 'cursor': None, 'offset': 0, 'rows': 0, 'done': False}
+    saved = _load_checkpoint(checkpoint, state)
+    report = {'collection': collection, 'output': output, 'rows': 0, 'pages': 0, 'resumed': saved is not None}
+    if saved is not None and saved['done']:
+        report.update(rows=saved['rows'], elapsedSec=0.0, perSec=0.0)
+        return report
+    if saved is not None:
+        state = saved
+        handle = open(output, 'r+', encoding='utf-8', newline='')
+        # চেকপয়েন্টের পরে লেখা আধা পাতা বাদ
+        handle.seek(state['offset'])
+        handle.truncate()
+    else:
+        handle = open(output, 'w', encoding='utf-8', newline='')
+    with handle:
+        for rows, last_id in iter_pages(storage, collection, state['filters'], state['cursor'], page_size):
+            _write_rows(handle, state['format'], collection, rows, header=state['offset'] == 0 and state['rows'] == 0)
+            handle.flush()
+            state.update(cursor=last_id, offset=handle.tell(), rows=state['rows'] + len(rows))
+            report['rows'] += len(rows)
+            report['pages'] += 1
+            if checkpoint:
+                _save_checkpoint(checkpoint, state)
+        if state['rows'] == 0 and state['format'] == 'csv':
+            _write_rows(handle, 'csv', collection, [], header=True)
+    state['done'] = True
+    if checkpoint:
+        _save_checkpoint(checkpoint, state)
+    elapsed = time.perf_counter() - started
+    report['totalRows'] = state['rows']
+    report['elapsedSec'] = round(elapsed, 3)
+    report['perSec'] = round(report['rows'] / elapsed, 1) if elapsed else 0.0
+    logging.info(f"Export finished: {report}")
+    return report
+
+
+def _storage_time(storage, value):
+    # Firestore সময় datetime হিসেবে রাখে, sqlite epoch সেকেন্ড হিসেবে
+    epoch = _epoch(value)
+    if epoch is None or storage.name != 'firestore':
+        return epoch
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def import_collection(storage, collection, path, on_write=None, batch_size=BATCH_LIMIT, dry_run=False):
+    """ফাইলের সারিগুলো batched write এ লেখে; dry_run হলে শুধু পড়ে ও যাচাই করে।"""
+    started = time.perf_counter()
+    report = {'collection': collection, 'input': path, 'rows': 0, 'commits': 0, 'skipped': 0, 'dryRun': dry_run}
+    times = EXPORTS[collection]['times']
+    partial = file_format(path) == 'csv'
+    chunk = []
+
+    def flush():
+        if partial:
+            # CSV এ কিছু কলাম থাকে না - আগের ডকুমেন্ট থাকলে update, নতুন হলে ডিফল্ট সহ set
+            existing = storage.get_documents(collection, [doc_id for _, _, doc_id, _ in chunk])
+            for index, (_, _, doc_id, data) in enumerate(chunk):
+                if doc_id in existing:
+                    chunk[index] = ('update', collection, doc_id, data)
+                elif collection == 'users':
+                    chunk[index] = ('set', collection, doc_id, {**new_user_profile(data.get('username')), **data})
+        if not dry_run:
+            report['commits'] += storage.commit_batch(chunk)
+            if on_write is not None:
+                for _, _, doc_id, _ in chunk:
+                    on_write(doc_id)
+        report['rows'] += len(chunk)
+        chunk.clear()
+
+    with open(path, encoding='utf-8', newline='') as handle:
+        for row in _read_rows(handle, file_format(path)):
+            doc_id = row.pop('id', None)
+            if doc_id in (None, ''):
+                report['skipped'] += 1
+                continue
+            data = {key: value for key, value in row.items() if value is not None}
+            for field in times:
+                if field in data:
+                    data[field] = _storage_time(storage, data[field])
+            chunk.append(('set', collection, str(doc_id), data))
+            if len(chunk) >= batch_size:
+                flush()
+    if chunk:
+        flush()
+    elapsed = time.perf_counter() - started
+    report['elapsedSec'] = round(elapsed, 3)
+    report['perSec'] = round(report['rows'] / elapsed, 1) if elapsed else 0.0
+    logging.info(f"Import finished: {report}")
+    return report
+
+
+def format_report(report):
+    if 'input' in report:
+        verb = "Checked" if report['dryRun'] else "Imported"
+        return (f"✅ {verb} {report['rows']} {report['collection']} in {report['elapsedSec']}s - "
+                f"{report['perSec']} rows/s, {report['commits']} commits, {report['skipped']} skipped.")
+    resumed = " (resumed)" if report['resumed'] else ""
+    return (f"✅ Exported {report['rows']} {report['collection']}{resumed} in {report['elapsedSec']}s - "
+            f"{report['perSec']} rows/s, {report['pages']} pages.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="কালেকশন CSV/NDJSON ফাইলে")
+    export.add_argument('collection', choices=sorted(EXPORTS))
+    export.add_argument('-o', '--output', required=True)
+    export.add_argument('--status')
+    export.add_argument('--method')
+    export.add_argument('--user-id', dest='userId')
+    export.add_argument('--since', help="YYYY-MM-DD বা ISO-8601")
+    export.add_argument('--until', help="YYYY-MM-DD (দিনসহ) বা ISO-8601")
+    export.add_argument('--checkpoint', help="এই ফাইল থাকলে সেখান থেকে আবার শুরু")
+    export.add_argument('--page-size', type=int, default=EXPORT_PAGE_SIZE)
+    imports = commands.add_parser('import', help="CSV/NDJSON ফাইল থেকে batched write")
+    imports.add_argument('collection', choices=sorted(EXPORTS))
+    imports.add_argument('input')
+    imports.add_argument('--batch-size', type=int, default=BATCH_LIMIT)
+    imports.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    from services import storage  # Firebase/SQLite সংযোগ শুধু CLI চালালে
+    if args.command == 'export':
+        filters = {key: getattr(args, key) for key in ('status', 'method', 'userId', 'since', 'until')
+                   if getattr(args, key)}
+        parse_filters([f"{key}={value}" for key, value in filters.items()], args.collection)
+        report = export_collection(storage, args.collection, args.output, filters, args.checkpoint, args.page_size)
+    else:
+        report = import_collection(storage, args.collection, args.input, batch_size=min(args.batch_size, BATCH_LIMIT),
+                                   dry_run=args.dry_run)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
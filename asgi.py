@@ -0,0 +1,386 @@
+"""একই /api/* কন্ট্র্যাক্টের async (ASGI) সংস্করণ।
+
+Flask-এর sync worker প্রতিটি Firestore round-trip (ট্রানজ্যাকশন retry সহ)
+শেষ না হওয়া পর্যন্ত আটকে থাকে। এখানে Quart + async Firestore client
+ব্যবহার করা হয়েছে, তাই একটি প্রসেসেই শত শত রিকোয়েস্ট একসাথে চলতে পারে।
+
+চালানোর নিয়ম:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+STORAGE_BACKEND=firestore এ async Firestore ক্লায়েন্ট সরাসরি ব্যবহার হয়। অন্য
+ব্যাকএন্ডে (sqlite, বেঞ্চমার্কের নকল Firestore) claim/withdrawal server.py এর
+একই sync কোড আলাদা থ্রেডে চালায়। ক্যাশ, shard overlay ও rate limiter sync
+(SQLite হতে পারে), তাই সেগুলোও থ্রেডে চলে - event loop আটকায় না। স্ট্যাটিক
+ফাইল এবং বট আগের মতোই server.py থেকে চলে। তুলনার জন্য
+benchmarks/compare_wsgi_asgi.py দেখুন।
+"""
+import asyncio
+import logging
+
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+from firebase_admin import firestore_async
+from google.cloud.firestore import Increment, SERVER_TIMESTAMP, async_transactional
+
+# server.py ইমপোর্ট করলে Firebase ইনিশিয়ালাইজেশন, ক্যাশ, লিডারবোর্ড এবং কাউন্টার একই থাকে
+import server
+from server import FRONTEND_URL, BOARDS, user_cache, leaderboards, referral_counters, telegram_auth, idempotency, \
+    ledger, compact_ledger, rate_limiter, credit_task, is_channel_member, TELEGRAM_CHANNEL, load_or_create_user, \
+    referral_page, bootstrap_payload, public_leaderboard, history_params, json_etag, metrics_authorized, METRICS_TOKEN
+from idempotency import valid_key
+from auth import AuthError, AUTH_REQUIRED
+import metrics
+from metrics import track_firestore, track_transaction
+from rollover import effective
+from services import db, init_firebase
+from storage import UserNotFound
+from rewards import plan_gem_claim, plan_withdrawal, required_gems_for, parse_amount, plan_ad_watch, plan_join_telegram
+
+# services.py এর db অলস (lazy); async ক্লায়েন্টের আগে Firebase অ্যাপটি চালু করতে হয়
+if db is not None:
+    init_firebase()
+adb = firestore_async.client() if db is not None else None
+
+app = cors(Quart(__name__), allow_origin=FRONTEND_URL or "*", expose_headers=["ETag", "X-Session-Token", "Idempotent-Replayed"])
+
+
+def get_user_ref(user_id):
+    return adb.collection('users').document(str(user_id))
+
+
+def as_update(increments, values=None):
+    update = {field: Increment(value) for field, value in increments.items()}
+    update.update(values or {})
+    return update
+
+
+def set_ledger_event(transaction, user_id, user, increments, kind, ref=None):
+    """লেজার ইভেন্ট ট্রানজ্যাকশনে যোগ করে; `(increments, snapshot নেওয়ার সময় হয়েছে কিনা)` ফেরত দেয়।"""
+    change = {'increments': increments}
+    due = ledger.attach(user_id, user, change, kind, ref)
+    for collection, event_id, event in change['records']:
+        transaction.set(adb.collection(collection).document(event_id), {**event, 'timestamp': SERVER_TIMESTAMP})
+    return change['increments'], due
+
+
+def authenticated_user_id(data):
+    if not AUTH_REQUIRED:
+        return data.get('user_id')
+    user_id, token = telegram_auth.authenticate(request.headers.get('Authorization'), data.get('user_data'))
+    if token:
+        g.session_token = token
+    return user_id
+
+
+@app.errorhandler(AuthError)
+async def handle_auth_error(e):
+    return jsonify({"error": str(e)}), 401
+
+
+@app.before_request
+async def start_request_metrics():
+    metrics.begin_request()
+
+
+@app.after_request
+async def attach_session_token(response):
+    token = g.pop('session_token', None)
+    if token:
+        response.headers['X-Session-Token'] = token
+    return response
+
+
+@app.after_request
+async def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.end_request(route, request.method, response.status_code)
+    return response
+
+
+async def rate_limited(scope, user_id):
+    # server.rate_limited এর মতো; প্রক্সি X-Forwarded-For এর শেষে আসল IP যোগ করে
+    ip = request.access_route[-1] if request.access_route else request.remote_addr
+    retry_after = await asyncio.to_thread(rate_limiter.check, scope, user_id, ip)
+    if retry_after is None:
+        return None
+    return jsonify({"error": f"Too many requests. Try again in {retry_after}s."}), 429, {'Retry-After': str(retry_after)}
+
+
+async def idempotent(scope, compute):
+    key = request.headers.get('Idempotency-Key')
+    if key is not None and not valid_key(key):
+        return jsonify({"error": "Invalid Idempotency-Key"}), 400
+    payload, status, replayed = await idempotency.run_async(f"{scope}:{key}" if key else None, lambda: compute(key))
+    response = jsonify(payload)
+    response.status_code = status
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+async def get_user_data(user_id):
+    if adb is None:
+        return await asyncio.to_thread(server.get_user_data, user_id)
+    cached = await asyncio.to_thread(user_cache.get, user_id)
+    if cached is not None:
+        return cached
+    with track_firestore('read'):
+        user_doc = await get_user_ref(user_id).get()
+    if not user_doc.exists:
+        return None
+    user_data = user_doc.to_dict()
+    await asyncio.to_thread(user_cache.set, user_id, user_data)
+    return user_data
+
+
+@app.route("/api/user", methods=['POST'])
+async def get_or_create_user():
+    data = await request.get_json()
+    user_id = authenticated_user_id(data)
+    username = data.get('username', 'N/A')
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    try:
+        user_data = await get_user_data(user_id)
+        if user_data is not None:
+            return jsonify(effective(await asyncio.to_thread(referral_counters.overlay, user_id, user_data))), 200
+        # নতুন ইউজার server.py এর মতোই create_new_user দিয়ে (create-if-absent ও রেফারেল ইনডেক্স)
+        user_data, created = await asyncio.to_thread(load_or_create_user, user_id, username)
+        return jsonify(user_data), 201 if created else 200
+    except Exception as e:
+        logging.error(f"API Error on /api/user: {e}")
+        return jsonify({"error": "Server error"}), 500
+
+
+@app.route("/api/bootstrap", methods=['POST'])
+async def bootstrap():
+    data = await request.get_json()
+    user_id = authenticated_user_id(data)
+    username = data.get('username', 'N/A')
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    try:
+        # server.py এর মতোই payload ও ETag; ইউজার তৈরি ও লিডারবোর্ড ক্যাশ sync, তাই আলাদা থ্রেডে
+        payload, created = await asyncio.to_thread(bootstrap_payload, user_id, username)
+        body, etag = json_etag(payload)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response('', status=304, headers=headers)
+        return Response(body, status=201 if created else 200, mimetype='application/json', headers=headers)
+    except Exception as e:
+        logging.error(f"API Error on /api/bootstrap: {e}")
+        return jsonify({"error": "Server error"}), 500
+
+
+@app.route("/api/claim-gems", methods=['POST'])
+async def claim_gems():
+    user_id = authenticated_user_id(await request.get_json())
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    limited = await rate_limited('claim-gems', user_id)
+    if limited: return limited
+    if adb is None:
+        return await idempotent(f"claim-gems:{user_id}", lambda key: asyncio.to_thread(server.claim_gems_for, user_id))
+
+    @async_transactional
+    @track_transaction('claim_gems')
+    async def update_gems_transaction(transaction, doc_ref):
+        with track_firestore('read'):
+            snapshot = await doc_ref.get(transaction=transaction)
+        # ইউজার ডকুমেন্ট না থাকলে storage.py এর মতো UserNotFound (404)
+        if not snapshot.exists:
+            raise UserNotFound(user_id)
+        folded = await referral_counters.fold_async(transaction, doc_ref)
+        user = snapshot.to_dict()
+        result, increments, values = plan_gem_claim(user, folded)
+        if increments is not None:
+            with track_firestore('write', count=2):
+                increments, result["ledgerDue"] = set_ledger_event(transaction, user_id, user, increments, 'claim')
+                transaction.update(doc_ref, as_update(increments, values))
+            result["username"] = user.get('username')
+        return result
+
+    async def claim(key):
+        try:
+            with track_firestore('transaction'):
+                result = await update_gems_transaction(adb.transaction(), get_user_ref(user_id))
+            await asyncio.to_thread(user_cache.invalidate, user_id)
+            if result.pop("ledgerDue", False):
+                await asyncio.to_thread(compact_ledger, user_id)
+            if result["success"]:
+                leaderboards.record('gems', user_id, result.pop("username"), result["data"]["gems"])
+            return result, 200
+        except UserNotFound:
+            return {"error": "User not found"}, 404
+        except Exception as e:
+            logging.error(f"API Error on /api/claim-gems: {e}")
+            return {"error": "Could not claim gems"}, 500
+    return await idempotent(f"claim-gems:{user_id}", claim)
+
+
+@app.route('/api/withdrawal', methods=['POST'])
+async def request_withdrawal():
+    data = await request.get_json()
+    user_id = authenticated_user_id(data)
+    amount = parse_amount(data.get('amount'))
+    method = data.get('method')
+    if not all([user_id, method, data.get('account')]) or data.get('amount') is None:
+        return jsonify({'error': 'Missing fields'}), 400
+    if amount is None: return jsonify({'error': 'Invalid amount'}), 400
+    required_gems = required_gems_for(method, amount)
+    if required_gems is None: return jsonify({'error': 'Unknown payment method'}), 400
+    limited = await rate_limited('withdrawal', user_id)
+    if limited: return limited
+    if adb is None:
+        return await idempotent(f"withdrawal:{user_id}", lambda key: asyncio.to_thread(
+            server.withdraw_for, user_id, amount, method, data.get('account'), required_gems, key))
+
+    @async_transactional
+    @track_transaction('withdrawal')
+    async def withdrawal_transaction(transaction, doc_ref, record_ref):
+        # সব রিড আগে: কী দিয়ে লেখা withdrawal আগে থেকেই থাকলে এটি ডুপ্লিকেট
+        with track_firestore('read'):
+            existing = await record_ref.get(transaction=transaction)
+        if existing.exists:
+            return {"success": True, "message": "Withdrawal request already submitted."}
+        with track_firestore('read'):
+            snapshot = await doc_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            raise UserNotFound(user_id)
+        folded = await referral_counters.fold_async(transaction, doc_ref)
+        user = snapshot.to_dict()
+        result, increments = plan_withdrawal(user, amount, required_gems, folded)
+        if increments is None:
+            return result
+        with track_firestore('write', count=3):
+            increments, result["ledgerDue"] = set_ledger_event(transaction, user_id, user, increments,
+                                                               'withdrawal', ref=record_ref.id)
+            transaction.update(doc_ref, as_update(increments))
+            transaction.set(record_ref, {
+                'userId': user_id, 'amount': amount, 'method': method, 'requiredGems': int(required_gems),
+                'account': data.get('account'), 'status': 'pending', 'timestamp': SERVER_TIMESTAMP
+            })
+        result["username"] = user.get('username')
+        return result
+
+    async def withdraw(key):
+        try:
+            withdrawals = adb.collection('withdrawals')
+            record_ref = withdrawals.document(f"{user_id}_{key}") if key else withdrawals.document()
+            with track_firestore('transaction'):
+                result = await withdrawal_transaction(adb.transaction(), get_user_ref(user_id), record_ref)
+            await asyncio.to_thread(user_cache.invalidate, user_id)
+            if result.pop("ledgerDue", False):
+                await asyncio.to_thread(compact_ledger, user_id)
+            if "username" in result:
+                leaderboards.record('gems', user_id, result.pop("username"), result["data"]["gems"])
+            return result, 200
+        except UserNotFound:
+            return {'error': 'User not found'}, 404
+        except Exception as e:
+            logging.error(f"API Error on /api/withdrawal: {e}")
+            return {'error': 'Server error during withdrawal'}, 500
+    return await idempotent(f"withdrawal:{user_id}", withdraw)
+
+
+@app.route("/api/watch-ad", methods=['POST'])
+async def watch_ad():
+    user_id = authenticated_user_id(await request.get_json())
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    limited = await rate_limited('watch-ad', user_id)
+    if limited: return limited
+
+    async def watch(key):
+        return await asyncio.to_thread(credit_task, user_id, plan_ad_watch, 'watch_ad', 'ad_reward')
+    return await idempotent(f"watch-ad:{user_id}", watch)
+
+
+@app.route("/api/join-telegram", methods=['POST'])
+async def join_telegram():
+    user_id = authenticated_user_id(await request.get_json())
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    if not TELEGRAM_CHANNEL: return jsonify({"error": "Task not available"}), 404
+    limited = await rate_limited('join-telegram', user_id)
+    if limited: return limited
+
+    async def join(key):
+        try:
+            if not await asyncio.to_thread(is_channel_member, user_id):
+                return {"success": False, "message": "Please join the channel first."}, 200
+        except Exception as e:
+            logging.error(f"Channel membership check failed for {user_id}: {e}")
+            return {"error": "Could not verify channel membership"}, 502
+        return await asyncio.to_thread(credit_task, user_id, plan_join_telegram, 'join_telegram', 'task_reward')
+    return await idempotent(f"join-telegram:{user_id}", join)
+
+
+@app.route("/api/history", methods=['POST'])
+async def get_history():
+    data = await request.get_json()
+    user_id = authenticated_user_id(data)
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    params = history_params(data)
+    if params is None: return jsonify({"error": "Invalid limit or cursor"}), 400
+    try:
+        events, next_cursor = await asyncio.to_thread(ledger.history, user_id, *params)
+        return jsonify({"events": events, "nextCursor": next_cursor}), 200
+    except Exception as e:
+        logging.error(f"API Error on /api/history: {e}")
+        return jsonify({"error": "Could not fetch history"}), 500
+
+
+@app.route("/api/referrals", methods=['POST'])
+async def get_referrals():
+    data = await request.get_json()
+    user_id = authenticated_user_id(data)
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    try:
+        return jsonify(await asyncio.to_thread(referral_page, user_id, data)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"API Error on /api/referrals: {e}")
+        return jsonify({"error": "Could not fetch referrals"}), 500
+
+
+@app.route("/api/leaderboard", methods=['GET'])
+async def get_leaderboard():
+    board = request.args.get('board', 'withdrawn')
+    if board not in BOARDS: return jsonify({"error": "Unknown leaderboard"}), 400
+    try:
+        if adb is None:
+            return jsonify(public_leaderboard(await asyncio.to_thread(server.get_cached_leaderboard, board), board)), 200
+        with track_firestore('read'):
+            doc = await adb.collection('leaderboard').document(BOARDS[board]['doc']).get()
+        return jsonify(public_leaderboard(doc.to_dict() if doc.exists else {"players": []}, board)), 200
+    except Exception as e:
+        logging.error(f"API Error on /api/leaderboard: {e}")
+        return jsonify({"error": "Could not fetch leaderboard"}), 500
+
+
+@app.route("/api/cache/stats", methods=['GET'])
+async def get_cache_stats():
+    if not METRICS_TOKEN: return jsonify({"error": "Not found"}), 404
+    if not metrics_authorized(request.headers.get('Authorization')): return jsonify({"error": "Forbidden"}), 403
+    return jsonify(await asyncio.to_thread(user_cache.stats)), 200
+
+
+@app.route("/metrics", methods=['GET'])
+async def get_metrics():
+    if not metrics_authorized(request.headers.get('Authorization')): return jsonify({"error": "Forbidden"}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+# --- লিডারবোর্ড flush (sync Firestore ব্যবহার করে, তাই আলাদা থ্রেডে) ---
+async def flush_leaderboards_periodically():
+    while True:
+        await asyncio.sleep(leaderboards.flush_interval)
+        await asyncio.to_thread(leaderboards.flush)
+
+
+@app.before_serving
+async def start_background_tasks():
+    app.config['LEADERBOARD_FLUSH_TASK'] = asyncio.create_task(flush_leaderboards_periodically())
+
+
+@app.after_serving
+async def flush_on_shutdown():
+    app.config['LEADERBOARD_FLUSH_TASK'].cancel()
+    await asyncio.to_thread(leaderboards.flush)
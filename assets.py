@@ -0,0 +1,94 @@
+"""স্ট্যাটিক অ্যাসেট পাইপলাইন।
+
+স্টার্টআপে (অথবা `python assets.py` দিয়ে) `static/` এর JS/CSS থেকে তৈরি হয়:
+*   কন্টেন্ট-হ্যাশ সহ ফাইল (`main.3f9a1c2b7d.js`), যা `Cache-Control: immutable`
+    দিয়ে সার্ভ করা যায় - কন্টেন্ট বদলালে নামও বদলায়।
+*   আগে থেকে কম্প্রেস করা `.gz` এবং (Brotli ইনস্টল থাকলে) `.br` ভ্যারিয়েন্ট।
+*   নতুন নাম বসানো `index.html`।
+
+সব আউটপুট `static/dist/` এ যায়। `ASSET_PIPELINE=off` দিলে পুরনো নিয়মে
+সরাসরি `static/` থেকে সার্ভ হয়।
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+
+try:
+    import brotli
+except ImportError:  # ঐচ্ছিক - না থাকলে শুধু gzip
+    brotli = None
+
+HASHED_ASSETS = ['main.js', 'style.css']
+DIST_DIR = 'dist'
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _write_atomic(path, data):
+    # একাধিক gunicorn worker একসাথে বিল্ড করলেও আধা-লেখা ফাইল কেউ দেখবে না
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compress_variants(path, data):
+    sizes = {'gzip': None, 'br': None}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    _write_atomic(path + '.gz', gz)
+    sizes['gzip'] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        _write_atomic(path + '.br', br)
+        sizes['br'] = len(br)
+    return sizes
+
+
+def build_assets(static_dir):
+    """static_dir/dist এ অ্যাসেট তৈরি করে; প্রতিটি ফাইলের সাইজ রিপোর্ট ফেরত দেয়।"""
+    out_dir = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest, report = {}, []
+    for name in HASHED_ASSETS:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        target = os.path.join(out_dir, hashed)
+        _write_atomic(target, data)
+        manifest[name] = f"{DIST_DIR}/{hashed}"
+        report.append({'asset': name, 'file': hashed, 'original': len(data), **_compress_variants(target, data)})
+
+    with open(os.path.join(static_dir, 'index.html'), 'rb') as f:
+        html = f.read().decode('utf-8')
+    for name, hashed in manifest.items():
+        html = re.sub(rf'(href|src)="{re.escape(name)}"', rf'\1="{hashed}"', html)
+    index_data = html.encode('utf-8')
+    _write_atomic(os.path.join(out_dir, 'index.html'), index_data)
+    report.append({'asset': 'index.html', 'file': 'index.html', 'original': len(index_data),
+                   **_compress_variants(os.path.join(out_dir, 'index.html'), index_data)})
+    _write_atomic(os.path.join(out_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode('utf-8'))
+
+    for row in report:
+        best = min(size for size in (row['gzip'], row['br'], row['original']) if size is not None)
+        row['saved'] = row['original'] - best
+        logging.info(f"Asset {row['asset']} -> {row['file']}: {row['original']} B, gzip {row['gzip']} B, "
+                     f"br {row['br'] if row['br'] is not None else 'n/a'} B, saved {row['saved']} B")
+    return report
+
+
+def pick_encoding(accept_encoding, path):
+    """Accept-Encoding অনুযায়ী সবচেয়ে ছোট যে ভ্যারিয়েন্ট আছে সেটির (encoding, path) দেয়।"""
+    accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.exists(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    rows = build_assets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    print(f"Total bytes saved per full download: {sum(r['saved'] for r in rows)}")
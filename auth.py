@@ -0,0 +1,119 @@
+"""টেলিগ্রাম Mini App initData যাচাই এবং ছোট signed session টোকেন।
+
+initData একবার HMAC দিয়ে যাচাই করা হয়, তারপর একটি টোকেন দেওয়া হয়
+(`v1.<user_id>.<expiry>.<signature>`)। পরের রিকোয়েস্টগুলোতে শুধু টোকেনের
+একটি HMAC চেক লাগে। সম্প্রতি যাচাই হওয়া initData একটি LRU তে থাকে, তাই একই
+initData আবার এলে পুরো হিসাব করতে হয় না।
+
+Environment ভেরিয়েবল:
+    AUTH_REQUIRED        0 দিলে যাচাই ছাড়াই body-র user_id মেনে নেয় (লোকাল ডেভেলপমেন্ট);
+                         ডিফল্ট 1 এ BOT_TOKEN না থাকলে অ্যাপ চালুই হয় না
+    SESSION_SECRET       টোকেন সাইন করার কী (না দিলে বট টোকেন থেকে তৈরি হয়)
+    SESSION_TTL          টোকেনের মেয়াদ সেকেন্ডে (ডিফল্ট: 3600)
+    INITDATA_MAX_AGE     initData এর auth_date কত পুরনো হতে পারে (ডিফল্ট: 86400)
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "1") == "1"
+SESSION_TTL = int(os.getenv("SESSION_TTL", 3600))
+INITDATA_MAX_AGE = int(os.getenv("INITDATA_MAX_AGE", 86400))
+VERIFIED_CACHE_SIZE = 10000
+
+
+class AuthError(Exception):
+    pass
+
+
+def _sign(key, message):
+    digest = hmac.new(key, message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b'=').decode()
+
+
+class TelegramAuth:
+    def __init__(self, bot_token, session_secret=None, session_ttl=SESSION_TTL, max_age=INITDATA_MAX_AGE,
+                 required=AUTH_REQUIRED):
+        # টোকেন ছাড়া দুটি কী-ই সবার জানা কনস্ট্যান্ট থেকে আসত, যে কেউ initData ও টোকেন বানাতে পারত
+        if required and not bot_token:
+            raise RuntimeError("BOT_TOKEN must be set when AUTH_REQUIRED=1")
+        self.bot_token = bot_token or ''
+        # টেলিগ্রামের নিয়ম: secret_key = HMAC_SHA256(key="WebAppData", msg=bot_token)
+        self._init_data_key = hmac.new(b"WebAppData", self.bot_token.encode(), hashlib.sha256).digest()
+        self._session_key = hashlib.sha256(
+            (session_secret or f"hubcoin-session:{self.bot_token}").encode()).digest()
+        self.session_ttl = session_ttl
+        self.max_age = max_age
+        self._verified = OrderedDict()  # initData -> (user dict, auth_date)
+        self._lock = threading.Lock()
+
+    def verify_init_data(self, init_data):
+        """initData যাচাই করে টেলিগ্রাম ইউজার ডিকশনারি ফেরত দেয়; ভুল হলে AuthError।"""
+        if not init_data:
+            raise AuthError("Missing Telegram init data")
+        with self._lock:
+            cached = self._verified.get(init_data)
+            if cached is not None:
+                self._verified.move_to_end(init_data)
+        if cached is None:
+            cached = self._verify_uncached(init_data)
+            with self._lock:
+                self._verified[init_data] = cached
+                while len(self._verified) > VERIFIED_CACHE_SIZE:
+                    self._verified.popitem(last=False)
+        user, auth_date = cached
+        if time.time() - auth_date > self.max_age:
+            raise AuthError("Telegram init data expired")
+        return user
+
+    def _verify_uncached(self, init_data):
+        params = dict(parse_qsl(init_data, keep_blank_values=True))
+        received_hash = params.pop('hash', '')
+        check_string = "\n".join(f"{key}={params[key]}" for key in sorted(params))
+        expected = hmac.new(self._init_data_key, check_string.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, received_hash):
+            raise AuthError("Invalid Telegram init data")
+        try:
+            user = json.loads(params['user'])
+            auth_date = int(params['auth_date'])
+        except (KeyError, ValueError):
+            raise AuthError("Malformed Telegram init data")
+        return user, auth_date
+
+    def issue_token(self, user_id, now=None):
+        expires = int((now or time.time()) + self.session_ttl)
+        payload = f"v1.{user_id}.{expires}"
+        return f"{payload}.{_sign(self._session_key, payload)}"
+
+    def verify_token(self, token):
+        """বৈধ টোকেন হলে user_id (str), নাহলে None।"""
+        try:
+            version, user_id, expires, signature = token.split('.')
+        except (AttributeError, ValueError):
+            return None
+        payload = f"{version}.{user_id}.{expires}"
+        if version != 'v1' or not hmac.compare_digest(_sign(self._session_key, payload), signature):
+            return None
+        if not expires.isdigit() or int(expires) < time.time():
+            return None
+        return user_id
+
+    def authenticate(self, authorization, init_data):
+        """`(user_id, নতুন টোকেন বা None)` ফেরত দেয়।
+
+        Bearer টোকেন বৈধ থাকলে সেটিই যথেষ্ট; না থাকলে বা মেয়াদ শেষ হলে initData
+        যাচাই করে নতুন টোকেন দেওয়া হয়।
+        """
+        if authorization and authorization.startswith('Bearer '):
+            user_id = self.verify_token(authorization[7:].strip())
+            if user_id is not None:
+                return user_id, None
+        user = self.verify_init_data(init_data)
+        user_id = str(user['id'])
+        return user_id, self.issue_token(user_id)
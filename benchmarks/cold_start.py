@@ -0,0 +1,140 @@
+"""ওয়েব ও বট entry point এর cold start মাপা।
+
+    python -m benchmarks.cold_start --runs 5 --rtt-ms 30 --json cold.json
+    python -m benchmarks.cold_start --prewarm   # WEB_PREWARM=1 সহ
+
+দুটি অংশ:
+
+*   import - নতুন প্রসেসে `import server` ও `import bot` কত সময় নেয় (runs
+    বারের median) এবং তখন কোন ভারী প্যাকেজ (flask, telegram, firebase_admin)
+    লোড হয়েছে।
+*   first request - `benchmarks.fake_app:app` দিয়ে ১টি gunicorn worker চালু
+    করে প্রসেস শুরু থেকে প্রথম রেসপন্স পর্যন্ত সময়, তারপর /api/leaderboard ও
+    /api/bootstrap এর প্রথম ও দ্বিতীয় রিকোয়েস্টের লেটেন্সি।
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+from benchmarks.common import print_table, write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('flask', 'telegram', 'firebase_admin', 'google.cloud.firestore')
+
+_IMPORT_PROBE = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, runs, env):
+    samples, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             cwd=ROOT, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            return {'module': module, 'error': out.stderr.strip().splitlines()[-1]}
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result['seconds'])
+        loaded = result['loaded']
+    return {'module': module, 'medianMs': round(statistics.median(samples) * 1000, 1),
+            'minMs': round(min(samples) * 1000, 1), 'loaded': ",".join(loaded) or "-"}
+
+
+def timed_request(req, timeout=60):
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def wait_port(port, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("gunicorn did not bind in time")
+
+
+def measure_first_request(port, env, settle):
+    base_url = f"http://127.0.0.1:{port}"
+    leaderboard = lambda: urllib.request.Request(f"{base_url}/api/leaderboard")
+    body = json.dumps({'user_id': 990000001, 'username': 'coldstart'}).encode()
+    bootstrap = lambda: urllib.request.Request(f"{base_url}/api/bootstrap", data=body,
+                                               headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', '1', '-b', f"127.0.0.1:{port}",
+                             '--log-level', 'warning', 'benchmarks.fake_app:app'], cwd=ROOT, env=env)
+    try:
+        wait_port(port, proc)
+        # gunicorn পোর্ট আগে খোলে, worker অ্যাপ ইমপোর্ট শেষ করলে রেসপন্স আসে
+        timed_request(leaderboard())
+        result = {'timeToFirstResponseMs': round((time.perf_counter() - started) * 1000, 1)}
+        proc.terminate()
+        proc.wait(timeout=30)
+
+        # দ্বিতীয়বার: worker তৈরি হওয়ার পরে (প্রি-ওয়ার্মের সময় দিয়ে) প্রথম রিকোয়েস্ট
+        proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', '1', '-b', f"127.0.0.1:{port}",
+                                 '--log-level', 'warning', 'benchmarks.fake_app:app'], cwd=ROOT, env=env)
+        wait_port(port, proc)
+        time.sleep(settle)
+        result['leaderboardFirstMs'] = timed_request(leaderboard())
+        result['leaderboardSecondMs'] = timed_request(leaderboard())
+        result['bootstrapFirstMs'] = timed_request(bootstrap())
+        result['bootstrapSecondMs'] = timed_request(bootstrap())
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8750)
+    parser.add_argument('--rtt-ms', type=float, default=30)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--settle', type=float, default=2.0, help="worker চালুর পরে প্রথম রিকোয়েস্টের আগে অপেক্ষা (সেকেন্ড)")
+    parser.add_argument('--prewarm', action='store_true', help="WEB_PREWARM=1 দিয়ে চালান")
+    parser.add_argument('--skip-server', action='store_true', help="শুধু import সময় মাপুন")
+    parser.add_argument('--json', help="ফলাফল JSON ফাইলে লিখুন")
+    args = parser.parse_args()
+
+    env = dict(os.environ, AUTH_REQUIRED='0', ASSET_PIPELINE='off', STORAGE_BACKEND='sqlite',
+               STORAGE_PATH=os.path.join(ROOT, 'hubcoin_bench_cold.sqlite3'),
+               NOTIFY_QUEUE_PATH=os.path.join(ROOT, 'hubcoin_bench_outbox.sqlite3'),
+               WEB_PREWARM='1' if args.prewarm else '0')
+    imports = [measure_import(module, args.runs, env) for module in ('config', 'services', 'server', 'bot')]
+    print_table(imports, ['module', 'medianMs', 'minMs', 'loaded', 'error'])
+
+    first = None
+    if not args.skip_server:
+        env.update({'FAKE_FIRESTORE_RTT_MS': str(args.rtt_ms), 'FAKE_FIRESTORE_JITTER_MS': str(args.jitter_ms),
+                    'FAKE_FIRESTORE_USERS': str(args.users)})
+        first = measure_first_request(args.port, env, args.settle)
+        print()
+        for key, value in first.items():
+            print(f"{key}: {value}")
+
+    if args.json:
+        config = {key: getattr(args, key) for key in ('runs', 'rtt_ms', 'jitter_ms', 'users', 'settle', 'prewarm')}
+        write_json(args.json, {'config': config, 'imports': imports, 'firstRequest': first})
+
+
+if __name__ == "__main__":
+    main()
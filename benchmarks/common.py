@@ -0,0 +1,37 @@
+"""বেঞ্চমার্ক স্ক্রিপ্টগুলোর সাধারণ হিসাব ও রিপোর্টিং।"""
+import json
+import math
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """লেটেন্সি (সেকেন্ডে) থেকে p50/p95/p99 (মিলিসেকেন্ডে) ও throughput বের করে।"""
+    values = sorted(latencies)
+    return {
+        'requests': len(values) + errors,
+        'errors': errors,
+        'elapsedSec': round(elapsed, 3),
+        'throughputRps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+        'p50Ms': round(percentile(values, 50) * 1000, 2),
+        'p95Ms': round(percentile(values, 95) * 1000, 2),
+        'p99Ms': round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def print_table(rows, columns):
+    widths = {c: max(len(c), *(len(str(r.get(c, ''))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, '')).ljust(widths[c]) for c in columns))
+
+
+def write_json(path, payload):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results written to {path}")
@@ -0,0 +1,104 @@
+"""Flask (WSGI) এবং Quart (ASGI) অ্যাপের পাশাপাশি throughput তুলনা।
+
+দুটি সার্ভার আলাদা পোর্টে চালু করে তারপর এই স্ক্রিপ্ট চালান:
+
+    export AUTH_REQUIRED=0   # বেঞ্চমার্ক initData ছাড়া শুধু user_id পাঠায়
+    gunicorn -w 4 -b 127.0.0.1:8000 server:app
+    uvicorn asgi:app --workers 1 --port 8001
+    python -m benchmarks.compare_wsgi_asgi \\
+        --target flask=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 \\
+        --concurrency 16 64 256 --requests 2000
+
+Firebase ছাড়া (নকল Firestore, একই দেরি সহ) একই তুলনা:
+
+    gunicorn -w 4 -b 127.0.0.1:8000 benchmarks.fake_app:app
+    uvicorn benchmarks.fake_asgi:app --workers 1 --port 8001
+
+প্রতিটি টার্গেট ও concurrency লেভেলের জন্য একই রিকোয়েস্ট মিক্স
+(/api/user, /api/claim-gems, /api/leaderboard) পাঠানো হয়।
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import summarize, print_table, write_json
+
+DEFAULT_MIX = "user=0.8,claim=0.15,leaderboard=0.05"
+
+
+def build_request(base_url, kind, user_id):
+    if kind == 'leaderboard':
+        return urllib.request.Request(f"{base_url}/api/leaderboard")
+    endpoint = '/api/user' if kind == 'user' else '/api/claim-gems'
+    body = json.dumps({'user_id': user_id, 'username': f"bench{user_id}"}).encode()
+    return urllib.request.Request(f"{base_url}{endpoint}", data=body, headers={'Content-Type': 'application/json'})
+
+
+def run_level(base_url, concurrency, total, mix, users, timeout):
+    kinds, weights = zip(*mix.items())
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        req = build_request(base_url, random.choices(kinds, weights)[0], random.randint(1, users))
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                resp.read()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, help="name=base_url, একাধিকবার দেওয়া যাবে")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=1000, help="কতজন আলাদা ইউজার আইডি ব্যবহার হবে")
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--json', help="ফলাফল JSON ফাইলে লিখুন")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    rows = []
+    for target in args.target:
+        name, base_url = target.split('=', 1)
+        for concurrency in args.concurrency:
+            result = run_level(base_url.rstrip('/'), concurrency, args.requests, mix, args.users, args.timeout)
+            rows.append({'target': name, 'concurrency': concurrency, **result})
+            print(f"{name} @ {concurrency}: {result['throughputRps']} req/s, p95 {result['p95Ms']} ms")
+    print()
+    print_table(rows, ['target', 'concurrency', 'throughputRps', 'p50Ms', 'p95Ms', 'p99Ms', 'errors'])
+    if args.json:
+        write_json(args.json, {'mix': mix, 'results': rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""নকল Firestore সহ server.py - লোড টেস্টের জন্য।
+
+    gunicorn -w 4 -b 127.0.0.1:8700 benchmarks.fake_app:app
+
+initData যাচাই ও অ্যাসেট বিল্ড বন্ধ থাকে; বাকি সব (ক্যাশ, লিডারবোর্ড,
+মেট্রিক) আসল কোডই চলে। দেরি ও conflict এর সেটিং fake_firestore.py তে।
+"""
+import os
+
+os.environ.setdefault("AUTH_REQUIRED", "0")
+os.environ.setdefault("ASSET_PIPELINE", "off")
+os.environ["STORAGE_BACKEND"] = "fake"  # server.py যেন Firebase ইনিশিয়ালাইজ না করে
+
+import storage
+from benchmarks import fake_firestore
+
+fake_db = fake_firestore.client_from_env()
+storage.build_storage = lambda db=None, backend=None: storage.FirestoreStorage(fake_db, fake_firestore)
+
+from server import app  # noqa: E402
@@ -0,0 +1,11 @@
+"""নকল Firestore সহ asgi.py - compare_wsgi_asgi.py অফলাইনে চালানোর জন্য।
+
+    uvicorn benchmarks.fake_asgi:app --workers 1 --port 8001
+
+fake_app.py এর মতোই নকল Firestore ও সেটিং। async Firestore ক্লায়েন্ট নেই,
+তাই claim/withdrawal server.py এর sync কোড আলাদা থ্রেডে চলে - তুলনাটি
+event loop + থ্রেড বনাম gunicorn worker এর, async ক্লায়েন্টের নয়।
+"""
+import benchmarks.fake_app  # noqa: F401 - storage প্যাচ করে server ইমপোর্ট করে
+
+from asgi import app  # noqa: E402
@@ -0,0 +1,346 @@
+"""বেঞ্চমার্কের জন্য মেমরিতে চলা নকল Firestore।
+
+server.py (storage.py ও counters.py এর মাধ্যমে) Firestore-এর যে অংশটুকু
+ব্যবহার করে শুধু সেটুকু আছে: collection/document, get/set/update/delete,
+where (==, >=, <=)/order_by/limit/select/start_after, batch, এবং optimistic ট্রানজ্যাকশন।
+প্রতিটি RPC তে কৃত্রিম দেরি (RTT ± jitter) হয়, আর ট্রানজ্যাকশন commit
+ইচ্ছা করে ব্যর্থ (conflict) করানো যায় - আসল Firestore-এর মতো তখন ফাংশনটি
+আবার চলে।
+
+`FirestoreStorage(client_from_env(), fake_firestore)` এভাবে মডিউলটিই
+`firestore` মডিউলের জায়গায় দেওয়া যায়।
+
+Environment ভেরিয়েবল:
+    FAKE_FIRESTORE_RTT_MS         প্রতি RPC এর গড় দেরি (ডিফল্ট: 30)
+    FAKE_FIRESTORE_JITTER_MS      দেরির ± পরিবর্তন (ডিফল্ট: 10)
+    FAKE_FIRESTORE_CONFLICT_RATE  প্রতি commit ব্যর্থ হওয়ার সম্ভাবনা, 0-1 (ডিফল্ট: 0)
+    FAKE_FIRESTORE_USERS          শুরুতে কতজন সিনথেটিক ইউজার থাকবে (ডিফল্ট: 1000)
+    FAKE_FIRESTORE_SEED           র‍্যান্ডম seed (ডিফল্ট: 1)
+"""
+import os
+import copy
+import time
+import uuid
+import random
+import threading
+import functools
+
+MAX_ATTEMPTS = 5  # google-cloud-firestore এর transactional ডিফল্ট
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class _Sentinel:
+    def __repr__(self):
+        return 'SERVER_TIMESTAMP'
+
+
+SERVER_TIMESTAMP = _Sentinel()
+
+
+class Query:
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+
+class NotFound(Exception):
+    pass
+
+
+class AlreadyExists(Exception):
+    pass
+
+
+class TransactionConflict(Exception):
+    pass
+
+
+_OPERATORS = {'==': lambda a, b: a == b, '>=': lambda a, b: a >= b, '<=': lambda a, b: a <= b}
+
+
+def _is_increment(value):
+    # counters.py আসল firebase_admin.firestore.Increment ব্যবহার করে, তাই নাম দিয়ে চেনা
+    return type(value).__name__ == 'Increment' and hasattr(value, 'value')
+
+
+def _is_timestamp(value):
+    return value is SERVER_TIMESTAMP or repr(value) == 'SERVER_TIMESTAMP' or type(value).__name__ == 'Sentinel'
+
+
+def _apply_fields(target, data):
+    for field, value in data.items():
+        if _is_increment(value):
+            target[field] = target.get(field, 0) + value.value
+        elif _is_timestamp(value):
+            target[field] = time.time()
+        else:
+            target[field] = copy.deepcopy(value)
+    return target
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return CollectionReference(self._client, self.path + (name,))
+
+    def get(self, transaction=None):
+        if transaction is not None:
+            return transaction.get(self)
+        self._client.rpc()
+        return self._client.snapshot(self)
+
+    def create(self, data):
+        self._client.rpc()
+        self._client.commit_writes([('create', self, data, False)])
+
+    def set(self, data, merge=False):
+        self._client.rpc()
+        self._client.commit_writes([('set', self, data, merge)])
+
+    def update(self, data):
+        self._client.rpc()
+        self._client.commit_writes([('update', self, data, False)])
+
+    def delete(self):
+        self._client.rpc()
+        self._client.commit_writes([('delete', self, None, False)])
+
+
+class CollectionReference:
+    def __init__(self, client, path, filters=(), order=None, limit_to=None, after=None):
+        self._client = client
+        self.path = path
+        self._filters, self._order, self._limit, self._after = filters, order, limit_to, after
+
+    def _copy(self, **changes):
+        state = {'filters': self._filters, 'order': self._order, 'limit_to': self._limit, 'after': self._after}
+        state.update(changes)
+        return QueryReference(self._client, self.path, **state)
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._client, self.path + (str(doc_id or uuid.uuid4().hex[:20]),))
+
+    def where(self, field, op, value):
+        if op not in _OPERATORS:
+            raise NotImplementedError(f"fake Firestore supports only {sorted(_OPERATORS)} filters, got {op!r}")
+        if hasattr(value, 'timestamp'):  # SERVER_TIMESTAMP এখানে epoch সেকেন্ড হিসেবে থাকে
+            value = value.timestamp()
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=Query.ASCENDING):
+        return self._copy(order=(field, direction))
+
+    def limit(self, count):
+        return self._copy(limit_to=count)
+
+    def select(self, fields):
+        return self
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot)
+
+    def _run(self):
+        docs = self._client.list_collection(self.path)
+        docs = [(doc_id, data) for doc_id, data in docs
+                if all(field in data and _OPERATORS[op](data[field], value) for field, op, value in self._filters)]
+        if self._order:
+            field, direction = self._order
+            if field == '__name__':
+                key = lambda item: item[0]
+            else:
+                docs = [item for item in docs if field in item[1]]
+                key = lambda item: item[1][field]
+            docs.sort(key=key, reverse=direction == Query.DESCENDING)
+            if self._after is not None:
+                ids = [doc_id for doc_id, _ in docs]
+                docs = docs[ids.index(self._after.id) + 1:] if self._after.id in ids else docs
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return [DocumentSnapshot(self.document(doc_id), data) for doc_id, data in docs]
+
+    def stream(self, transaction=None):
+        self._client.rpc()
+        return iter(self._run())
+
+
+class QueryReference(CollectionReference):
+    """where/order_by/limit এর ফল - আসল Firestore-এর মতো শুধু এটিই ট্রানজ্যাকশনে পড়া যায়।"""
+
+
+class Transaction:
+    def __init__(self, client):
+        self._client = client
+        self._reads = {}   # path -> version
+        self._writes = []
+
+    def _begin(self):
+        self._reads, self._writes = {}, []
+
+    def get(self, ref_or_query):
+        self._client.rpc()
+        if isinstance(ref_or_query, QueryReference):
+            snapshots = ref_or_query._run()
+            for snapshot in snapshots:
+                self._reads[snapshot.reference.path] = self._client.version(snapshot.reference.path)
+            return iter(snapshots)
+        if not isinstance(ref_or_query, DocumentReference):
+            raise ValueError('Value for argument "ref_or_query" must be a DocumentReference or a Query.')
+        self._reads[ref_or_query.path] = self._client.version(ref_or_query.path)
+        return self._client.snapshot(ref_or_query)
+
+    def get_all(self, refs):
+        self._client.rpc()
+        for ref in refs:
+            self._reads[ref.path] = self._client.version(ref.path)
+        return [self._client.snapshot(ref) for ref in refs]
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(('set', ref, data, merge))
+
+    def update(self, ref, data):
+        self._writes.append(('update', ref, data, False))
+
+    def delete(self, ref):
+        self._writes.append(('delete', ref, None, False))
+
+    def _commit(self):
+        self._client.rpc()
+        self._client.commit_writes(self._writes, self._reads, self._client.roll_conflict())
+
+
+class WriteBatch(Transaction):
+    def commit(self):
+        self._client.rpc()
+        self._client.commit_writes(self._writes)
+        self._writes = []
+
+
+def transactional(fn):
+    """`@firestore.transactional` এর মতো: conflict হলে পুরো ফাংশন আবার চলে।"""
+    @functools.wraps(fn)
+    def wrapper(transaction, *args, **kwargs):
+        for _ in range(MAX_ATTEMPTS):
+            transaction._begin()
+            result = fn(transaction, *args, **kwargs)
+            try:
+                transaction._commit()
+                return result
+            except TransactionConflict:
+                transaction._client.count('conflicts')
+        transaction._client.count('aborted')
+        raise ValueError(f"Failed to commit transaction in {MAX_ATTEMPTS} attempts.")
+    return wrapper
+
+
+class FakeFirestoreClient:
+    def __init__(self, rtt_ms=30, jitter_ms=10, conflict_rate=0.0, seed=1):
+        self.rtt = rtt_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.conflict_rate = conflict_rate
+        self._rng = random.Random(seed)
+        self._docs = {}  # path tuple -> (data, version)
+        self._lock = threading.Lock()
+        self.stats = {'rpcs': 0, 'writes': 0, 'conflicts': 0, 'aborted': 0}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    # --- নেটওয়ার্ক ও conflict সিমুলেশন ---
+    def rpc(self):
+        self.count('rpcs')
+        delay = self.rtt + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def roll_conflict(self):
+        return self.conflict_rate > 0 and self._rng.random() < self.conflict_rate
+
+    # --- ডেটা ---
+    def collection(self, name):
+        return CollectionReference(self, (name,))
+
+    def transaction(self):
+        return Transaction(self)
+
+    def get_all(self, refs):
+        self.rpc()
+        return [self.snapshot(ref) for ref in refs]
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def version(self, path):
+        with self._lock:
+            return self._docs.get(path, (None, 0))[1]
+
+    def snapshot(self, ref):
+        with self._lock:
+            data = self._docs.get(ref.path, (None, 0))[0]
+            return DocumentSnapshot(ref, copy.deepcopy(data))
+
+    def list_collection(self, path):
+        with self._lock:
+            return [(doc_path[-1], copy.deepcopy(data)) for doc_path, (data, _) in self._docs.items()
+                    if len(doc_path) == len(path) + 1 and doc_path[:-1] == path and data is not None]
+
+    def commit_writes(self, writes, reads=None, force_conflict=False):
+        with self._lock:
+            if force_conflict or any(self._docs.get(path, (None, 0))[1] != version for path, version in (reads or {}).items()):
+                raise TransactionConflict()
+            # আসল batch এর মতো atomic: কোনো একটি রাইট ব্যর্থ হলে কিছুই লেখা হয় না
+            exists = {ref.path: self._docs.get(ref.path, (None, 0))[0] is not None for _, ref, _, _ in writes}
+            for op, ref, data, merge in writes:
+                if op == 'create' and exists[ref.path]:
+                    raise AlreadyExists(f"Document already exists: {'/'.join(ref.path)}")
+                if op == 'update' and not exists[ref.path]:
+                    raise NotFound(f"No document to update: {'/'.join(ref.path)}")
+                exists[ref.path] = op != 'delete'
+            for op, ref, data, merge in writes:
+                current, version = self._docs.get(ref.path, (None, 0))
+                if op == 'delete':
+                    new = None
+                elif op == 'update':
+                    new = _apply_fields(copy.deepcopy(current), data)
+                else:
+                    new = _apply_fields(copy.deepcopy(current) if merge and current else {}, data)
+                self._docs[ref.path] = (new, version + 1)
+                self.stats['writes'] += 1
+
+    def seed(self, collection, documents):
+        """RTT ছাড়াই সরাসরি ডেটা বসায় (স্টার্টআপে সিনথেটিক ইউজারদের জন্য)।"""
+        with self._lock:
+            for doc_id, data in documents:
+                self._docs[(collection, str(doc_id))] = (copy.deepcopy(data), 1)
+
+
+def client_from_env():
+    from benchmarks.population import Population
+    client = FakeFirestoreClient(rtt_ms=float(os.getenv("FAKE_FIRESTORE_RTT_MS", 30)),
+                                 jitter_ms=float(os.getenv("FAKE_FIRESTORE_JITTER_MS", 10)),
+                                 conflict_rate=float(os.getenv("FAKE_FIRESTORE_CONFLICT_RATE", 0)),
+                                 seed=int(os.getenv("FAKE_FIRESTORE_SEED", 1)))
+    population = Population(int(os.getenv("FAKE_FIRESTORE_USERS", 1000)), seed=int(os.getenv("FAKE_FIRESTORE_SEED", 1)))
+    client.seed('users', population.profiles())
+    return client
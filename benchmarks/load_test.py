@@ -0,0 +1,212 @@
+"""নকল Firestore এর বিপরীতে gunicorn worker সংখ্যা অনুযায়ী লোড টেস্ট।
+
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 32 --requests 3000 \\
+        --mix daily --rtt-ms 30 --jitter-ms 10 --conflict-rate 0.02 --json results.json
+
+প্রতিটি worker সংখ্যার জন্য `benchmarks.fake_app:app` দিয়ে gunicorn চালু হয়,
+সিনথেটিক ইউজাররা (population.py) /api/bootstrap, /api/claim-gems এবং
+/api/withdrawal এ রিকোয়েস্ট পাঠায়, তারপর p50/p95/p99 ও throughput (মোট এবং
+প্রতিটি কাজের) রিপোর্ট হয়। `--baseline old.json` দিলে আগের ফলাফলের সাথে
+তুলনা দেখায়।
+
+`--referral-burst N` দিলে একই প্রসেসে bot.register_user দিয়ে একজন
+রেফারারের লিংকে N জন একসাথে জয়েন করানো হয় (COUNTER_MODE অনুযায়ী)।
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import summarize, print_table, write_json
+from benchmarks.population import Population, MIXES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_request(base_url, op, user_id):
+    body = {'user_id': user_id, 'username': f"user{user_id}"}
+    if op == 'open':
+        endpoint = '/api/bootstrap'
+    elif op == 'claim':
+        endpoint = '/api/claim-gems'
+    else:
+        endpoint = '/api/withdrawal'
+        body.update({'method': 'Bkash', 'amount': 500, 'account': '01700000000'})
+    return urllib.request.Request(f"{base_url}{endpoint}", data=json.dumps(body).encode(),
+                                  headers={'Content-Type': 'application/json'})
+
+
+def run_load(base_url, population, mix, concurrency, total, timeout, seed):
+    ops, weights = zip(*mix.items())
+    latencies, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        rng = getattr(local, 'rng', None)
+        if rng is None:
+            rng = local.rng = random.Random(f"{seed}-{threading.get_ident()}")
+        op = rng.choices(ops, weights)[0]
+        req = build_request(base_url, op, population.pick(rng))
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                resp.read()
+            ok = True
+        except urllib.error.HTTPError as e:
+            ok = e.code < 500
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies[op].append(elapsed)
+            else:
+                errors[op] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    overall = summarize([x for values in latencies.values() for x in values], sum(errors.values()), elapsed)
+    per_op = {op: summarize(latencies[op], errors[op], elapsed) for op in ops}
+    return overall, per_op
+
+
+def wait_ready(base_url, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/leaderboard", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.3)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def start_server(workers, port, env):
+    cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f"127.0.0.1:{port}",
+           '--log-level', 'warning', 'benchmarks.fake_app:app']
+    return subprocess.Popen(cmd, cwd=ROOT, env=env)
+
+
+def run_referral_burst(size, concurrency):
+    """একই প্রসেসে নকল Firestore এর উপর রেফারেল বার্স্ট চালায়।"""
+    from benchmarks import fake_app  # noqa: F401 - server.py কে নকল storage সহ লোড করে
+    import bot
+
+    population = Population(int(os.getenv("FAKE_FIRESTORE_USERS", 1000)), seed=int(os.getenv("FAKE_FIRESTORE_SEED", 1)))
+    joins = population.referral_burst(size)
+    referrer_id = joins[0][1]
+    refs_before = bot.storage.get_user(referrer_id).get('refs', 0)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(join):
+        nonlocal errors
+        user_id, referrer = join
+        started = time.perf_counter()
+        try:
+            bot.register_user(user_id, f"new{user_id}", referrer)
+            ok = True
+        except Exception:
+            ok = False
+        with lock:
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, joins))
+    bot.referral_counters.flush()
+    elapsed = time.perf_counter() - started
+    refs_after = bot.storage.get_user(referrer_id).get('refs', 0) + bot.referral_counters.pending(referrer_id).get('refs', 0)
+    return {'counterMode': bot.COUNTER_MODE, 'joins': size, 'refsCredited': refs_after - refs_before,
+            'firestore': dict(fake_app.fake_db.stats), **summarize(latencies, errors, elapsed)}
+
+
+def compare(rows, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {row['workers']: row for row in json.load(f).get('results', [])}
+    print(f"\nCompared with {baseline_path}:")
+    for row in rows:
+        old = baseline.get(row['workers'])
+        if not old:
+            continue
+        change = lambda key: f"{(row[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else "n/a"
+        print(f"  workers={row['workers']}: throughput {change('throughputRps')}, "
+              f"p95 {change('p95Ms')}, p99 {change('p99Ms')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--mix', default='daily', choices=sorted(MIXES))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rtt-ms', type=float, default=30)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--conflict-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--referral-burst', type=int, default=0, help="এতজন নতুন ইউজারের রেফারেল বার্স্ট (0 = বন্ধ)")
+    parser.add_argument('--json', help="ফলাফল JSON ফাইলে লিখুন")
+    parser.add_argument('--baseline', help="আগের --json ফাইলের সাথে তুলনা")
+    args = parser.parse_args()
+
+    os.environ.update({
+        'FAKE_FIRESTORE_RTT_MS': str(args.rtt_ms), 'FAKE_FIRESTORE_JITTER_MS': str(args.jitter_ms),
+        'FAKE_FIRESTORE_CONFLICT_RATE': str(args.conflict_rate), 'FAKE_FIRESTORE_USERS': str(args.users),
+        'FAKE_FIRESTORE_SEED': str(args.seed), 'NOTIFY_QUEUE_PATH': os.path.join(ROOT, 'hubcoin_bench_outbox.sqlite3'),
+    })
+    population = Population(args.users, seed=args.seed)
+    mix = MIXES[args.mix]
+    base_url = f"http://127.0.0.1:{args.port}"
+    rows, per_op_rows = [], []
+    for workers in args.workers:
+        proc = start_server(workers, args.port, dict(os.environ))
+        try:
+            wait_ready(base_url, proc)
+            overall, per_op = run_load(base_url, population, mix, args.concurrency, args.requests, args.timeout, args.seed)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        rows.append({'workers': workers, **overall})
+        per_op_rows.extend({'workers': workers, 'op': op, **summary} for op, summary in per_op.items())
+        print(f"workers={workers}: {overall['throughputRps']} req/s, p95 {overall['p95Ms']} ms")
+
+    print()
+    print_table(rows, ['workers', 'requests', 'errors', 'throughputRps', 'p50Ms', 'p95Ms', 'p99Ms'])
+    print()
+    print_table(per_op_rows, ['workers', 'op', 'requests', 'errors', 'p50Ms', 'p95Ms', 'p99Ms'])
+
+    burst = None
+    if args.referral_burst:
+        burst = run_referral_burst(args.referral_burst, args.concurrency)
+        print(f"\nReferral burst ({burst['counterMode']}): {burst['refsCredited']}/{burst['joins']} credited, "
+              f"{burst['throughputRps']} joins/s, p95 {burst['p95Ms']} ms, {burst['errors']} errors")
+
+    if args.baseline:
+        compare(rows, args.baseline)
+    if args.json:
+        config = {key: getattr(args, key) for key in ('concurrency', 'requests', 'mix', 'users', 'rtt_ms',
+                                                      'jitter_ms', 'conflict_rate', 'seed')}
+        write_json(args.json, {'config': config, 'results': rows, 'perOp': per_op_rows, 'referralBurst': burst})
+
+
+if __name__ == "__main__":
+    main()
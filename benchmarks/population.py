@@ -0,0 +1,52 @@
+"""সিনথেটিক টেলিগ্রাম ইউজার এবং তাদের আচরণের মিক্স।
+
+বাস্তবের মতো অল্প কিছু ইউজার (hot) বেশিরভাগ রিকোয়েস্ট করে, বাকিরা মাঝে
+মাঝে। একই seed দিলে প্রতিটি gunicorn worker এবং লোড জেনারেটর একই ইউজার
+তালিকা ও একই শুরুর ব্যালান্স দেখে।
+"""
+import random
+
+from rewards import new_user_profile
+
+USER_ID_BASE = 100000
+
+# Mini App সেশনে কোন কাজ কতবার হয়
+MIXES = {
+    'browse': {'open': 0.85, 'claim': 0.12, 'withdraw': 0.03},
+    'daily': {'open': 0.6, 'claim': 0.3, 'withdraw': 0.1},
+    'payday': {'open': 0.4, 'claim': 0.2, 'withdraw': 0.4},
+}
+
+
+class Population:
+    def __init__(self, size, seed=1, hot_fraction=0.05, hot_share=0.5):
+        """`hot_fraction` অংশের ইউজার মোট রিকোয়েস্টের `hot_share` অংশ করে।"""
+        self.size = size
+        self.seed = seed
+        self.hot_count = max(1, int(size * hot_fraction))
+        self.hot_share = hot_share
+        self._rng = random.Random(seed)
+
+    def user_id(self, index):
+        return str(USER_ID_BASE + index)
+
+    def profiles(self):
+        """`(user_id, profile)` - প্রত্যেকের কিছু ব্যালান্স ও জেম থাকে যাতে claim/withdrawal সফল হতে পারে।"""
+        rng = random.Random(self.seed)
+        for index in range(self.size):
+            profile = new_user_profile(f"user{index}")
+            profile.update({'balance': float(rng.randrange(0, 5000)), 'gems': rng.randrange(0, 400),
+                            'unclaimedGems': rng.randrange(0, 40), 'refs': rng.randrange(0, 20),
+                            'totalWithdrawn': float(rng.randrange(0, 3000))})
+            yield self.user_id(index), profile
+
+    def pick(self, rng=None):
+        rng = rng or self._rng
+        if rng.random() < self.hot_share:
+            return self.user_id(rng.randrange(self.hot_count))
+        return self.user_id(rng.randrange(self.size))
+
+    def referral_burst(self, size, referrer_index=0):
+        """একজন রেফারারের লিংকে একসাথে `size` জন নতুন ইউজার - `(new_user_id, referrer_id)`।"""
+        start = USER_ID_BASE + self.size
+        return [(str(start + i), self.user_id(referrer_index)) for i in range(size)]
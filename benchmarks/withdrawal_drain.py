@@ -0,0 +1,70 @@
+"""হাজার হাজার pending উইথড্রয়াল approve করতে কত সময় লাগে।
+
+    python -m benchmarks.withdrawal_drain --pending 5000 --backend fake --rtt-ms 30
+    python -m benchmarks.withdrawal_drain --pending 5000 --backend sqlite --json drain.json
+
+নকল Firestore (benchmarks/fake_firestore.py) বা একটি অস্থায়ী SQLite ফাইলে
+ইউজার ও pending রিকোয়েস্ট বসিয়ে WithdrawalPipeline.approve() দিয়ে সবগুলো
+ড্রেইন করা হয়, তারপর প্রতি সেকেন্ডে কতটি প্রসেস হলো তা দেখানো হয়।
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from benchmarks.common import print_table, write_json
+from benchmarks.population import Population
+from storage import FirestoreStorage, SQLiteStorage, SERVER_TIMESTAMP
+from withdrawals import WithdrawalPipeline
+
+
+def build_backend(kind, rtt_ms, jitter_ms):
+    if kind == 'sqlite':
+        return SQLiteStorage(os.path.join(tempfile.mkdtemp(), 'drain.sqlite3'))
+    from benchmarks import fake_firestore
+    return FirestoreStorage(fake_firestore.FakeFirestoreClient(rtt_ms=rtt_ms, jitter_ms=jitter_ms), fake_firestore)
+
+
+def seed(storage, population, pending, rng):
+    for user_id, profile in population.profiles():
+        storage.create_user(user_id, profile)
+    writes = []
+    for i in range(pending):
+        record = {'userId': population.pick(rng), 'amount': 500.0, 'method': 'Bkash', 'requiredGems': 29,
+                  'account': '01700000000', 'status': 'pending', 'timestamp': SERVER_TIMESTAMP}
+        writes.append(('set', 'withdrawals', f"bench{i:07d}", record))
+    storage.commit_batch(writes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pending', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--backend', choices=['fake', 'sqlite'], nargs='+', default=['fake', 'sqlite'])
+    parser.add_argument('--rtt-ms', type=float, default=30)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--page-size', type=int, default=250)
+    parser.add_argument('--json', help="ফলাফল JSON ফাইলে লিখুন")
+    args = parser.parse_args()
+
+    rows = []
+    for kind in args.backend:
+        storage = build_backend(kind, args.rtt_ms, args.jitter_ms)
+        seed(storage, Population(args.users), args.pending, random.Random(1))
+        pipeline = WithdrawalPipeline(storage, page_size=args.page_size)
+        started = time.perf_counter()
+        report = pipeline.approve(admin_id='benchmark')
+        remaining, _ = pipeline.pending(1)
+        rows.append({'backend': kind, 'processed': report['processed'], 'commits': report['commits'],
+                     'elapsedSec': round(time.perf_counter() - started, 3), 'perSec': report['perSec'],
+                     'remaining': len(remaining)})
+        print(f"{kind}: {report['processed']} approved at {report['perSec']}/s")
+    print()
+    print_table(rows, ['backend', 'processed', 'commits', 'elapsedSec', 'perSec', 'remaining'])
+    if args.json:
+        write_json(args.json, {'pending': args.pending, 'rttMs': args.rtt_ms, 'results': rows})
+
+
+if __name__ == "__main__":
+    main()
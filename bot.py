@@ -0,0 +1,282 @@
+"""টেলিগ্রাম বটের entry point (Procfile এর worker)।
+
+    python3 bot.py
+
+হ্যান্ডলার, JobQueue ও চালানোর কোড এখানে; ওয়েবের (server.py) সাথে শেয়ার করা
+অবজেক্টগুলো services.py থেকে আসে, তাই বট প্রসেস Flask ইমপোর্ট করে না।
+"""
+import os
+import asyncio
+import logging
+import tempfile
+
+from telegram import Update, WebAppInfo, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from config import (BOT_TOKEN, FRONTEND_URL, ADMIN_TELEGRAM_ID, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    BOT_STATS_LOG_INTERVAL)
+from leaderboard import LEADERBOARD_FLUSH_INTERVAL, LEADERBOARD_RECONCILE_INTERVAL
+from counters import COUNTER_MODE, COUNTER_FLUSH_INTERVAL
+from botkit import run_blocking, timed, bot_report, format_report, BOT_CONCURRENT_UPDATES
+from notifier import broadcast
+from ledger import format_replay
+from withdrawals import format_pending, format_report as format_review_report
+from referrals import level_rewards, format_inspect
+import admin_tools
+from services import (storage, leaderboards, referral_counters, ledger, notifier, withdrawal_pipeline,
+                      referral_index, create_new_user, get_user_data)
+
+# --- Telegram Bot Command Handlers (Worker এর জন্য) ---
+def register_user(user_id, username, referrer_id):
+    """নতুন ইউজার হলে তৈরি করে রেফারারদের রিওয়ার্ড দেয়; যারা রিওয়ার্ড পেল তাদের `(ancestor, level)` তালিকা।
+
+    এটি blocking (Firestore) কাজ, তাই বট হ্যান্ডলার থেকে run_blocking দিয়ে ডাকতে হবে।
+    """
+    if get_user_data(user_id) is not None:
+        return []
+    _, placement = create_new_user(user_id, username, referrer_id)
+    if placement is None or not referrer_id:
+        return []  # placement None: একই ইউজারের আরেকটি /start আগেই তৈরি করেছে
+    rewarded = []
+    # স্তর ১ সরাসরি রেফারার, উপরের স্তরগুলো referrals.py এর ইনডেক্স থেকে
+    for ancestor, level, deltas in level_rewards(placement):
+        try:
+            credit_referral(ancestor, level, deltas, user_id)
+            rewarded.append((ancestor, level))
+        except Exception as e:
+            logging.error(f"Failed to reward referrer {ancestor} (level {level}): {e}")
+    return rewarded
+
+def credit_referral(ancestor, level, deltas, user_id):
+    """একটি স্তরের রেফারেল রিওয়ার্ড (কাউন্টার, লেজার, লিডারবোর্ড); `/referrals clear` ও এটি ব্যবহার করে।"""
+    if level == 1:
+        referrer = get_user_data(ancestor)
+        if referrer is None:
+            raise ValueError("referrer does not exist")
+        referrer = referral_counters.overlay(ancestor, referrer)
+    # লেজারে আলাদা ইভেন্ট লেখা হয়, তাই ledgerPending ও একসাথে বাড়ে
+    referral_counters.add(ancestor, {**deltas, 'ledgerPending': 1})
+    ledger.append(ancestor, 'referral' if level == 1 else f"referral_l{level}", deltas, ref=user_id)
+    if level == 1:
+        leaderboards.record('refs', ancestor, referrer.get('username'), referrer.get('refs', 0) + 1)
+
+@timed
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user = update.effective_user
+    user_id, username = str(user.id), user.username or user.first_name
+    referrer_id = context.args[0] if context.args and context.args[0].isdigit() and context.args[0] != user_id else None
+    for ancestor, level in await run_blocking(register_user, user_id, username, referrer_id):
+        await run_blocking(notifier.enqueue_referral, ancestor, user.first_name, level)
+    keyboard = [[InlineKeyboardButton("🚀 Open HubCoin Miner", web_app=WebAppInfo(url=FRONTEND_URL))]]
+    await update.message.reply_html(
+        rf"👋 Welcome, {user.mention_html()}! Click the button below to start earning.",
+        reply_markup=InlineKeyboardMarkup(keyboard))
+
+@timed
+async def update_leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    await update.message.reply_text("⏳ Rebuilding leaderboards from a full scan...")
+    try:
+        counts = await run_blocking(leaderboards.reconcile_all)
+        summary = ", ".join(f"{board}: {count}" for board, count in counts.items())
+        await update.message.reply_text(f"✅ Leaderboards updated ({summary})!")
+    except Exception as e:
+        logging.error(f"Leaderboard update failed: {e}")
+        await update.message.reply_text(f"❌ Failed to update leaderboard. Error: {e}")
+
+@timed
+async def bot_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    await update.message.reply_text(f"{format_report(bot_report(context.application))}\n"
+                                    f"📤 Outbox depth: {await run_blocking(notifier.depth)}, {notifier.stats}")
+
+@timed
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    text = update.message.text.partition(' ')[2].strip()
+    if not text:
+        return await update.message.reply_text("Usage: /broadcast <message>")
+    await update.message.reply_text("⏳ Queueing broadcast...")
+    try:
+        total = await run_blocking(broadcast, storage, notifier, text)
+        await update.message.reply_text(f"✅ Broadcast queued for {total} users.")
+    except Exception as e:
+        logging.error(f"Broadcast failed: {e}")
+        await update.message.reply_text(f"❌ Broadcast failed. Error: {e}")
+
+@timed
+async def pending_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    cursor = context.args[0] if context.args else None
+    try:
+        rows, next_cursor = await run_blocking(withdrawal_pipeline.pending, 10, cursor)
+        await update.message.reply_text(format_pending(rows, next_cursor))
+    except Exception as e:
+        logging.error(f"Listing pending withdrawals failed: {e}")
+        await update.message.reply_text(f"❌ Could not load pending withdrawals. Error: {e}")
+
+async def review_withdrawals(update: Update, review, *args):
+    """withdrawal_pipeline.approve/reject থ্রেড পুলে চালিয়ে রিপোর্ট পাঠায়।"""
+    await update.message.reply_text("⏳ Processing withdrawals...")
+    try:
+        report = await run_blocking(review, *args, admin_id=update.effective_user.id)
+        await update.message.reply_text(format_review_report(report))
+    except Exception as e:
+        logging.error(f"Withdrawal {review.__name__} failed: {e}")
+        await update.message.reply_text(f"❌ Withdrawal {review.__name__} failed. Error: {e}")
+
+@timed
+async def approve_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    args = context.args or []
+    if not args:
+        return await update.message.reply_text("Usage: /approve <id> [<id> ...] or /approve all [limit]")
+    if args[0] == 'all':
+        limit = int(args[1]) if len(args) > 1 and args[1].isdigit() else None
+        return await review_withdrawals(update, withdrawal_pipeline.approve, None, limit)
+    await review_withdrawals(update, withdrawal_pipeline.approve, args)
+
+@timed
+async def reject_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    if not context.args:
+        return await update.message.reply_text("Usage: /reject <id> [<id> ...]")
+    await review_withdrawals(update, withdrawal_pipeline.reject, context.args)
+
+@timed
+async def ledger_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    if not context.args:
+        return await update.message.reply_text("Usage: /ledger <user_id>")
+    try:
+        report = await run_blocking(ledger.compact, context.args[0])
+        await update.message.reply_text(format_replay(report))
+    except Exception as e:
+        logging.error(f"Ledger replay failed: {e}")
+        await update.message.reply_text(f"❌ Ledger replay failed. Error: {e}")
+
+@timed
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    args = context.args or []
+    if not args or args[0] not in admin_tools.EXPORTS:
+        return await update.message.reply_text("Usage: /export <users|withdrawals> [csv|ndjson] "
+                                               "[status=.. method=.. userId=.. since=YYYY-MM-DD until=YYYY-MM-DD]")
+    collection, args = args[0], args[1:]
+    fmt = args.pop(0) if args and args[0] in ('csv', 'ndjson') else 'csv'
+    try:
+        filters = admin_tools.parse_filters(args, collection)
+    except ValueError as e:
+        return await update.message.reply_text(f"❌ {e}")
+    await update.message.reply_text(f"⏳ Exporting {collection}...")
+    # ফাইলে স্ট্রিম করে পাঠানো হয়, তাই পুরো কালেকশন মেমরিতে আসে না
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}", prefix=f"{collection}_")
+    os.close(fd)
+    try:
+        report = await run_blocking(admin_tools.export_collection, storage, collection, path, filters)
+        with open(path, 'rb') as f:
+            await update.message.reply_document(f, filename=f"{collection}.{fmt}", caption=admin_tools.format_report(report))
+    except Exception as e:
+        logging.error(f"Export failed: {e}")
+        await update.message.reply_text(f"❌ Export failed. Error: {e}")
+    finally:
+        os.remove(path)
+
+@timed
+async def referrals_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.effective_user.id != ADMIN_TELEGRAM_ID:
+        return await update.message.reply_text("⛔ You are not authorized.")
+    if not context.args:
+        return await update.message.reply_text("Usage: /referrals <user_id> [clear]")
+    try:
+        replayed = None
+        if context.args[1:] == ['clear']:
+            replayed = await run_blocking(referral_index.clear_flag, context.args[0], credit_referral)
+        report = await run_blocking(referral_index.inspect, context.args[0])
+        await update.message.reply_text(format_inspect(report) +
+                                        (f"\n💸 Paid {replayed} withheld rewards." if replayed is not None else ""))
+    except Exception as e:
+        logging.error(f"Referral inspection failed: {e}")
+        await update.message.reply_text(f"❌ Referral inspection failed. Error: {e}")
+
+# --- নির্দিষ্ট সময় পরপর চলা কাজ (JobQueue) ---
+async def flush_leaderboards_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await run_blocking(leaderboards.flush)
+
+async def flush_counters_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await run_blocking(referral_counters.flush)
+
+async def log_bot_stats_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    logging.info(f"Bot stats: {bot_report(context.application)}")
+
+async def start_notifier(application: Application) -> None:
+    application.bot_data['notifier_task'] = asyncio.create_task(notifier.run(application.bot))
+
+async def flush_on_shutdown(application: Application) -> None:
+    notifier.stop()
+    if 'notifier_task' in application.bot_data:
+        await application.bot_data['notifier_task']
+    await run_blocking(referral_counters.flush)
+    await run_blocking(leaderboards.flush)
+
+async def reconcile_leaderboards_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        counts = await run_blocking(leaderboards.reconcile_all)
+        logging.info(f"Leaderboard reconciliation finished: {counts}")
+    except Exception as e:
+        logging.error(f"Leaderboard reconciliation failed: {e}")
+
+def build_bot_application(background=True):
+    """হ্যান্ডলার ও JobQueue সহ টেলিগ্রাম Application তৈরি করে।
+
+    background=False হলে notifier ও full-scan reconcile চলে না (মাউন্ট করা বটে
+    বাকি gunicorn worker গুলোর জন্য); প্রসেসের নিজের বাফার flush সবখানেই চলে।
+    """
+    builder = Application.builder().token(BOT_TOKEN).concurrent_updates(BOT_CONCURRENT_UPDATES)
+    if background:
+        builder = builder.post_init(start_notifier)
+    application = builder.post_shutdown(flush_on_shutdown).build()
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("updateleaderboard", update_leaderboard_command))
+    application.add_handler(CommandHandler("botstats", bot_stats_command))
+    application.add_handler(CommandHandler("broadcast", broadcast_command))
+    application.add_handler(CommandHandler("pending", pending_command))
+    application.add_handler(CommandHandler("approve", approve_command))
+    application.add_handler(CommandHandler("reject", reject_command))
+    application.add_handler(CommandHandler("ledger", ledger_command))
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("referrals", referrals_command))
+    application.job_queue.run_repeating(log_bot_stats_job, interval=BOT_STATS_LOG_INTERVAL, first=BOT_STATS_LOG_INTERVAL)
+    application.job_queue.run_repeating(flush_leaderboards_job, interval=LEADERBOARD_FLUSH_INTERVAL, first=LEADERBOARD_FLUSH_INTERVAL)
+    if COUNTER_MODE == 'buffered':
+        application.job_queue.run_repeating(flush_counters_job, interval=COUNTER_FLUSH_INTERVAL, first=COUNTER_FLUSH_INTERVAL)
+    if background:
+        application.job_queue.run_repeating(reconcile_leaderboards_job, interval=LEADERBOARD_RECONCILE_INTERVAL,
+                                            first=LEADERBOARD_RECONCILE_INTERVAL)
+    return application
+
+# --- এই অংশটি শুধুমাত্র Worker হিসেবে চালানোর জন্য ---
+def run_bot():
+    """টেলিগ্রাম বটটি আলাদা প্রসেসে পোলিং বা webhook মোডে চালায়।"""
+    application = build_bot_application()
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_SECRET:
+            raise RuntimeError("WEBHOOK_SECRET must be set for BOT_MODE=webhook")
+        logging.info("Starting Telegram bot webhook server...")
+        application.run_webhook(listen="0.0.0.0", port=int(os.getenv("PORT", 8443)), url_path=WEBHOOK_PATH.lstrip('/'),
+                                webhook_url=f"{WEBHOOK_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET,
+                                max_connections=BOT_CONCURRENT_UPDATES)
+    else:
+        logging.info("Starting Telegram bot polling...")
+        application.run_polling()
+
+if __name__ == "__main__":
+    run_bot()
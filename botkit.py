@@ -0,0 +1,169 @@
+"""টেলিগ্রাম বটের রানটাইম সহায়ক: blocking কল offload, হ্যান্ডলার টাইমিং এবং
+ওয়েব অ্যাপের ভেতরে webhook মাউন্ট।
+
+Environment ভেরিয়েবল:
+    BOT_IO_WORKERS          Firestore কলের জন্য থ্রেড সংখ্যা (ডিফল্ট: 16)
+    BOT_IO_MAX_PENDING      একসাথে সর্বোচ্চ কতটি blocking কল অপেক্ষায় থাকতে পারে (ডিফল্ট: 256)
+    BOT_CONCURRENT_UPDATES  একসাথে কতটি আপডেট প্রসেস হবে (ডিফল্ট: 64)
+    BOT_LEADER_LOCK         মাউন্ট করা বটে যে worker এই ফাইল lock করতে পারে শুধু সেটিই
+                            JobQueue-এর reconcile ও notifier চালায় (ডিফল্ট: /tmp/hubcoin_bot_leader.lock)
+"""
+import os
+import hmac
+import time
+import asyncio
+import logging
+import functools
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import Update
+
+import metrics
+
+BOT_IO_WORKERS = int(os.getenv("BOT_IO_WORKERS", 16))
+BOT_IO_MAX_PENDING = int(os.getenv("BOT_IO_MAX_PENDING", 256))
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", 64))
+BOT_LEADER_LOCK = os.getenv("BOT_LEADER_LOCK", "/tmp/hubcoin_bot_leader.lock")
+
+_executor = ThreadPoolExecutor(max_workers=BOT_IO_WORKERS, thread_name_prefix="bot-io")
+_pending_slots = {}  # event loop -> Semaphore
+_held_locks = []  # প্রসেস চলা পর্যন্ত lock ধরে রাখতে ফাইলগুলো খোলা থাকে
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """sync (Firestore) ফাংশনকে সীমিত থ্রেড পুলে চালায়, যাতে event loop আটকে না যায়।
+
+    অপেক্ষমাণ কলের সংখ্যা BOT_IO_MAX_PENDING ছাড়ালে নতুন কল জায়গা না
+    পাওয়া পর্যন্ত অপেক্ষা করে (backpressure)।
+    """
+    loop = asyncio.get_running_loop()
+    slots = _pending_slots.setdefault(loop, asyncio.Semaphore(BOT_IO_MAX_PENDING))
+    async with slots:
+        return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+class HandlerStats:
+    """হ্যান্ডলার প্রতি কল সংখ্যা, ত্রুটি এবং সাম্প্রতিক লেটেন্সি।"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._recent = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            self._calls[name] += 1
+            if failed:
+                self._errors[name] += 1
+            self._recent[name].append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            report = {}
+            for name, calls in self._calls.items():
+                recent = sorted(self._recent[name])
+                report[name] = {
+                    'calls': calls, 'errors': self._errors[name],
+                    'avgMs': round(sum(recent) / len(recent) * 1000, 1),
+                    'p95Ms': round(recent[max(0, int(len(recent) * 0.95) - 1)] * 1000, 1),
+                    'maxMs': round(recent[-1] * 1000, 1),
+                }
+            return report
+
+
+handler_stats = HandlerStats()
+
+
+def timed(handler):
+    """async হ্যান্ডলারের সময় মাপার decorator।"""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(update, context)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            handler_stats.observe(handler.__name__, elapsed, failed)
+            metrics.observe_handler(handler.__name__, elapsed, failed)
+    return wrapper
+
+
+def bot_report(application):
+    return {'updateQueueDepth': application.update_queue.qsize(), 'handlers': handler_stats.snapshot()}
+
+
+def format_report(report):
+    lines = [f"📥 Update queue depth: {report['updateQueueDepth']}"]
+    for name, s in sorted(report['handlers'].items()):
+        lines.append(f"• {name}: {s['calls']} calls, {s['errors']} errors, "
+                     f"avg {s['avgMs']} ms, p95 {s['p95Ms']} ms, max {s['maxMs']} ms")
+    return "\n".join(lines)
+
+
+def hold_process_lock(path=BOT_LEADER_LOCK):
+    """এই প্রসেস ফাইলটির exclusive lock পেলে True; প্রসেস শেষ হলে OS নিজেই ছেড়ে দেয়।"""
+    import fcntl
+    handle = open(path, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _held_locks.append(handle)
+    logging.info(f"Holding {path}: this process runs the bot's background jobs")
+    return True
+
+
+class WebhookBridge:
+    """Flask (sync) প্রসেসের ভেতরে আলাদা থ্রেডের event loop-এ বট চালায়।
+
+    webhook রুট শুধু আপডেটটি কিউতে রেখে সাথে সাথে 200 ফেরত দেয়; প্রসেসিং
+    `concurrent_updates` অনুযায়ী ব্যাকগ্রাউন্ডে একসাথে চলে।
+    """
+
+    def __init__(self, application, webhook_url=None, secret_token=None):
+        # secret ছাড়া যে কেউ নকল আপডেট (যেমন অ্যাডমিনের নামে /approve) পাঠাতে পারত
+        if not secret_token:
+            raise RuntimeError("WEBHOOK_SECRET must be set to mount the Telegram webhook")
+        self.application = application
+        self.webhook_url = webhook_url
+        self.secret_token = secret_token
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telegram-bot", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(timeout=30)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._startup())
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _startup(self):
+        await self.application.initialize()
+        if self.webhook_url:
+            await self.application.bot.set_webhook(self.webhook_url, secret_token=self.secret_token,
+                                                   max_connections=BOT_CONCURRENT_UPDATES)
+        await self.application.start()
+        # run_polling/run_webhook নিজে post_init ডাকে, এখানে হাতে ডাকতে হয়
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        logging.info("Telegram bot started in mounted webhook mode")
+
+    def submit(self, payload, secret_token=None):
+        """webhook রিকোয়েস্টের JSON কিউতে দেয়; secret না মিললে False।"""
+        if not hmac.compare_digest(secret_token or '', self.secret_token):
+            return False
+        update = Update.de_json(payload, self.application.bot)
+        asyncio.run_coroutine_threadsafe(self.application.update_queue.put(update), self.loop)
+        return True
@@ -0,0 +1,198 @@
+"""ইউজার প্রোফাইলের জন্য LRU + TTL read-through ক্যাশ।
+
+ব্যাকএন্ড দুই রকম:
+*   `memory` - প্রতিটি gunicorn worker-এর নিজস্ব in-process ক্যাশ।
+*   `sqlite` - একই মেশিনের সব worker একটি লোকাল SQLite ফাইল শেয়ার করে, তাই
+    একটি worker invalidate করলে বাকিরাও সাথে সাথে নতুন ডেটা দেখে।
+*   `auto`   - WEB_CONCURRENCY (gunicorn এর worker সংখ্যা) 1 এর বেশি হলে
+    `sqlite`, নাহলে `memory`। `gunicorn -w N` এ WEB_CONCURRENCY সেট হয় না,
+    তাই ডিফল্ট `sqlite` - এক worker এও এটি নিরাপদ।
+
+sqlite এ প্রতিটি hit এ last_access লেখা হয় না, LRU_TOUCH_INTERVAL সেকেন্ডের
+বেশি পুরনো হলেই হালনাগাদ হয় (আনুমানিক LRU), যাতে রিড WAL এর write lock না নেয়।
+
+অন্য প্রসেস বা মেশিনের লেখা (যেমন আলাদা বট worker এর রেফারেল রিওয়ার্ড) ক্যাশ
+invalidate করে না - সেগুলো সর্বোচ্চ USER_CACHE_TTL সেকেন্ড পরে দেখা যায়।
+
+Environment ভেরিয়েবল:
+    USER_CACHE_BACKEND  auto | memory | sqlite | off   (ডিফল্ট: sqlite)
+    USER_CACHE_SIZE     সর্বোচ্চ কতজন ইউজার ক্যাশে থাকবে (ডিফল্ট: 10000)
+    USER_CACHE_TTL      সেকেন্ডে মেয়াদ (ডিফল্ট: 5)
+    USER_CACHE_PATH     sqlite ব্যাকএন্ডের ফাইল (ডিফল্ট: /tmp/hubcoin_cache.sqlite3)
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+LRU_TOUCH_INTERVAL = 30.0
+
+
+class MemoryCacheBackend:
+    """থ্রেড-সেইফ OrderedDict ভিত্তিক LRU।"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        """এন্ট্রি রাখে এবং কয়টি পুরনো এন্ট্রি বাদ পড়ল তা ফেরত দেয়।"""
+        evicted = 0
+        with self._lock:
+            self._data[key] = (dict(value), expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """একই হোস্টের সব প্রসেসের মধ্যে শেয়ার করা LRU (WAL মোডে)।"""
+
+    def __init__(self, maxsize, path):
+        self.maxsize = maxsize
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS user_cache ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                         "expires_at REAL NOT NULL, last_access REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS user_cache_lru ON user_cache (last_access)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at, last_access FROM user_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] >= LRU_TOUCH_INTERVAL:
+            conn.execute("UPDATE user_cache SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO user_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                     (key, json.dumps(value, default=str), expires_at, time.time()))
+        overflow = conn.execute("SELECT COUNT(*) FROM user_cache").fetchone()[0] - self.maxsize
+        if overflow <= 0:
+            return 0
+        conn.execute("DELETE FROM user_cache WHERE key IN "
+                     "(SELECT key FROM user_cache ORDER BY last_access LIMIT ?)", (overflow,))
+        return overflow
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM user_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM user_cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM user_cache").fetchone()[0]
+
+
+class NullCacheBackend:
+    """ক্যাশ বন্ধ থাকলে ব্যবহার হয় - সব রিড সরাসরি Firestore-এ যায়।"""
+
+    def get(self, key): return None
+    def set(self, key, value, expires_at): return 0
+    def delete(self, key): pass
+    def clear(self): pass
+    def __len__(self): return 0
+
+
+class UserCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'invalidations': 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def get(self, user_id):
+        key = str(user_id)
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count('misses')
+            return None
+        value, expires_at = entry
+        if expires_at < time.time():
+            self.backend.delete(key)
+            self._count('expired')
+            self._count('misses')
+            return None
+        self._count('hits')
+        return dict(value)
+
+    def set(self, user_id, data):
+        evicted = self.backend.set(str(user_id), data, time.time() + self.ttl)
+        if evicted:
+            self._count('evictions', evicted)
+
+    def update(self, user_id, changes):
+        """ক্যাশে থাকা প্রোফাইলে সাধারণ মান বসায়; না থাকলে কিছু করে না।"""
+        current = self.get(user_id)
+        if current is not None:
+            current.update(changes)
+            self.set(user_id, current)
+
+    def invalidate(self, user_id):
+        self.backend.delete(str(user_id))
+        self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRatio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['size'] = len(self.backend)
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+def build_user_cache():
+    kind = os.getenv("USER_CACHE_BACKEND", "sqlite").lower()
+    maxsize = int(os.getenv("USER_CACHE_SIZE", 10000))
+    ttl = float(os.getenv("USER_CACHE_TTL", 5))
+    if kind == 'auto':
+        kind = 'sqlite' if int(os.getenv("WEB_CONCURRENCY", 1)) > 1 else 'memory'
+    if kind == 'sqlite':
+        backend = SQLiteCacheBackend(maxsize, os.getenv("USER_CACHE_PATH", "/tmp/hubcoin_cache.sqlite3"))
+    elif kind == 'off':
+        backend = NullCacheBackend()
+    else:
+        backend = MemoryCacheBackend(maxsize)
+    return UserCache(backend, ttl)
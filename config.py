@@ -0,0 +1,41 @@
+"""ওয়েব (server.py) ও বট (bot.py) দুই entry point-এর সাধারণ কনফিগারেশন।
+
+এখানে শুধু .env ও environment পড়া হয় - Flask, telegram বা firebase_admin এর
+মতো ভারী ইমপোর্ট নেই, তাই দুই প্রসেসই এটি প্রায় বিনা খরচে ইমপোর্ট করে।
+
+Environment ভেরিয়েবল (নিচের গুলো ছাড়াও):
+    WEB_PREWARM  1 দিলে প্রতিটি ওয়েব worker চালু হয়েই ব্যাকগ্রাউন্ডে Firestore
+                 সংযোগ ও লিডারবোর্ড ক্যাশ তৈরি করে (ডিফল্ট: 0)
+"""
+import os
+import logging
+from dotenv import load_dotenv
+
+# --- 1. প্রাথমিক সেটআপ এবং কনফিগারেশন ---
+logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+load_dotenv()
+
+# .env ফাইল থেকে ভেরিয়েবল লোড করা
+BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+FRONTEND_URL = os.getenv("FRONTEND_URL")
+firebase_config_str = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON_STRING")
+ADMIN_TELEGRAM_ID = int(os.getenv("ADMIN_TELEGRAM_ID", 0))
+# বট মোড: 'polling' (ডিফল্ট) অথবা 'webhook'। BOT_WEBHOOK_MOUNT=1 হলে বট ওয়েব অ্যাপের ভেতরেই চলে।
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+BOT_WEBHOOK_MOUNT = os.getenv("BOT_WEBHOOK_MOUNT", "0") == "1"
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip('/')
+WEBHOOK_PATH = "/telegram/webhook"
+# webhook মোডে (আলাদা প্রসেস বা BOT_WEBHOOK_MOUNT) এটি ছাড়া বট চালু হয় না
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+BOT_STATS_LOG_INTERVAL = float(os.getenv("BOT_STATS_LOG_INTERVAL", 300))
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", 30))
+ASSET_PIPELINE = os.getenv("ASSET_PIPELINE", "on").lower() != "off"
+# Join Telegram টাস্ক: TELEGRAM_CHANNEL (@username বা chat id) দিলে বট দিয়ে মেম্বারশিপ যাচাই হয়;
+# না দিলে টাস্কটি বন্ধ (API 404, Mini App-এ লুকানো)
+TELEGRAM_CHANNEL = os.getenv("TELEGRAM_CHANNEL")
+TELEGRAM_CHANNEL_URL = os.getenv("TELEGRAM_CHANNEL_URL") or \
+    (f"https://t.me/{TELEGRAM_CHANNEL.lstrip('@')}" if TELEGRAM_CHANNEL and TELEGRAM_CHANNEL.startswith('@') else None)
+WEB_PREWARM = os.getenv("WEB_PREWARM", "0") == "1"
+# /metrics ও /api/cache/stats: দিলে `Authorization: Bearer <METRICS_TOKEN>` লাগে;
+# না দিলে /metrics আগের মতো খোলা, /api/cache/stats বন্ধ
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
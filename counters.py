@@ -0,0 +1,230 @@
+"""হট ইউজার ডকুমেন্টের জন্য write-behind / sharded কাউন্টার।
+
+একজন রেফারারের লিংকে হাজার জন একসাথে জয়েন করলে সবগুলো `Increment` একই
+ডকুমেন্টে পড়ে, আর Firestore একটি ডকুমেন্টে সেকেন্ডে ~১টি রাইট সহ্য করে।
+তিনটি মোড আছে (`COUNTER_MODE`):
+
+*   `direct`   - আগের মতো প্রতিটি ইভেন্টে সরাসরি update (ডিফল্ট)।
+*   `buffered` - মেমরিতে প্রতি ইউজারের ডেল্টা জমিয়ে `COUNTER_FLUSH_INTERVAL`
+                 সেকেন্ড পরপর batched write (প্রতি commit-এ সর্বোচ্চ ৫০০টি)।
+*   `sharded`  - `users/{id}/counter_shards/{n}` এর যেকোনো একটিতে লেখে; পড়ার
+                 সময় shard গুলো যোগ করা হয় এবং ইউজারের নিজের ট্রানজ্যাকশনে
+                 (gem claim, withdrawal) মূল ডকুমেন্টে ভাঁজ (fold) করা হয়।
+                 shard এর যোগফল প্রসেসে COUNTER_PENDING_TTL সেকেন্ড ক্যাশ থাকে,
+                 তাই প্রতিটি /api/user রিডে shard query হয় না।
+
+buffered মোডে বাফার শুধু সেই প্রসেসের মেমরিতে: বট worker এর জমানো রেফারেল
+ডেল্টা ওয়েব প্রসেসের `overlay()` দেখে না, flush (COUNTER_FLUSH_INTERVAL) হওয়ার
+পরে ডকুমেন্টে আসে। একাধিক প্রসেসে সাথে সাথে দেখাতে হলে `sharded` ব্যবহার করুন।
+"""
+import os
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+
+
+COUNTER_MODE = os.getenv("COUNTER_MODE", "direct").lower()
+COUNTER_FLUSH_INTERVAL = float(os.getenv("COUNTER_FLUSH_INTERVAL", 2))
+COUNTER_MAX_PENDING = int(os.getenv("COUNTER_MAX_PENDING", 1000))
+COUNTER_SHARDS = int(os.getenv("COUNTER_SHARDS", 10))
+COUNTER_PENDING_TTL = float(os.getenv("COUNTER_PENDING_TTL", 5))
+BATCH_LIMIT = 500  # Firestore-এর এক batch-এ সর্বোচ্চ রাইট
+
+
+def _increment(value):
+    # firebase_admin প্রথম রাইটে ইমপোর্ট হয় (sqlite ব্যাকএন্ডে কখনো না)
+    from firebase_admin import firestore
+    return firestore.Increment(value)
+
+
+class DirectCounters:
+    def __init__(self, db, on_write=None):
+        self.db = db
+        # প্রতিটি ইউজারের ডকুমেন্ট লেখার পরে ডাকা হয় (যেমন ক্যাশ invalidate করতে)
+        self.on_write = on_write or (lambda user_id: None)
+
+    def add(self, user_id, deltas):
+        self.db.collection('users').document(str(user_id)).update(
+            {field: _increment(value) for field, value in deltas.items()})
+        self.on_write(str(user_id))
+
+    def pending(self, user_id):
+        return {}
+
+    def overlay(self, user_id, user_data):
+        """এখনো মূল ডকুমেন্টে না পৌঁছানো ডেল্টা প্রোফাইলের সাথে যোগ করে।"""
+        for field, value in self.pending(user_id).items():
+            user_data[field] = user_data.get(field, 0) + value
+        return user_data
+
+    def fold(self, transaction, doc_ref):
+        return {}
+
+    async def fold_async(self, transaction, doc_ref):
+        return {}
+
+    def flush(self):
+        return 0
+
+
+class BufferedCounters(DirectCounters):
+    """একই ইউজারের সব ডেল্টা মেমরিতে যোগ করে পরে একটি রাইটে পাঠায়।"""
+
+    def __init__(self, db, on_write=None, max_pending=COUNTER_MAX_PENDING):
+        super().__init__(db, on_write)
+        self.max_pending = max_pending
+        self._pending = defaultdict(lambda: defaultdict(float))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _merge(self, user_id, deltas):
+        with self._lock:
+            bucket = self._pending[str(user_id)]
+            for field, value in deltas.items():
+                bucket[field] += value
+            return len(self._pending)
+
+    def add(self, user_id, deltas):
+        if self._merge(user_id, deltas) >= self.max_pending:
+            self.flush()
+
+    def pending(self, user_id):
+        with self._lock:
+            deltas = dict(self._pending.get(str(user_id), {}))
+        return {field: _as_number(field, value) for field, value in deltas.items()}
+
+    def flush(self):
+        """জমে থাকা ডেল্টাগুলো batched write এ লেখে; লেখা ডকুমেন্টের সংখ্যা ফেরত দেয়।"""
+        with self._flush_lock:
+            with self._lock:
+                drained, self._pending = self._pending, defaultdict(lambda: defaultdict(float))
+            items = list(drained.items())
+            written = 0
+            for start in range(0, len(items), BATCH_LIMIT):
+                chunk = items[start:start + BATCH_LIMIT]
+                batch = self.db.batch()
+                for user_id, deltas in chunk:
+                    batch.update(self.db.collection('users').document(user_id),
+                                 {field: _increment(_as_number(field, value)) for field, value in deltas.items()})
+                try:
+                    batch.commit()
+                    written += len(chunk)
+                    for user_id, _ in chunk:
+                        self.on_write(user_id)
+                except Exception as e:
+                    # batch পুরোটাই ব্যর্থ হয় - একটি মুছে যাওয়া ইউজার যেন বাকিদের আটকে না রাখে, তাই একটি একটি করে
+                    logging.error(f"Counter flush failed for {len(chunk)} users, retrying one by one: {e}")
+                    written += self._flush_each(chunk)
+            return written
+
+    def _flush_each(self, chunk):
+        written = 0
+        for user_id, deltas in chunk:
+            try:
+                self.db.collection('users').document(user_id).update(
+                    {field: _increment(_as_number(field, value)) for field, value in deltas.items()})
+                written += 1
+                self.on_write(user_id)
+            except Exception as e:
+                if type(e).__name__ == 'NotFound':
+                    # ইউজার আর নেই - আবার চেষ্টা করে লাভ নেই, লগে রেখে বাদ
+                    logging.error(f"Dropping counter deltas for missing user {user_id}: {dict(deltas)}")
+                else:
+                    logging.error(f"Counter flush failed for user {user_id}, will retry: {e}")
+                    self._merge(user_id, deltas)
+        return written
+
+
+class ShardedCounters(DirectCounters):
+    def __init__(self, db, on_write=None, num_shards=COUNTER_SHARDS, pending_ttl=COUNTER_PENDING_TTL):
+        super().__init__(db, on_write)
+        self.num_shards = num_shards
+        self.pending_ttl = pending_ttl
+        self._cached = {}  # user_id -> (মেয়াদ শেষের সময়, shard এর যোগফল)
+        self._lock = threading.Lock()
+
+    def _shards(self, doc_ref):
+        # ট্রানজ্যাকশনে শুধু query পড়া যায়, collection reference নয়
+        return doc_ref.collection('counter_shards').limit(self.num_shards)
+
+    def _forget(self, user_id):
+        with self._lock:
+            self._cached.pop(str(user_id), None)
+
+    def add(self, user_id, deltas):
+        doc_ref = self.db.collection('users').document(str(user_id))
+        shard = doc_ref.collection('counter_shards').document(str(random.randrange(self.num_shards)))
+        shard.set({field: _increment(value) for field, value in deltas.items()}, merge=True)
+        self._forget(user_id)
+        self.on_write(str(user_id))
+
+    def _sum(self, docs):
+        totals = defaultdict(float)
+        for doc in docs:
+            for field, value in doc.to_dict().items():
+                totals[field] += value
+        return {field: _as_number(field, value) for field, value in totals.items()}
+
+    def pending(self, user_id):
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cached.get(user_id)
+        if cached and cached[0] > now:
+            return dict(cached[1])
+        totals = self._sum(self._shards(self.db.collection('users').document(user_id)).stream())
+        with self._lock:
+            if len(self._cached) >= COUNTER_MAX_PENDING:
+                self._cached = {key: entry for key, entry in self._cached.items() if entry[0] > now}
+            self._cached[user_id] = (now + self.pending_ttl, totals)
+        return dict(totals)
+
+    def fold(self, transaction, doc_ref):
+        """ট্রানজ্যাকশনের ভেতরে shard গুলো মূল ডকুমেন্টে যোগ করে মুছে ফেলে।
+
+        Firestore ট্রানজ্যাকশনে সব রিড আগে হতে হয়, তাই snapshot পড়ার পরে কিন্তু
+        অন্য কোনো write-এর আগে ডাকুন। ফেরত দেওয়া ডেল্টা snapshot-এর মানের সাথে
+        যোগ করে হিসাব করতে হবে।
+        """
+        return self._apply_fold(transaction, doc_ref, list(transaction.get(self._shards(doc_ref))))
+
+    async def fold_async(self, transaction, doc_ref):
+        """async ট্রানজ্যাকশনের (asgi.py) জন্য `fold()` এর সমতুল্য।"""
+        docs = [doc async for doc in await transaction.get(self._shards(doc_ref))]
+        return self._apply_fold(transaction, doc_ref, docs)
+
+    def _apply_fold(self, transaction, doc_ref, docs):
+        totals = self._sum(docs)
+        if totals:
+            transaction.update(doc_ref, {field: _increment(value) for field, value in totals.items()})
+        for doc in docs:
+            transaction.delete(doc.reference)
+        self._forget(doc_ref.id)
+        return totals
+
+
+class StorageCounters(DirectCounters):
+    """Firestore ছাড়া অন্য storage (যেমন SQLite) - সেখানে হট ডকুমেন্টের সীমা নেই, তাই সরাসরি atomic increment।"""
+
+    def __init__(self, storage, on_write=None):
+        super().__init__(None, on_write)
+        self.storage = storage
+
+    def add(self, user_id, deltas):
+        self.storage.increment_user(user_id, deltas)
+        self.on_write(str(user_id))
+
+
+def _as_number(field, value):
+    # gems/refs পূর্ণসংখ্যা, balance দশমিক
+    return float(value) if field == 'balance' else int(value)
+
+
+def build_counters(db, on_write=None, mode=COUNTER_MODE):
+    if mode == 'buffered':
+        return BufferedCounters(db, on_write)
+    if mode == 'sharded':
+        return ShardedCounters(db, on_write)
+    return DirectCounters(db, on_write)
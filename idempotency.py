@@ -0,0 +1,128 @@
+"""টাকা/জেম নড়ানো এন্ডপয়েন্টের জন্য Idempotency-Key।
+
+ক্লায়েন্ট প্রতিটি সাবমিটে একটি `Idempotency-Key` হেডার পাঠায় (ডবল-ট্যাপ বা
+টাইমআউটের পরে retry হলে একই কী)। প্রথম রেসপন্সটি TTL সহ রাখা হয়; একই কী
+আবার এলে Firestore না ছুঁয়েই সেই রেসপন্স ফেরত যায়। একই কী একসাথে দুবার
+এলে দ্বিতীয়টি প্রথমটির শেষ হওয়ার অপেক্ষা করে।
+
+ফলাফল রাখার জন্য cache.py এর ব্যাকএন্ডই ব্যবহার হয় - `memory` প্রতিটি
+worker-এর নিজের, `sqlite` সব worker শেয়ার করে। worker-এর বাইরের ডুপ্লিকেটের
+শেষ সুরক্ষা হলো ট্রানজ্যাকশনের ভেতরে কী দিয়ে লেখা withdrawal ডকুমেন্ট।
+
+Environment ভেরিয়েবল:
+    IDEMPOTENCY_BACKEND  memory | sqlite   (ডিফল্ট: memory)
+    IDEMPOTENCY_TTL      রেসপন্স কত সেকেন্ড রাখা হবে (ডিফল্ট: 600)
+    IDEMPOTENCY_SIZE     সর্বোচ্চ কতটি রেসপন্স রাখা হবে (ডিফল্ট: 20000)
+    IDEMPOTENCY_PATH     sqlite ব্যাকএন্ডের ফাইল (ডিফল্ট: /tmp/hubcoin_idempotency.sqlite3)
+"""
+import os
+import re
+import time
+import asyncio
+import threading
+
+from cache import MemoryCacheBackend, SQLiteCacheBackend
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 600))
+IN_FLIGHT_WAIT = 30  # একই কী-এর আগের রিকোয়েস্টের জন্য সর্বোচ্চ অপেক্ষা (সেকেন্ড)
+_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def valid_key(key):
+    return bool(key and _KEY_PATTERN.match(key))
+
+
+class IdempotencyStore:
+    def __init__(self, backend, ttl=IDEMPOTENCY_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> threading.Event বা asyncio.Future
+        self.stats = {'replayed': 0, 'waited': 0, 'stored': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.time():
+            self.backend.delete(key)
+            return None
+        return value['payload'], value['status']
+
+    def _store(self, key, payload, status):
+        # সার্ভার এরর রাখা হয় না, যাতে retry আবার চেষ্টা করতে পারে
+        if status < 500:
+            self.backend.set(key, {'payload': payload, 'status': status}, time.time() + self.ttl)
+            self._count('stored')
+
+    def run(self, key, compute):
+        """`compute() -> (payload, status)` একবারই চালায়; `(payload, status, replayed)` ফেরত দেয়।"""
+        if key is None:
+            return (*compute(), False)
+        owned = None
+        while True:
+            stored = self.lookup(key)
+            if stored is not None:
+                self._count('replayed')
+                return (*stored, True)
+            with self._lock:
+                event = self._in_flight.get(key)
+                if event is None:
+                    owned = self._in_flight[key] = threading.Event()
+            if owned is not None:
+                break
+            self._count('waited')
+            if not event.wait(IN_FLIGHT_WAIT):
+                break
+        try:
+            payload, status = compute()
+            self._store(key, payload, status)
+            return payload, status, False
+        finally:
+            if owned is not None:
+                with self._lock:
+                    del self._in_flight[key]
+                owned.set()
+
+    async def run_async(self, key, compute):
+        """`run()` এর async সংস্করণ; compute একটি coroutine ফাংশন।"""
+        if key is None:
+            return (*await compute(), False)
+        owned = None
+        while True:
+            stored = await asyncio.to_thread(self.lookup, key)
+            if stored is not None:
+                self._count('replayed')
+                return (*stored, True)
+            waiter = self._in_flight.get(key)
+            if waiter is None:
+                owned = self._in_flight[key] = asyncio.get_running_loop().create_future()
+                break
+            self._count('waited')
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), IN_FLIGHT_WAIT)
+            except asyncio.TimeoutError:
+                break
+        try:
+            payload, status = await compute()
+            await asyncio.to_thread(self._store, key, payload, status)
+            return payload, status, False
+        finally:
+            if owned is not None:
+                del self._in_flight[key]
+                owned.set_result(None)
+
+
+def build_idempotency_store():
+    kind = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+    maxsize = int(os.getenv("IDEMPOTENCY_SIZE", 20000))
+    if kind == 'sqlite':
+        backend = SQLiteCacheBackend(maxsize, os.getenv("IDEMPOTENCY_PATH", "/tmp/hubcoin_idempotency.sqlite3"))
+    else:
+        backend = MemoryCacheBackend(maxsize)
+    return IdempotencyStore(backend)
@@ -0,0 +1,178 @@
+"""ইনক্রিমেন্টাল top-N লিডারবোর্ড।
+
+প্রতিটি বোর্ড মেমরিতে একটি sorted তালিকা রাখে। কোনো ইউজারের স্কোর বদলালে
+`record()` দিয়ে সাথে সাথে আপডেট হয়, আর `flush()` সেটি storage-এর
+`leaderboard/{doc}` ডকুমেন্টে মার্জ করে লেখে। পুরো `users` কালেকশন স্ক্যান
+(`reconcile()`) শুধু মাঝে মাঝে সংশোধনের জন্য চলে।
+
+Environment ভেরিয়েবল:
+    LEADERBOARD_SIZE               প্রতিটি বোর্ডে কতজন দেখানো হবে (ডিফল্ট: 20)
+    LEADERBOARD_FLUSH_INTERVAL     কত সেকেন্ড পরপর Firestore-এ লেখা হবে (ডিফল্ট: 60)
+    LEADERBOARD_RECONCILE_INTERVAL কত সেকেন্ড পরপর পুরো স্ক্যান হবে (ডিফল্ট: 86400)
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+from datetime import datetime, timezone
+
+from storage import SERVER_TIMESTAMP
+
+# বোর্ডের নাম -> (leaderboard কালেকশনের ডকুমেন্ট, users ডকুমেন্টের ফিল্ড)
+BOARDS = {
+    'withdrawn': {'doc': 'top_players', 'field': 'totalWithdrawn'},
+    'refs': {'doc': 'top_refs', 'field': 'refs'},
+    'gems': {'doc': 'top_gems', 'field': 'gems'},
+    'weekly': {'doc': 'top_weekly', 'field': 'weeklyWithdrawn', 'period': 'week'},
+}
+
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 20))
+LEADERBOARD_FLUSH_INTERVAL = float(os.getenv("LEADERBOARD_FLUSH_INTERVAL", 60))
+LEADERBOARD_RECONCILE_INTERVAL = float(os.getenv("LEADERBOARD_RECONCILE_INTERVAL", 86400))
+
+
+def current_week_key(now=None):
+    year, week, _ = (now or datetime.now(timezone.utc)).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class TopN:
+    """স্কোর অনুযায়ী সাজানো সীমিত আকারের তালিকা।
+
+    দেখানো হয় `size` জন, কিন্তু রাখা হয় `capacity` জন, যাতে কারও স্কোর
+    কমে গেলে তার নিচের জন তালিকায় উঠে আসতে পারে।
+    """
+
+    def __init__(self, size, capacity=None):
+        self.size = size
+        self.capacity = capacity or size * 2
+        self._order = []      # (-score, user_id), ছোট থেকে বড়
+        self._entries = {}    # user_id -> {'username', 'score', 'updatedAt'}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def offer(self, user_id, username, score, updated_at=None):
+        """নতুন স্কোর বসায়; তালিকা বদলালে True ফেরত দেয়।"""
+        user_id = str(user_id)
+        updated_at = updated_at if updated_at is not None else time.time()
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry['updatedAt'] > updated_at:
+                return False
+            if entry['score'] == score and entry['username'] == username:
+                entry['updatedAt'] = updated_at
+                return False
+            self._order.remove((-entry['score'], user_id))
+        elif len(self._entries) >= self.capacity and -score >= self._order[-1][0]:
+            return False
+        self._entries[user_id] = {'username': username, 'score': score, 'updatedAt': updated_at}
+        bisect.insort(self._order, (-score, user_id))
+        while len(self._order) > self.capacity:
+            _, dropped = self._order.pop()
+            del self._entries[dropped]
+        return True
+
+    def clear(self):
+        self._order.clear()
+        self._entries.clear()
+
+    def ranked(self, field, limit=None):
+        limit = self.size if limit is None else min(limit, self.size)
+        players = []
+        for rank, (_, user_id) in enumerate(self._order[:limit], start=1):
+            entry = self._entries[user_id]
+            players.append({'rank': rank, 'userId': user_id, 'username': entry['username'],
+                            field: entry['score'], 'updatedAt': entry['updatedAt']})
+        return players
+
+
+class LeaderboardEngine:
+    def __init__(self, storage, size=LEADERBOARD_SIZE, flush_interval=LEADERBOARD_FLUSH_INTERVAL):
+        self.storage = storage
+        self.size = size
+        self.flush_interval = flush_interval
+        self.boards = {name: TopN(size) for name in BOARDS}
+        self._periods = {name: current_week_key() for name, cfg in BOARDS.items() if cfg.get('period')}
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+    def _roll_period(self, board):
+        """সাপ্তাহিক বোর্ডে নতুন সপ্তাহ শুরু হলে পুরনো তালিকা মুছে দেয়।"""
+        if board in self._periods and self._periods[board] != current_week_key():
+            self._periods[board] = current_week_key()
+            self.boards[board].clear()
+            self._dirty.add(board)
+
+    def record(self, board, user_id, username, score):
+        """কোনো ইউজারের নতুন স্কোর জানায় (যেমন totalWithdrawn বাড়লে)।"""
+        with self._lock:
+            self._roll_period(board)
+            if self.boards[board].offer(user_id, username or 'N/A', score):
+                self._dirty.add(board)
+
+    def top(self, board, limit=None):
+        with self._lock:
+            self._roll_period(board)
+            return self.boards[board].ranked(BOARDS[board]['field'], limit)
+
+    def flush(self, force=False):
+        """পরিবর্তিত বোর্ডগুলো সংরক্ষিত ডকুমেন্টের সাথে মার্জ করে লেখে।
+
+        একাধিক প্রসেস (gunicorn worker, bot) একই বোর্ডে লিখতে পারে, তাই
+        ট্রানজ্যাকশনে আগের তালিকা পড়ে নতুনটার সাথে মিলিয়ে তারপর লেখা হয়।
+        """
+        with self._lock:
+            boards = set(BOARDS) if force else set(self._dirty)
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+        for board in boards:
+            try:
+                self._merge_and_write(board)
+            except Exception as e:
+                logging.error(f"Leaderboard flush failed for '{board}': {e}")
+                with self._lock:
+                    self._dirty.add(board)
+        return len(boards)
+
+    def maybe_flush(self):
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _merge_and_write(self, board):
+        field = BOARDS[board]['field']
+
+        def merge(stored):
+            with self._lock:
+                self._roll_period(board)
+                if stored.get('period') == self._periods.get(board):
+                    # userId ছাড়া পুরনো সারি বাদ: username কী হিসেবে নিলে একই ইউজার দুইবার দেখা যেত
+                    for player in stored.get('players', []):
+                        if 'userId' not in player:
+                            continue
+                        self.boards[board].offer(player['userId'], player['username'],
+                                                 player.get(field, 0), player.get('updatedAt', 0))
+                players = self.boards[board].ranked(field)
+            return {'players': players, 'period': self._periods.get(board), 'lastUpdated': SERVER_TIMESTAMP}
+        self.storage.merge_document('leaderboard', BOARDS[board]['doc'], merge)
+
+    def reconcile(self, board):
+        """পুরো users কালেকশন থেকে বোর্ডটি নতুন করে তৈরি করে (ভারী কাজ, মাঝে মাঝে চালান)।"""
+        cfg = BOARDS[board]
+        equals = {'weekKey': current_week_key()} if cfg.get('period') else None
+        rows = self.storage.top_users(cfg['field'], self.boards[board].capacity, equals)
+        now = time.time()
+        with self._lock:
+            self._roll_period(board)
+            self.boards[board].clear()
+            for user_id, data in rows:
+                self.boards[board].offer(user_id, data.get('username', 'N/A'), data.get(cfg['field'], 0), now)
+            players = self.boards[board].ranked(cfg['field'])
+        self.storage.set_document('leaderboard', cfg['doc'], {'players': players, 'period': self._periods.get(board),
+                                                             'lastUpdated': SERVER_TIMESTAMP})
+        return len(players)
+
+    def reconcile_all(self):
+        return {board: self.reconcile(board) for board in BOARDS}
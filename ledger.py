@@ -0,0 +1,174 @@
+"""ব্যালান্সের append-only লেজার ও snapshot।
+
+ইউজারের `balance`, `gems` বা `unclaimedGems` যতবার বদলায় ততবার
+`users/{id}/ledger` সাবকালেকশনে একটি ইভেন্ট লেখা হয় - রেফারেল রিওয়ার্ড,
+gem claim, উইথড্রয়াল ও রিজেক্টের রিফান্ড। claim ও withdrawal এর ইভেন্ট একই
+ট্রানজ্যাকশনে লেখা হয়, রিফান্ড একই batch-এ। ইভেন্টের আইডি সময় দিয়ে শুরু হয়
+(মাইক্রোসেকেন্ড + র‍্যান্ডম), তাই আইডি অনুযায়ী সাজালেই সময়ের ক্রম পাওয়া যায়।
+
+ইউজার ডকুমেন্টের `ledgerSnapshot` হলো `eventId` পর্যন্ত সব ইভেন্টের যোগফল।
+reconcile করতে শুধু তার পরের ইভেন্ট replay করলেই হয়: snapshot + নতুন ইভেন্ট
+= ডকুমেন্টের বর্তমান মান, না মিললে সেটি drift। `ledgerPending` গোনে snapshot
+এর পরে কতটি ইভেন্ট এসেছে; LEDGER_SNAPSHOT_EVERY ছাড়ালে রিকোয়েস্ট শেষে
+compaction চলে (snapshot সামনে এগোয়, ইভেন্ট মোছা হয় না)।
+
+সদ্য লেখা ইভেন্ট snapshot-এ ঢোকে না (LEDGER_SETTLE_SECONDS) - অন্য worker-এ
+একটু আগের আইডি নিয়ে কোনো ট্রানজ্যাকশন তখনো commit এর পথে থাকতে পারে।
+লেজারের আগের ইউজারদের snapshot নেই; প্রথম compaction তাদের বর্তমান মানকেই
+opening balance ধরে নেয়।
+
+Environment ভেরিয়েবল:
+    LEDGER_SNAPSHOT_EVERY   কতটি নতুন ইভেন্টের পরে snapshot (ডিফল্ট: 25)
+    LEDGER_SETTLE_SECONDS   এর চেয়ে নতুন ইভেন্ট snapshot-এ যায় না (ডিফল্ট: 60)
+    LEDGER_PAGE_SIZE        replay করার সময় প্রতি পাতায় কতটি ইভেন্ট (ডিফল্ট: 200)
+"""
+import os
+import time
+import uuid
+import logging
+
+from storage import SERVER_TIMESTAMP
+
+LEDGER_SNAPSHOT_EVERY = int(os.getenv("LEDGER_SNAPSHOT_EVERY", 25))
+LEDGER_SETTLE_SECONDS = float(os.getenv("LEDGER_SETTLE_SECONDS", 60))
+LEDGER_PAGE_SIZE = int(os.getenv("LEDGER_PAGE_SIZE", 200))
+LEDGER_FIELDS = ('balance', 'gems', 'unclaimedGems')
+HISTORY_MAX_LIMIT = 100
+
+
+def ledger_collection(user_id):
+    return f"users/{user_id}/ledger"
+
+
+def new_event_id(now=None):
+    micros = int((time.time() if now is None else now) * 1_000_000)
+    return f"{micros:016d}-{uuid.uuid4().hex[:8]}"
+
+
+def event_time(event_id):
+    return int(event_id[:16]) / 1_000_000
+
+
+def empty_snapshot():
+    """নতুন ইউজারের snapshot - কোনো ইভেন্ট নেই, সব শূন্য।"""
+    return {'eventId': None, 'events': 0, 'balance': 0.0, 'gems': 0, 'unclaimedGems': 0}
+
+
+def event_record(user_id, kind, deltas, ref=None):
+    """`(collection, event_id, data)` - storage-এর records বা batch write এ সরাসরি দেওয়া যায়।"""
+    data = {'type': kind, 'deltas': {field: value for field, value in deltas.items() if field in LEDGER_FIELDS and value},
+            'timestamp': SERVER_TIMESTAMP}
+    if ref is not None:
+        data['ref'] = str(ref)
+    return ledger_collection(user_id), new_event_id(), data
+
+
+class Ledger:
+    def __init__(self, storage, overlay=None, snapshot_every=LEDGER_SNAPSHOT_EVERY,
+                 settle_seconds=LEDGER_SETTLE_SECONDS, page_size=LEDGER_PAGE_SIZE):
+        self.storage = storage
+        # এখনো ডকুমেন্টে না পৌঁছানো রেফারেল ডেল্টা যোগ করে (counters.py এর overlay)
+        self.overlay = overlay or (lambda user_id, user: user)
+        self.snapshot_every = snapshot_every
+        self.settle_seconds = settle_seconds
+        self.page_size = page_size
+
+    def attach(self, user_id, user, change, kind, ref=None):
+        """plan এর change-এ ইভেন্ট ও `ledgerPending` যোগ করে; snapshot নেওয়ার সময় হলে True।"""
+        increments = change.get('increments') or {}
+        change['records'] = (change.get('records') or []) + [event_record(user_id, kind, increments, ref)]
+        change['increments'] = {**increments, 'ledgerPending': 1}
+        return user.get('ledgerPending', 0) + 1 >= self.snapshot_every
+
+    def append(self, user_id, kind, deltas, ref=None):
+        """ট্রানজ্যাকশনের বাইরের পরিবর্তনের (যেমন রেফারেল কাউন্টার) ইভেন্ট আলাদা রাইটে।
+
+        ডকুমেন্টের পরিবর্তনের সাথে `ledgerPending: 1` ও যোগ করতে হবে, নাহলে compaction
+        এই ইভেন্টগুলো গোনে না।
+        """
+        self.storage.set_document(*event_record(user_id, kind, deltas, ref))
+
+    def history(self, user_id, limit=20, cursor=None):
+        """নতুন থেকে পুরনো `(events, next_cursor)`; প্রতিটি ইভেন্টে তার `id` থাকে।"""
+        limit = max(1, min(int(limit), HISTORY_MAX_LIMIT))
+        rows, next_cursor = self.storage.page_documents(ledger_collection(user_id), limit=limit,
+                                                        cursor=cursor, descending=True)
+        return [dict(data, id=event_id) for event_id, data in rows], next_cursor
+
+    def iter_since(self, user_id, event_id=None):
+        """event_id এর পরের ইভেন্টগুলো পুরনো থেকে নতুন, পাতা ধরে।"""
+        cursor = event_id
+        while True:
+            rows, cursor = self.storage.page_documents(ledger_collection(user_id), limit=self.page_size, cursor=cursor)
+            yield from rows
+            if cursor is None:
+                return
+
+    def _replay(self, user_id):
+        user = self.storage.get_user(user_id)
+        if user is None:
+            raise KeyError(f"user {user_id} does not exist")
+        snapshot = user.get('ledgerSnapshot')
+        base = {field: (snapshot or {}).get(field, 0) for field in LEDGER_FIELDS}
+        expected, settled = dict(base), dict(base)
+        settled_id, settled_count, replayed = (snapshot or {}).get('eventId'), 0, 0
+        cutoff = time.time() - self.settle_seconds
+        for event_id, data in self.iter_since(user_id, (snapshot or {}).get('eventId')):
+            replayed += 1
+            is_settled = event_time(event_id) <= cutoff
+            for field, value in (data.get('deltas') or {}).items():
+                expected[field] = expected.get(field, 0) + value
+                if is_settled:
+                    settled[field] = settled.get(field, 0) + value
+            if is_settled:
+                settled_id, settled_count = event_id, settled_count + 1
+        actual = self.overlay(user_id, dict(user))
+        actual = {field: actual.get(field, 0) for field in LEDGER_FIELDS}
+        if snapshot is None:
+            # লেজারের আগের ইউজার: বর্তমান মান থেকে ইভেন্টগুলো বাদ দিলে opening balance
+            opening = {field: actual[field] - expected[field] for field in LEDGER_FIELDS}
+            settled = {field: settled[field] + opening[field] for field in LEDGER_FIELDS}
+            expected = dict(actual)
+        drift = {field: round(actual[field] - expected[field], 6) for field in LEDGER_FIELDS
+                 if round(actual[field] - expected[field], 6)}
+        report = {'userId': str(user_id), 'snapshotEventId': (snapshot or {}).get('eventId'), 'opening': snapshot is None,
+                  'replayed': replayed, 'expected': expected, 'actual': actual, 'drift': drift, 'compacted': 0}
+        return report, snapshot, settled_id, settled_count, settled
+
+    def replay(self, user_id):
+        """শেষ snapshot এর পরের ইভেন্ট replay করে ডকুমেন্টের সাথে মেলায় (কিছু লেখে না)।"""
+        return self._replay(user_id)[0]
+
+    def compact(self, user_id):
+        """settled ইভেন্টগুলো snapshot-এ যোগ করে; replay রিপোর্ট ফেরত দেয়।"""
+        report, snapshot, settled_id, settled_count, settled = self._replay(user_id)
+        if not settled_count and snapshot is not None:
+            return report
+        new_snapshot = {**settled, 'eventId': settled_id, 'at': time.time(),
+                        'events': (snapshot or {}).get('events', 0) + settled_count}
+        applied = False
+
+        def merge(stored):
+            nonlocal applied
+            # অন্য worker-এর compaction আগে শেষ হলে কিছু বদলায় না
+            applied = stored.get('ledgerSnapshot') == snapshot
+            if not applied:
+                return stored
+            return {**stored, 'ledgerSnapshot': new_snapshot,
+                    'ledgerPending': max(0, stored.get('ledgerPending', 0) - settled_count)}
+        self.storage.merge_document('users', str(user_id), merge)
+        if applied:
+            report['compacted'] = settled_count
+        if report['drift']:
+            logging.warning(f"Ledger drift for user {user_id}: {report['drift']}")
+        return report
+
+
+def format_replay(report):
+    lines = [f"📒 Ledger for {report['userId']}" + (" (opening snapshot)" if report['opening'] else ""),
+             f"Replayed {report['replayed']} events since {report['snapshotEventId'] or 'start'}, "
+             f"compacted {report['compacted']}."]
+    for field in LEDGER_FIELDS:
+        lines.append(f"• {field}: ledger {report['expected'][field]} / stored {report['actual'][field]}")
+    lines.append(f"⚠️ Drift: {report['drift']}" if report['drift'] else "✅ No drift.")
+    return "\n".join(lines)
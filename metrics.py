@@ -0,0 +1,223 @@
+"""রিকোয়েস্ট, Firestore কল, ট্রানজ্যাকশন retry এবং বট হ্যান্ডলারের মেট্রিক।
+
+সব কিছু প্রসেসের মেমরিতে থাকে এবং `/metrics` এ Prometheus text ফরম্যাটে
+পাওয়া যায়। gunicorn-এর প্রতিটি worker নিজের হিসাব রাখে, তাই স্ক্রেপ করা
+রেসপন্সটি যে worker উত্তর দিয়েছে শুধু তার।
+
+Firestore কলের জায়গায় `with track_firestore('read'):` লিখলে কলটির সময়
+গোনা হয় এবং চলতি রিকোয়েস্টের হিসাবেও যোগ হয়। `@firestore.transactional`
+এর ভেতরের ফাংশনে `@track_transaction('name')` দিলে প্রতিটি চেষ্টা (attempt)
+গোনা হয়; একই রিকোয়েস্টে দ্বিতীয়বার চললে সেটি retry।
+
+Environment ভেরিয়েবল:
+    METRICS_LOG_REQUESTS  1 দিলে প্রতিটি রিকোয়েস্টের জন্য এক লাইন JSON লগ (ডিফল্ট: 0)
+"""
+import os
+import json
+import time
+import bisect
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+METRICS_LOG_REQUESTS = os.getenv("METRICS_LOG_REQUESTS", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50)
+
+
+class Histogram:
+    """লেবেল অনুযায়ী আলাদা cumulative bucket সহ Prometheus ধাঁচের হিস্টোগ্রাম।"""
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.labels, self.buckets = name, help_text, labels, buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            items = [(key, list(series)) for key, series in items]
+        for label_values, series in items:
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {round(series[-2], 6)}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name, self.help_text, self.labels = name, help_text, labels
+        self._lock = threading.Lock()
+        self._values = defaultdict(int)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{{{_labels(self.labels, key)}}} {value}" for key, value in items)
+        return lines
+
+
+def _labels(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_latency = Histogram("hubcoin_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+requests_total = Counter("hubcoin_http_requests_total", "HTTP responses by route and status.", ("route", "method", "status"))
+firestore_latency = Histogram("hubcoin_firestore_call_duration_seconds", "Firestore call latency by operation.", ("op",))
+firestore_reads_per_request = Histogram("hubcoin_firestore_reads_per_request", "Firestore reads per HTTP request.",
+                                        ("route",), COUNT_BUCKETS)
+firestore_writes_per_request = Histogram("hubcoin_firestore_writes_per_request", "Firestore writes per HTTP request.",
+                                         ("route",), COUNT_BUCKETS)
+transaction_attempts = Counter("hubcoin_transaction_attempts_total", "Transaction function attempts.", ("name",))
+transaction_retries = Counter("hubcoin_transaction_retries_total", "Transaction attempts after the first one.", ("name",))
+handler_latency = Histogram("hubcoin_bot_handler_duration_seconds", "Telegram bot handler latency.", ("handler",))
+handler_errors = Counter("hubcoin_bot_handler_errors_total", "Telegram bot handler exceptions.", ("handler",))
+rate_limited = Counter("hubcoin_rate_limited_total", "Requests rejected by the rate limiter.", ("scope", "kind"))
+
+_collectors = []  # () -> {metric name: value}, যেমন ক্যাশের stats
+
+
+def register_collector(fn):
+    """স্ক্রেপের সময় ডাকা হবে এমন gauge সোর্স যোগ করে।"""
+    _collectors.append(fn)
+    return fn
+
+
+# --- রিকোয়েস্ট প্রতি হিসাব ---
+class RequestStats:
+    __slots__ = ('started', 'reads', 'writes', 'firestore_seconds', 'attempts')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.reads = self.writes = 0
+        self.firestore_seconds = 0.0
+        self.attempts = defaultdict(int)
+
+
+_current = contextvars.ContextVar('hubcoin_request_stats', default=None)
+
+
+def begin_request():
+    _current.set(RequestStats())
+
+
+def end_request(route, method, status):
+    """রিকোয়েস্ট শেষে হিস্টোগ্রাম আপডেট করে; লগ চালু থাকলে JSON লাইন লেখে।"""
+    stats = _current.get()
+    if stats is None:
+        return
+    _current.set(None)
+    elapsed = time.perf_counter() - stats.started
+    request_latency.observe(elapsed, route, method)
+    requests_total.inc(route, method, status)
+    firestore_reads_per_request.observe(stats.reads, route)
+    firestore_writes_per_request.observe(stats.writes, route)
+    if METRICS_LOG_REQUESTS:
+        logging.info(json.dumps({
+            'event': 'request', 'route': route, 'method': method, 'status': status,
+            'ms': round(elapsed * 1000, 2), 'firestoreReads': stats.reads, 'firestoreWrites': stats.writes,
+            'firestoreMs': round(stats.firestore_seconds * 1000, 2),
+            'transactionAttempts': dict(stats.attempts),
+        }))
+
+
+@contextmanager
+def track_firestore(op, count=1):
+    """একটি Firestore কলের সময় মাপে; op হলো 'read', 'write' বা 'transaction'।
+
+    'transaction' পুরো ট্রানজ্যাকশন (retry ও commit সহ) মাপে; এর ভেতরের
+    read/write আলাদাভাবে গোনা হয় বলে রিকোয়েস্টের Firestore সময়ে এটি যোগ হয় না।
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        firestore_latency.observe(elapsed, op)
+        stats = _current.get()
+        if stats is not None:
+            if op != 'transaction':
+                stats.firestore_seconds += elapsed
+            if op == 'read':
+                stats.reads += count
+            elif op == 'write':
+                stats.writes += count
+
+
+def track_transaction(name):
+    """transactional ফাংশনের প্রতিটি চেষ্টা গোনে (sync ও async দুটোই)।"""
+    def record():
+        transaction_attempts.inc(name)
+        stats = _current.get()
+        if stats is not None:
+            if stats.attempts[name]:
+                transaction_retries.inc(name)
+            stats.attempts[name] += 1
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                record()
+                return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            record()
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_handler(name, seconds, failed=False):
+    handler_latency.observe(seconds, name)
+    if failed:
+        handler_errors.inc(name)
+
+
+def render():
+    """সব মেট্রিক Prometheus text exposition ফরম্যাটে।"""
+    lines = []
+    for metric in (request_latency, requests_total, firestore_latency, firestore_reads_per_request,
+                   firestore_writes_per_request, transaction_attempts, transaction_retries,
+                   handler_latency, handler_errors, rate_limited):
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            values = collector()
+        except Exception as e:
+            logging.error(f"Metrics collector failed: {e}")
+            continue
+        for name, value in values.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
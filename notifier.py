@@ -0,0 +1,290 @@
+"""টেলিগ্রামে বাইরে যাওয়া মেসেজের কিউ (রেফারেল নোটিফিকেশন, ব্রডকাস্ট)।
+
+*   মেসেজগুলো লোকাল SQLite ফাইলে থাকে, তাই প্রসেস রিস্টার্ট হলেও হারায় না।
+*   token bucket দিয়ে গ্লোবাল (NOTIFY_GLOBAL_RATE/সেকেন্ড) এবং প্রতি চ্যাট
+    (NOTIFY_CHAT_RATE/সেকেন্ড) সীমা মানা হয়।
+*   একই রেফারারের জন্য অল্প সময়ে আসা নোটিফিকেশন একটিতে মিলিয়ে দেওয়া হয়
+    ("5 friends joined")।
+*   429 এলে টেলিগ্রামের retry_after পর্যন্ত থামে, অন্য ত্রুটিতে backoff দিয়ে
+    আবার চেষ্টা করে।
+*   token bucket প্রসেসের মেমরিতে, তাই একই কিউ ফাইলে একসাথে শুধু একটি প্রসেস
+    পাঠায় (`<NOTIFY_QUEUE_PATH>.lock` এর lock যার কাছে); বাকিরা শুধু কিউতে রাখে।
+*   SQLite এর কাজ আলাদা থ্রেডে চলে, বটের event loop আটকায় না।
+
+Environment ভেরিয়েবল:
+    NOTIFY_QUEUE_PATH        SQLite ফাইল (ডিফল্ট: hubcoin_outbox.sqlite3)
+    NOTIFY_GLOBAL_RATE       সব চ্যাট মিলিয়ে সেকেন্ডে মেসেজ (ডিফল্ট: 25)
+    NOTIFY_CHAT_RATE         এক চ্যাটে সেকেন্ডে মেসেজ (ডিফল্ট: 1)
+    NOTIFY_COALESCE_WINDOW   রেফারেল নোটিফিকেশন কত সেকেন্ড জমিয়ে রাখা হবে (ডিফল্ট: 5)
+    NOTIFY_MAX_ATTEMPTS      কতবার চেষ্টা করে বাদ দেওয়া হবে (ডিফল্ট: 5)
+"""
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from rewards import REFERRAL_LEVEL_REWARDS
+
+
+NOTIFY_QUEUE_PATH = os.getenv("NOTIFY_QUEUE_PATH", "hubcoin_outbox.sqlite3")
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", 25))
+NOTIFY_CHAT_RATE = float(os.getenv("NOTIFY_CHAT_RATE", 1))
+NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", 5))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", 5))
+
+PRIORITY_DIRECT, PRIORITY_BROADCAST = 0, 1
+STALE_CLAIM_SECONDS = 300
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """429 পেলে নির্দিষ্ট সময় পর্যন্ত কোনো টোকেন দেয় না।"""
+        self.tokens = -seconds * self.rate
+        self.updated = time.monotonic()
+
+
+def reward_text(deltas, count=1):
+    parts = [f"{deltas['balance'] * count:g} TK"] if deltas.get('balance') else []
+    if deltas.get('unclaimedGems'):
+        parts.append(f"{deltas['unclaimedGems'] * count} Gems")
+    return " and ".join(parts)
+
+
+def render(kind, payload):
+    if kind == 'referral':
+        count, names, level = payload['count'], payload['names'], payload.get('level', 1)
+        reward = reward_text(REFERRAL_LEVEL_REWARDS[level - 1], count)
+        if level > 1:
+            who = names[0] if count == 1 else f"{count} friends"
+            return f"🎉 {who} joined through your level {level} referral network. You received {reward}!"
+        if count == 1:
+            return f"🎉 Congratulations! {names[0]} joined using your link. You received {reward}!"
+        others = f" and {count - len(names)} others" if count > len(names) else ""
+        return (f"🎉 Congratulations! {count} friends joined using your link ({', '.join(names)}{others}). "
+                f"You received {reward}!")
+    return payload['text']
+
+
+class Notifier:
+    def __init__(self, path=NOTIFY_QUEUE_PATH, global_rate=NOTIFY_GLOBAL_RATE, chat_rate=NOTIFY_CHAT_RATE):
+        self.path = path
+        self.owner = uuid.uuid4().hex
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self._chat_buckets = OrderedDict()
+        self._local = threading.local()
+        self._sender_lock = None
+        self._stop = asyncio.Event()
+        self.stats = {'sent': 0, 'coalesced': 0, 'retried': 0, 'dropped': 0, 'rateLimited': 0}
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id TEXT NOT NULL, kind TEXT NOT NULL, "
+                         "payload TEXT NOT NULL, coalesce_key TEXT, priority INTEGER NOT NULL DEFAULT 0, "
+                         "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, "
+                         "state TEXT NOT NULL DEFAULT 'pending', owner TEXT, claimed_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (state, priority, next_attempt)")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_coalesce ON outbox (coalesce_key, state)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- কিউতে মেসেজ রাখা ---
+    def enqueue(self, chat_id, text, priority=PRIORITY_DIRECT):
+        self._conn().execute("INSERT INTO outbox (chat_id, kind, payload, priority, next_attempt) VALUES (?, 'text', ?, ?, ?)",
+                             (str(chat_id), json.dumps({'text': text}), priority, time.time()))
+
+    def enqueue_many(self, chat_ids, text, priority=PRIORITY_BROADCAST):
+        payload, now = json.dumps({'text': text}), time.time()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT INTO outbox (chat_id, kind, payload, priority, next_attempt) VALUES (?, 'text', ?, ?, ?)",
+                             ((str(chat_id), payload, priority, now) for chat_id in chat_ids))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def enqueue_referral(self, chat_id, friend_name, level=1):
+        """রেফারেল নোটিফিকেশন; একই রেফারারের অপেক্ষমাণ মেসেজ থাকলে তার সাথে মিলিয়ে দেয়।"""
+        key = f"referral:{chat_id}" if level == 1 else f"referral:{chat_id}:{level}"
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id, payload FROM outbox WHERE coalesce_key = ? AND state = 'pending'", (key,)).fetchone()
+            if row is not None:
+                payload = json.loads(row[1])
+                payload['count'] += 1
+                if len(payload['names']) < 3:
+                    payload['names'].append(friend_name)
+                conn.execute("UPDATE outbox SET payload = ? WHERE id = ?", (json.dumps(payload), row[0]))
+                self.stats['coalesced'] += 1
+            else:
+                conn.execute("INSERT INTO outbox (chat_id, kind, payload, coalesce_key, priority, next_attempt) "
+                             "VALUES (?, 'referral', ?, ?, ?, ?)",
+                             (str(chat_id), json.dumps({'count': 1, 'names': [friend_name], 'level': level}), key, PRIORITY_DIRECT,
+                              time.time() + NOTIFY_COALESCE_WINDOW))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def depth(self):
+        return self._conn().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # --- পাঠানো ---
+    def _claim(self, limit):
+        """এই প্রসেসের জন্য সময় হয়ে যাওয়া কয়েকটি মেসেজ নিয়ে নেয় (একাধিক প্রসেস থাকলেও একবারই যাবে)।"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE outbox SET state = 'pending', owner = NULL WHERE state = 'sending' AND claimed_at < ?",
+                         (now - STALE_CLAIM_SECONDS,))
+            conn.execute("UPDATE outbox SET state = 'sending', owner = ?, claimed_at = ? WHERE id IN ("
+                         "SELECT id FROM outbox WHERE state = 'pending' AND next_attempt <= ? "
+                         "ORDER BY priority, next_attempt LIMIT ?)", (self.owner, now, now, limit))
+            rows = conn.execute("SELECT id, chat_id, kind, payload, attempts FROM outbox "
+                                "WHERE state = 'sending' AND owner = ? ORDER BY priority, id", (self.owner,)).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _release(self, row_id, delay, attempts):
+        self._conn().execute("UPDATE outbox SET state = 'pending', owner = NULL, attempts = ?, next_attempt = ? WHERE id = ?",
+                             (attempts, time.time() + delay, row_id))
+
+    def _delete(self, row_id):
+        self._conn().execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def _hold_sender_lock(self):
+        # প্রসেস শেষ হলে OS নিজেই lock ছেড়ে দেয়
+        if self._sender_lock is None:
+            import fcntl
+            handle = open(f"{self.path}.lock", 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return False
+            self._sender_lock = handle
+        return True
+
+    def _release_sender_lock(self):
+        if self._sender_lock is not None:
+            self._sender_lock.close()
+            self._sender_lock = None
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.pop(chat_id, None) or TokenBucket(self.chat_rate, 1)
+        self._chat_buckets[chat_id] = bucket
+        while len(self._chat_buckets) > 10000:
+            self._chat_buckets.popitem(last=False)
+        return bucket
+
+    async def _send(self, bot, row):
+        from telegram.error import RetryAfter, Forbidden, BadRequest
+        row_id, chat_id, kind, payload, attempts = row
+        if not self._chat_bucket(chat_id).try_take():
+            await asyncio.to_thread(self._release, row_id, 1 / self.chat_rate, attempts)
+            return
+        while (wait := self.global_bucket.wait_time()) > 0:
+            await asyncio.sleep(wait)
+        self.global_bucket.try_take()
+        try:
+            await bot.send_message(chat_id=chat_id, text=render(kind, json.loads(payload)))
+            await asyncio.to_thread(self._delete, row_id)
+            self.stats['sent'] += 1
+        except RetryAfter as e:
+            ra = e.retry_after
+            retry_after = ra.total_seconds() if hasattr(ra, 'total_seconds') else ra
+            self.global_bucket.pause(retry_after)
+            await asyncio.to_thread(self._release, row_id, retry_after, attempts)
+            self.stats['rateLimited'] += 1
+        except (Forbidden, BadRequest) as e:
+            # ইউজার বট ব্লক করেছে বা চ্যাট নেই - আবার চেষ্টা করে লাভ নেই
+            logging.info(f"Dropping notification to {chat_id}: {e}")
+            await asyncio.to_thread(self._delete, row_id)
+            self.stats['dropped'] += 1
+        except Exception as e:
+            attempts += 1
+            if attempts >= NOTIFY_MAX_ATTEMPTS:
+                logging.error(f"Giving up on notification to {chat_id} after {attempts} attempts: {e}")
+                await asyncio.to_thread(self._delete, row_id)
+                self.stats['dropped'] += 1
+            else:
+                await asyncio.to_thread(self._release, row_id, min(300, 2 ** attempts) + random.random(), attempts)
+                self.stats['retried'] += 1
+
+    async def run(self, bot, batch_size=50, idle_sleep=0.5, standby_sleep=5):
+        """কিউ খালি না হওয়া পর্যন্ত পাঠাতে থাকে; stop() না ডাকা পর্যন্ত চলে।
+
+        অন্য প্রসেস sender lock ধরে থাকলে standby_sleep পরপর আবার চেষ্টা করে।
+        """
+        self._stop.clear()
+        try:
+            while not self._stop.is_set():
+                rows = await asyncio.to_thread(self._claim, batch_size) if self._hold_sender_lock() else None
+                for row in rows or ():
+                    await self._send(bot, row)
+                if not rows:
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), timeout=idle_sleep if rows is not None else standby_sleep)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._release_sender_lock()
+
+    def stop(self):
+        self._stop.set()
+
+
+def broadcast(storage, notifier, text, page_size=500):
+    """সব ইউজারের জন্য মেসেজ কিউতে রাখে; মোট কতজন তা ফেরত দেয়।"""
+    total = 0
+    page = []
+    for user_id in storage.iter_user_ids(page_size):
+        page.append(user_id)
+        if len(page) >= page_size:
+            notifier.enqueue_many(page, text)
+            total += len(page)
+            page = []
+    if page:
+        notifier.enqueue_many(page, text)
+        total += len(page)
+    return total
@@ -0,0 +1,152 @@
+"""রিওয়ার্ড এন্ডপয়েন্টের জন্য token-bucket রেট লিমিটার।
+
+প্রতিটি রুটের (scope) জন্য দুটি bucket: ইউজার আইডি অনুযায়ী এবং IP অনুযায়ী।
+প্রতিটি রিকোয়েস্ট দুটো থেকেই একটি টোকেন নেয়; কোনোটি খালি থাকলে রিকোয়েস্ট
+Firestore ট্রানজ্যাকশন খোলার আগেই 429 (Retry-After সহ) পায়। টোকেন
+`rate` হারে (প্রতি সেকেন্ডে) ফেরত আসে, সর্বোচ্চ `burst` পর্যন্ত।
+
+ব্যাকএন্ড দুই রকম:
+*   `memory` - প্রতিটি worker-এর নিজের bucket (ডিফল্ট); N worker হলে আসল
+    সীমা প্রায় N গুণ।
+*   `sqlite` - একই মেশিনের সব worker একটি ফাইল শেয়ার করে, তাই সীমা সব
+    worker মিলিয়ে ধরা হয়।
+
+Environment ভেরিয়েবল:
+    RATE_LIMIT_BACKEND  memory | sqlite | off   (ডিফল্ট: memory)
+    RATE_LIMIT_SIZE     memory ব্যাকএন্ডে সর্বোচ্চ কতটি bucket (ডিফল্ট: 100000)
+    RATE_LIMIT_PATH     sqlite ব্যাকএন্ডের ফাইল (ডিফল্ট: /tmp/hubcoin_ratelimit.sqlite3)
+"""
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# scope -> {'user' | 'ip': (burst, প্রতি সেকেন্ডে কতটি টোকেন ফেরত আসে)}
+RATE_LIMITS = {
+    'watch-ad': {'user': (2, 1 / 15), 'ip': (30, 1.0)},
+    'join-telegram': {'user': (3, 1 / 60), 'ip': (10, 0.2)},
+    'claim-gems': {'user': (5, 1 / 5), 'ip': (30, 1.0)},
+    'withdrawal': {'user': (3, 1 / 30), 'ip': (10, 0.2)},
+}
+SWEEP_EVERY = 1000  # sqlite: এতগুলো রিকোয়েস্ট পরপর পুরনো (ভরা) bucket মোছা হয়
+
+
+def _refill(tokens, updated, burst, rate, now):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _take(tokens, rate):
+    """`(নতুন tokens, অপেক্ষার সেকেন্ড)`; অপেক্ষা 0 হলে রিকোয়েস্ট চলবে।"""
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._data.get(key, (burst, now))
+            tokens, wait = _take(_refill(tokens, updated, burst, rate, now), rate)
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            # বাদ পড়া bucket আবার ভরা অবস্থায় শুরু হয় - সবচেয়ে পুরনোগুলোই বাদ যায়
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBuckets:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                         "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, burst, rate):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens, wait = _take(_refill(tokens, updated, burst, rate, now), rate)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._calls += 1
+        if self._calls % SWEEP_EVERY == 0:
+            self.sweep(now)
+        return wait
+
+    def sweep(self, now=None):
+        """এক ঘণ্টা অব্যবহৃত bucket মুছে ফেলে (ততক্ষণে সেগুলো ভরা থাকে)।"""
+        self._conn().execute("DELETE FROM buckets WHERE updated < ?", ((now or time.time()) - 3600,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+class RateLimiter:
+    def __init__(self, buckets, limits=RATE_LIMITS):
+        self.buckets = buckets
+        self.limits = limits
+        self._lock = threading.Lock()
+        self.stats = {'allowed': 0, 'rejected': 0}
+
+    def check(self, scope, user_id=None, ip=None):
+        """টোকেন নেয়; সীমা ছাড়ালে কত সেকেন্ড পরে আবার চেষ্টা করা যাবে, না হলে None।
+
+        IP আগে দেখা হয়, যাতে অনেক আইডি নিয়ে আসা bot ইউজারদের bucket খালি না করে।
+        """
+        if self.buckets is None or scope not in self.limits:
+            return None
+        for kind, value in (('ip', ip), ('user', user_id)):
+            if value is None or kind not in self.limits[scope]:
+                continue
+            burst, rate = self.limits[scope][kind]
+            wait = self.buckets.take(f"{scope}:{kind}:{value}", burst, rate)
+            if wait:
+                metrics.rate_limited.inc(scope, kind)
+                self._count('rejected')
+                return max(1, math.ceil(wait))
+        self._count('allowed')
+        return None
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def build_rate_limiter():
+    kind = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if kind == 'off':
+        return RateLimiter(None)
+    if kind == 'sqlite':
+        return RateLimiter(SQLiteBuckets(os.getenv("RATE_LIMIT_PATH", "/tmp/hubcoin_ratelimit.sqlite3")))
+    return RateLimiter(MemoryBuckets(int(os.getenv("RATE_LIMIT_SIZE", 100000))))
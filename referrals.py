@@ -0,0 +1,232 @@
+"""রেফারেল গ্রাফের ইনডেক্স ও বহু-স্তরের রিওয়ার্ড।
+
+ইউজার ডকুমেন্টের `referredBy` থেকে দুটি কালেকশনে adjacency রাখা হয়, প্রতিটি
+`create_new_user` এর সময় আপডেট হয়:
+
+*   `referrals/{id}` - নোড: `parent` এবং উপরের `ancestors` (কাছের থেকে দূরে,
+    সর্বোচ্চ REFERRAL_LEVELS জন), সাথে `flagged` (cycle বা farm সন্দেহ)।
+*   `referrals/{id}/downline/{edge}` - প্রতিটি ancestor এর নিচে নতুন ইউজারের
+    একটি edge (`userId`, `level`)। edge এর আইডি সময় দিয়ে শুরু (লেজারের মতো),
+    তাই কারো downline নতুন থেকে পুরনো পাতা ধরে পড়তে কোনো collection scan লাগে না
+    (স্তর দিয়ে ফিল্টার করলে Firestore-এ `downline` এর level + __name__ DESC index লাগে)।
+
+প্রতি স্তরের সংখ্যা (`refs`, `refsL2`, `refsL3`) রিওয়ার্ডের সাথেই ইউজার
+ডকুমেন্টে counters.py দিয়ে বাড়ে, তাই subtree এর আকার একটি রিড। ইনডেক্সের
+আগের ইউজারদের নোড প্রথম দরকারের সময় `referredBy` ধরে উপরে হেঁটে তৈরি হয়।
+
+সন্দেহজনক হলে রিওয়ার্ড আটকে যায় (edge এ `rewarded: False`):
+*   cycle - নতুন ইউজার নিজেই নিজের ancestor (ইমপোর্ট বা পুরনো ডেটায় রিং)।
+*   burst - কোনো রেফারারের REFERRAL_FARM_WINDOW সেকেন্ডের একটি window-তে
+    REFERRAL_FARM_BURST টি সরাসরি জয়েন; তখন রেফারারের নোড flagged হয় এবং
+    অ্যাডমিন `/referrals <id> clear` না করা পর্যন্ত তার সব স্তরের রিওয়ার্ড আটকে
+    থাকে। clear করলে আটকে থাকা edge গুলোর রিওয়ার্ড তখন দেওয়া হয়। জয়েন গোনা
+    হয় রেফারারের নোডেই (`windowStart`, `windowJoins`), তাই বাড়তি কোনো রিড নেই।
+    ডিফল্ট বন্ধ - ইনফ্লুয়েন্সারের লিংকে আসল ভিড়ও একই রকম দেখায়।
+
+Environment ভেরিয়েবল:
+    REFERRAL_FARM_BURST   এক window-তে কতটি জয়েন এলে সন্দেহ (ডিফল্ট: 0 = বন্ধ)
+    REFERRAL_FARM_WINDOW  window এর দৈর্ঘ্য, সেকেন্ড (ডিফল্ট: 600)
+"""
+import os
+import time
+import logging
+
+from ledger import new_event_id, event_time
+from rewards import REFERRAL_LEVEL_REWARDS
+from storage import SERVER_TIMESTAMP, Increment
+
+REFERRAL_LEVELS = len(REFERRAL_LEVEL_REWARDS)
+REFERRAL_FARM_BURST = int(os.getenv("REFERRAL_FARM_BURST", 0))
+REFERRAL_FARM_WINDOW = float(os.getenv("REFERRAL_FARM_WINDOW", 600))
+DOWNLINE_MAX_LIMIT = 100
+# প্রতি স্তরের সংখ্যা ইউজার ডকুমেন্টের কোন ফিল্ডে
+LEVEL_FIELDS = ('refs', 'refsL2', 'refsL3')[:REFERRAL_LEVELS]
+
+
+def downline_collection(user_id):
+    return f"referrals/{user_id}/downline"
+
+
+def level_counts(user):
+    """প্রোফাইল থেকে প্রতি স্তরের ও মোট downline সংখ্যা।"""
+    counts = {f"level{level}": int(user.get(field, 0)) for level, field in enumerate(LEVEL_FIELDS, 1)}
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def is_active(user):
+    # নিজে কিছু করেছে: বিজ্ঞাপন দেখা, gem claim বা উইথড্রয়াল
+    return bool(user.get('adWatch', 0) or user.get('gems', 0) or user.get('totalWithdrawn', 0))
+
+
+class ReferralIndex:
+    def __init__(self, storage, levels=REFERRAL_LEVELS, farm_burst=REFERRAL_FARM_BURST,
+                 farm_window=REFERRAL_FARM_WINDOW):
+        self.storage = storage
+        self.levels = levels
+        self.farm_burst = farm_burst
+        self.farm_window = farm_window
+
+    def node(self, user_id):
+        """ইউজারের নোড; ইনডেক্সের আগের ইউজার হলে `referredBy` থেকে তৈরি করে (ইউজার না থাকলে None)।"""
+        user_id = str(user_id)
+        node = self.storage.get_document('referrals', user_id)
+        return node if node is not None else self._backfill(user_id)
+
+    def _backfill(self, user_id):
+        # উপরে হাঁটা: প্রতিটি ধাপে একজন ইউজার, যতক্ষণ না মূল বা আগে থেকে থাকা নোড পাওয়া যায়
+        chain, flagged = [], None
+        current = user_id
+        while len(chain) < self.levels:
+            user = self.storage.get_user(current)
+            if user is None and current == user_id:
+                return None  # এমন ইউজার নেই, নোডও লেখা হয় না
+            parent = str(user['referredBy']) if user and user.get('referredBy') else None
+            if parent is None:
+                break
+            if parent == user_id or parent in chain:
+                flagged = 'cycle'
+                break
+            chain.append(parent)
+            node = self.storage.get_document('referrals', parent)
+            if node is not None:
+                if user_id in node.get('ancestors', []):
+                    flagged = 'cycle'
+                chain.extend(a for a in node.get('ancestors', []) if a != user_id)
+                break
+            current = parent
+        node = {'parent': chain[0] if chain else None, 'ancestors': chain[:self.levels], 'flagged': flagged}
+        self.storage.set_document('referrals', user_id, node)
+        return node
+
+    def add(self, user_id, referrer_id=None, username=None):
+        """নতুন ইউজারকে ইনডেক্সে বসায়; রিওয়ার্ডের জন্য placement ফেরত দেয়।
+
+        placement: `ancestors` (কাছের থেকে দূরে), `flagged` (নতুন ইউজারের) এবং
+        `withheld` (যেসব ancestor এর রিওয়ার্ড আটকে আছে)।
+        """
+        user_id = str(user_id)
+        parent = self.node(referrer_id) if referrer_id else None
+        if parent is None:
+            self.storage.set_document('referrals', user_id, {'parent': None, 'ancestors': [], 'flagged': None})
+            return {'ancestors': [], 'flagged': None, 'withheld': set()}
+        referrer_id = str(referrer_id)
+        ancestors = [referrer_id] + list(parent.get('ancestors', []))[:self.levels - 1]
+        flagged = 'cycle' if user_id in ancestors else None
+        if flagged:
+            ancestors = ancestors[:ancestors.index(user_id)]
+
+        upper = self.storage.get_documents('referrals', ancestors[1:]) if len(ancestors) > 1 else {}
+        withheld = {a for a in ancestors[1:] if (upper.get(a) or {}).get('flagged')}
+        burst, window = (False, None) if parent.get('flagged') else self._count_join(parent, time.time())
+        if parent.get('flagged') or burst:
+            withheld.add(referrer_id)
+        if flagged or parent.get('flagged') == 'cycle':
+            # রিংয়ের ভেতরে কেউই রিওয়ার্ড পায় না
+            withheld.update(ancestors)
+
+        edge_id = new_event_id()
+        writes = [('set', 'referrals', user_id, {'parent': referrer_id, 'ancestors': ancestors, 'flagged': flagged})]
+        for level, ancestor in enumerate(ancestors, 1):
+            writes.append(('set', downline_collection(ancestor), edge_id,
+                           {'userId': user_id, 'username': username, 'level': level,
+                            'rewarded': ancestor not in withheld}))
+        if burst:
+            window.update({'flagged': 'burst', 'flaggedAt': SERVER_TIMESTAMP})
+            logging.warning(f"Referral burst from {referrer_id}, rewards withheld until reviewed")
+        if window:
+            writes.append(('update', 'referrals', referrer_id, window))
+        self.storage.commit_batch(writes)
+        return {'ancestors': ancestors, 'flagged': flagged, 'withheld': withheld}
+
+    def _count_join(self, node, now):
+        """`(burst, window update)` - রেফারারের নোডের window এ এই জয়েনটি গোনে।"""
+        if self.farm_burst <= 1:
+            return False, None
+        if now - node.get('windowStart', 0) >= self.farm_window:
+            return False, {'windowStart': now, 'windowJoins': 1}
+        # একসাথে আসা জয়েনগুলো একই পুরনো নোড পড়তে পারে, Increment এ গোনা হারায় না
+        return node.get('windowJoins', 0) + 1 >= self.farm_burst, {'windowJoins': Increment(1)}
+
+    def downline(self, user_id, limit=20, cursor=None, level=None):
+        """নতুন থেকে পুরনো `(rows, next_cursor)`; level দিলে শুধু সেই স্তর।
+
+        limit বা level সংখ্যা না হলে, বা level 1..levels এর বাইরে হলে ValueError।
+        """
+        limit = max(1, min(_as_int(limit, 'limit'), DOWNLINE_MAX_LIMIT))
+        level = _as_int(level, 'level') if level not in (None, '') else None
+        if level is not None and not 1 <= level <= self.levels:
+            raise ValueError(f"level must be between 1 and {self.levels}")
+        rows, next_cursor = self.storage.page_documents(downline_collection(user_id),
+                                                        {'level': level} if level else None,
+                                                        limit=limit, cursor=cursor, descending=True)
+        users = self.storage.get_documents('users', [data['userId'] for _, data in rows])
+        return [{'userId': data['userId'], 'username': data.get('username'), 'level': data['level'],
+                 'joinedAt': event_time(edge_id), 'rewarded': data.get('rewarded', True),
+                 'active': is_active(users.get(data['userId']) or {})}
+                for edge_id, data in rows], next_cursor
+
+    def inspect(self, user_id, sample=DOWNLINE_MAX_LIMIT):
+        """অ্যাডমিনের জন্য: নোড, স্তরের সংখ্যা এবং সাম্প্রতিক সরাসরি downline এ সক্রিয়ের হার।"""
+        node = self.node(user_id)
+        if node is None:
+            raise ValueError(f"User {user_id} not found")
+        user = self.storage.get_user(user_id) or {}
+        recent, _ = self.downline(user_id, sample, level=1)
+        active = sum(row['active'] for row in recent)
+        return {'userId': str(user_id), 'parent': node.get('parent'), 'ancestors': node.get('ancestors', []),
+                'flagged': node.get('flagged'), 'counts': level_counts(user), 'sampled': len(recent),
+                'activeShare': round(active / len(recent), 2) if recent else None}
+
+    def clear_flag(self, user_id, credit):
+        """flag তুলে দেয় এবং আটকে থাকা edge গুলোর রিওয়ার্ড দেয়; কতটি দেওয়া হলো ফেরত দেয়।
+
+        প্রতিটি edge এর জন্য `credit(user_id, level, deltas, new_user_id)` ডাকা হয়।
+        দুবার না দিতে edge আগে `rewarded` করা হয়, তারপর credit।
+        """
+        user_id = str(user_id)
+        if self.node(user_id) is None:  # পুরনো ইউজার হলে নোড আগে তৈরি হোক
+            raise ValueError(f"User {user_id} not found")
+        self.storage.commit_batch([('update', 'referrals', user_id, {'flagged': None, 'windowStart': time.time(),
+                                                                     'windowJoins': 0})])
+        replayed = 0
+        while True:
+            # rewarded হওয়া edge ফিল্টার থেকে বাদ পড়ে, তাই প্রতিবার প্রথম পাতা
+            rows, _ = self.storage.page_documents(downline_collection(user_id), {'rewarded': False},
+                                                  limit=DOWNLINE_MAX_LIMIT)
+            if not rows:
+                return replayed
+            self.storage.commit_batch([('update', downline_collection(user_id), edge_id, {'rewarded': True})
+                                       for edge_id, _ in rows])
+            for _, data in rows:
+                try:
+                    credit(user_id, data['level'], REFERRAL_LEVEL_REWARDS[data['level'] - 1], data['userId'])
+                    replayed += 1
+                except Exception as e:
+                    logging.error(f"Failed to replay referral reward for {user_id} (edge of {data['userId']}): {e}")
+
+
+def _as_int(value, name):
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def level_rewards(placement):
+    """placement থেকে `(ancestor, level, deltas)`; আটকে থাকা ancestor বাদ।"""
+    return [(ancestor, level, REFERRAL_LEVEL_REWARDS[level - 1])
+            for level, ancestor in enumerate(placement['ancestors'], 1) if ancestor not in placement['withheld']]
+
+
+def format_inspect(report):
+    counts = report['counts']
+    share = f"{int(report['activeShare'] * 100)}%" if report['activeShare'] is not None else "n/a"
+    return (f"👥 {report['userId']}: L1 {counts['level1']}" +
+            "".join(f", L{level} {counts[f'level{level}']}" for level in range(2, len(LEVEL_FIELDS) + 1)) +
+            f" (total {counts['total']})\n"
+            f"⬆️ Upline: {' → '.join(report['ancestors']) or '-'}\n"
+            f"🟢 Active in last {report['sampled']} direct referrals: {share}\n"
+            f"{'🚩 Flagged: ' + report['flagged'] if report['flagged'] else '✅ Not flagged'}")
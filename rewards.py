@@ -0,0 +1,130 @@
+"""রিওয়ার্ড ও উইথড্রয়ালের নিয়ম।
+
+এখানে কোনো Firestore কল নেই - শুধু হিসাব। Flask (server.py) এবং ASGI
+(asgi.py) দুই পথই এই ফাংশনগুলো ব্যবহার করে, যাতে নিয়ম এক জায়গায় থাকে।
+"""
+import math
+
+from ledger import empty_snapshot
+from rollover import DAILY_FIELDS, day_key, daily_counters, bump
+
+GEMS_PER_CLAIM = 2
+DAILY_GEM_CLAIM_LIMIT = 6
+REFERRAL_REWARD = {'balance': 25.0, 'unclaimedGems': 2, 'refs': 1}
+# বহু-স্তরের রেফারেল: স্তর ১ সরাসরি রেফারার, তার উপরের জন প্রতিটি পরের স্তর (referrals.py)
+REFERRAL_LEVEL_REWARDS = (
+    REFERRAL_REWARD,
+    {'balance': 5.0, 'refsL2': 1},
+    {'balance': 2.0, 'refsL3': 1},
+)
+AD_REWARD = 0.5           # প্রতি বিজ্ঞাপনে টাকা
+DAILY_AD_LIMIT = 10
+AD_GEM_EVERY = 5          # প্রতি ৫টি বিজ্ঞাপনে একটি unclaimed gem
+TELEGRAM_TASK_REWARD = 25.0
+
+
+def new_user_profile(username, referrer_id=None):
+    return {
+        'username': username, 'balance': 0.0, 'gems': 0, 'unclaimedGems': 0,
+        'refs': 0, 'adWatch': 0, **DAILY_FIELDS, 'dayKey': day_key(), 'totalWithdrawn': 0.0,
+        'referredBy': referrer_id, 'ledgerPending': 0, 'ledgerSnapshot': empty_snapshot()
+    }
+
+
+def plan_gem_claim(user, folded=None):
+    """Gem claim যাচাই করে।
+
+    `(result, increments, values)` ফেরত দেয়; claim সম্ভব না হলে শেষ দুটি None।
+    `folded` হলো shard থেকে আসা যে ডেল্টা এখনো snapshot-এ নেই।
+    """
+    folded = folded or {}
+    today = day_key()
+    unclaimed = user.get('unclaimedGems', 0) + folded.get('unclaimedGems', 0)
+    if unclaimed < GEMS_PER_CLAIM:
+        return {"success": False, "message": "You need at least 2 gems."}, None, None
+    claimed_today = daily_counters(user, today)['gemsClaimedToday']
+    if claimed_today >= DAILY_GEM_CLAIM_LIMIT:
+        return {"success": False, "message": "Daily gem claiming limit reached (6/day)."}, None, None
+    increments = {'gems': GEMS_PER_CLAIM, 'unclaimedGems': -GEMS_PER_CLAIM}
+    values = bump(user, {'gemsClaimedToday': GEMS_PER_CLAIM}, today)
+    result = {"success": True, "message": "2 Gems claimed!",
+              "data": {"gems": user.get('gems', 0) + GEMS_PER_CLAIM, "unclaimedGems": unclaimed - GEMS_PER_CLAIM}}
+    return result, increments, values
+
+
+def plan_ad_watch(user, folded=None):
+    """একটি বিজ্ঞাপন দেখার রিওয়ার্ড; `(result, increments, values)`, সীমা শেষ হলে শেষ দুটি None।"""
+    folded = folded or {}
+    today = day_key()
+    watched = daily_counters(user, today)['adWatchToday']
+    if watched >= DAILY_AD_LIMIT:
+        return {"success": False, "message": f"Daily ad limit reached ({DAILY_AD_LIMIT}/day)."}, None, None
+    increments = {'balance': AD_REWARD, 'adWatch': 1}
+    if (user.get('adWatch', 0) + 1) % AD_GEM_EVERY == 0:
+        increments['unclaimedGems'] = 1
+    values = bump(user, {'adWatchToday': 1, 'todayIncome': AD_REWARD}, today)
+    result = {"success": True, "message": f"You earned ৳ {AD_REWARD:.2f}!",
+              "data": {"balance": user.get('balance', 0) + folded.get('balance', 0) + AD_REWARD,
+                       "adWatch": user.get('adWatch', 0) + 1, "adWatchToday": values['adWatchToday'],
+                       "todayIncome": values['todayIncome'],
+                       "unclaimedGems": user.get('unclaimedGems', 0) + folded.get('unclaimedGems', 0)
+                       + increments.get('unclaimedGems', 0)}}
+    return result, increments, values
+
+
+def plan_join_telegram(user, folded=None):
+    """টেলিগ্রাম চ্যানেলে জয়েনের এককালীন রিওয়ার্ড; আগে নেওয়া থাকলে increments None।"""
+    folded = folded or {}
+    if user.get('joinedTelegram'):
+        return {"success": False, "message": "Task already completed."}, None, None
+    increments = {'balance': TELEGRAM_TASK_REWARD}
+    values = {**bump(user, {'todayIncome': TELEGRAM_TASK_REWARD}), 'joinedTelegram': True}
+    result = {"success": True, "message": f"You earned ৳ {TELEGRAM_TASK_REWARD:.2f}!",
+              "data": {"balance": user.get('balance', 0) + folded.get('balance', 0) + TELEGRAM_TASK_REWARD,
+                       "todayIncome": values['todayIncome'], "joinedTelegram": True}}
+    return result, increments, values
+
+
+# উইথড্রয়ালের দামের টেবিল - সার্ভারই এর মালিক, Mini App এটি /api/bootstrap থেকে পায়।
+# কাস্টম অ্যামাউন্টে প্রতি `customUnit` (উপরের দিকে রাউন্ড করে) এর জন্য `customGemRate` জেম লাগে।
+WITHDRAWAL_PRICING = {
+    'Bkash': {'type': 'TK', 'amounts': [500, 1000, 1500], 'gems': [29, 49, 79], 'customGemRate': 50, 'customUnit': 500},
+    'Nagad': {'type': 'TK', 'amounts': [500, 1000, 1500], 'gems': [29, 49, 79], 'customGemRate': 50, 'customUnit': 500},
+    'Binance': {'type': 'USD', 'amounts': [5, 10, 15], 'gems': [58, 100, 150], 'customGemRate': 10, 'customUnit': 1},
+}
+_FIXED_PRICES = {(method, amount): gems for method, cfg in WITHDRAWAL_PRICING.items()
+                 for amount, gems in zip(cfg['amounts'], cfg['gems'])}
+
+
+def parse_amount(value):
+    """উইথড্রয়ালের অ্যামাউন্ট; সংখ্যা না হলে, NaN/inf বা 0 এর কম-সমান হলে None।"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
+
+
+def required_gems_for(method, amount):
+    """কত জেম লাগবে; অজানা পেমেন্ট মেথড বা অবৈধ অ্যামাউন্ট হলে None।"""
+    if parse_amount(amount) is None:
+        return None
+    fixed = _FIXED_PRICES.get((method, amount))
+    if fixed is not None:
+        return fixed
+    cfg = WITHDRAWAL_PRICING.get(method)
+    if cfg is None:
+        return None
+    return math.ceil(amount / cfg['customUnit']) * cfg['customGemRate']
+
+
+def plan_withdrawal(user, amount, required_gems, folded=None):
+    """উইথড্রয়াল যাচাই করে; `(result, increments)` ফেরত দেয়, ব্যর্থ হলে increments None।"""
+    folded = folded or {}
+    balance = user.get('balance', 0) + folded.get('balance', 0)
+    gems = user.get('gems', 0)
+    if balance < amount: return {"success": False, "error": "Insufficient balance."}, None
+    if gems < required_gems: return {"success": False, "error": f"Insufficient gems. You need {int(required_gems)} gems."}, None
+    increments = {'balance': -amount, 'gems': -int(required_gems)}
+    return {"success": True, "message": "Withdrawal request submitted!",
+            "data": {"balance": balance - amount, "gems": gems - int(required_gems)}}, increments
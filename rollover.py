@@ -0,0 +1,54 @@
+"""দিনভিত্তিক কাউন্টারের অলস (lazy) রোলওভার।
+
+`gemsClaimedToday`, `todayIncome` ও `adWatchToday` এর সাথে ডকুমেন্টে থাকে
+`dayKey` - কোন দিনের হিসাব (নির্দিষ্ট টাইমজোনে, YYYY-MM-DD)। দিন বদলালে
+কোনো রাতের batch job সব ইউজারকে ছোঁয় না; পড়ার সময় dayKey আজকের না হলে
+কাউন্টারগুলো শূন্য ধরা হয়। ডকুমেন্টে নতুন দিন লেখা হয় শুধু পরের আসল
+পরিবর্তনের (claim, বিজ্ঞাপন দেখা ...) সাথে, একই আপডেটে।
+
+পুরনো ডকুমেন্টে dayKey নেই; তখন `lastGemClaimDate` কেই dayKey ধরা হয়।
+
+Environment ভেরিয়েবল:
+    DAY_TIMEZONE  কোন টাইমজোনে দিন বদলায় (ডিফল্ট: Asia/Dhaka)
+"""
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+DAY_TIMEZONE = ZoneInfo(os.getenv("DAY_TIMEZONE", "Asia/Dhaka"))
+DAILY_FIELDS = {'gemsClaimedToday': 0, 'todayIncome': 0.0, 'adWatchToday': 0}
+
+
+def day_key(now=None):
+    """DAY_TIMEZONE এ আজকের তারিখ; now (timezone সহ datetime) দিলে সেই মুহূর্তের।"""
+    return (now or datetime.now(DAY_TIMEZONE)).astimezone(DAY_TIMEZONE).date().isoformat()
+
+
+def stored_day(user):
+    return user.get('dayKey') or user.get('lastGemClaimDate')
+
+
+def daily_counters(user, today=None):
+    """আজকের কার্যকর কাউন্টার; ডকুমেন্টের দিন পুরনো হলে সব শূন্য।"""
+    if stored_day(user) != (today or day_key()):
+        return dict(DAILY_FIELDS)
+    return {field: user.get(field, default) for field, default in DAILY_FIELDS.items()}
+
+
+def effective(user, today=None):
+    """প্রোফাইলের কপি, দিনভিত্তিক কাউন্টারগুলো আজকের হিসাবে (কিছু লেখে না)।"""
+    return {**user, **daily_counters(user, today)}
+
+
+def bump(user, deltas, today=None):
+    """daily ফিল্ডে deltas যোগ করে `values` (absolute মান + dayKey) ফেরত দেয়।
+
+    মান ট্রানজ্যাকশনের ভেতরে পড়া snapshot থেকে হিসাব হয়, তাই Increment লাগে না
+    এবং দিন বদলানোর রিসেট আলাদা রাইট ছাড়াই এই আপডেটে চলে যায়।
+    """
+    today = today or day_key()
+    values = daily_counters(user, today)
+    for field, value in deltas.items():
+        values[field] += value
+    values['dayKey'] = today
+    return values
@@ -1,69 +1,231 @@
 import os
 import json
+import atexit
+import time
+import uuid
+import hmac
+import hashlib
 import logging
-from datetime import date
-from dotenv import load_dotenv
+import threading
+import urllib.request
+from urllib.parse import urlencode
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory, send_file, make_response
 from flask_cors import CORS
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-import telegram
-from telegram import Update, WebAppInfo, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes
-
-# --- 1. প্রাথমিক সেটআপ এবং কনফিগারেশন ---
-logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
-load_dotenv()
-
-# .env ফাইল থেকে ভেরিয়েবল লোড করা
-BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-FRONTEND_URL = os.getenv("FRONTEND_URL")
-firebase_config_str = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON_STRING")
-ADMIN_TELEGRAM_ID = int(os.getenv("ADMIN_TELEGRAM_ID", 0))
-
-# Firebase সেটআপ
-try:
-    firebase_config = json.loads(firebase_config_str)
-    cred = credentials.Certificate(firebase_config)
-    if not firebase_admin._apps: # পুনরায় ইনিশিয়ালাইজেশন এড়ানোর জন্য চেক
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    logging.info("Firebase successfully initialized!")
-except Exception as e:
-    logging.error(f"Firebase initialization failed: {e}")
-    db = None
+from config import (BOT_TOKEN, FRONTEND_URL, BOT_WEBHOOK_MOUNT, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    LEADERBOARD_CACHE_TTL, ASSET_PIPELINE, TELEGRAM_CHANNEL, TELEGRAM_CHANNEL_URL, WEB_PREWARM,
+                    METRICS_TOKEN)
+from assets import build_assets, pick_encoding, DIST_DIR
+from auth import TelegramAuth, AuthError, AUTH_REQUIRED
+from leaderboard import BOARDS
+import metrics
+from storage import SERVER_TIMESTAMP, UserNotFound
+from idempotency import build_idempotency_store, valid_key
+from ratelimit import build_rate_limiter
+from rollover import effective
+from rewards import plan_gem_claim, plan_withdrawal, required_gems_for, parse_amount, WITHDRAWAL_PRICING
+from rewards import plan_ad_watch, plan_join_telegram, DAILY_AD_LIMIT
+# storage, ক্যাশ, লিডারবোর্ড, কাউন্টার ও লেজার বটের সাথে শেয়ার করা, বিস্তারিত services.py তে
+from referrals import level_counts
+from services import (storage, user_cache, leaderboards, referral_counters, ledger, notifier, referral_index,
+                      create_new_user, get_user_data, compact_ledger)
 
 # --- Flask অ্যাপ (Web Service এর জন্য) ---
 app = Flask(__name__, static_folder='static')
 # CORS (Cross-Origin Resource Sharing) কনফিগারেশন
 if FRONTEND_URL:
-    CORS(app, resources={r"/api/*": {"origins": [FRONTEND_URL]}})
+    CORS(app, resources={r"/api/*": {"origins": [FRONTEND_URL], "expose_headers": ["ETag", "X-Session-Token", "Idempotent-Replayed"]}})
 else:
-    CORS(app, resources={r"/api/*": {"origins": "*"}}) # ডেভেলপমেন্টের জন্য
-
-# --- Helper Functions (সহকারী ফাংশন) ---
-def get_user_ref(user_id):
-    return db.collection('users').document(str(user_id))
-
-def create_new_user(user_id, username, referrer_id=None):
-    user_data = {
-        'username': username, 'balance': 0.0, 'gems': 0, 'unclaimedGems': 0,
-        'refs': 0, 'adWatch': 0, 'todayIncome': 0.0, 'gemsClaimedToday': 0,
-        'lastGemClaimDate': str(date.today()), 'totalWithdrawn': 0.0,
-        'referredBy': referrer_id
-    }
-    get_user_ref(user_id).set(user_data)
-    logging.info(f"New user created: {user_id}, Referred by: {referrer_id}")
-    return user_data
+    CORS(app, resources={r"/api/*": {"origins": "*", "expose_headers": ["ETag", "X-Session-Token", "Idempotent-Replayed"]}}) # ডেভেলপমেন্টের জন্য
+# initData যাচাই ও session টোকেন, বিস্তারিত auth.py তে
+telegram_auth = TelegramAuth(BOT_TOKEN, os.getenv("SESSION_SECRET"))
+# রিওয়ার্ড এন্ডপয়েন্টের token-bucket লিমিটার, বিস্তারিত ratelimit.py তে
+rate_limiter = build_rate_limiter()
+# Idempotency-Key অনুযায়ী আগের রেসপন্স, বিস্তারিত idempotency.py তে
+idempotency = build_idempotency_store()
+
+@metrics.register_collector
+def collect_runtime_gauges():
+    stats = user_cache.stats()
+    gauges = {f"hubcoin_user_cache_{key}": value for key, value in stats.items() if isinstance(value, (int, float))}
+    gauges['hubcoin_notifier_outbox_depth'] = notifier.depth()
+    return gauges
+
+def authenticated_user_id(data):
+    """Bearer টোকেন বা initData থেকে ইউজার আইডি দেয় (AUTH_REQUIRED=0 হলে body-র user_id)।
+
+    নতুন টোকেন তৈরি হলে সেটি X-Session-Token হেডারে ফেরত যায়।
+    """
+    if not AUTH_REQUIRED:
+        return data.get('user_id')
+    user_id, token = telegram_auth.authenticate(request.headers.get('Authorization'), data.get('user_data'))
+    if token:
+        g.session_token = token
+    return user_id
+
+@app.errorhandler(AuthError)
+def handle_auth_error(e):
+    return jsonify({"error": str(e)}), 401
+
+@app.before_request
+def start_request_metrics():
+    metrics.begin_request()
+
+@app.after_request
+def attach_session_token(response):
+    token = g.pop('session_token', None)
+    if token:
+        response.headers['X-Session-Token'] = token
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.end_request(route, request.method, response.status_code)
+    return response
+
+def idempotent(scope, compute):
+    """Idempotency-Key থাকলে `compute(key)` একবারই চলে; একই কী আবার এলে আগের রেসপন্স যায়।"""
+    key = request.headers.get('Idempotency-Key')
+    if key is not None and not valid_key(key):
+        return jsonify({"error": "Invalid Idempotency-Key"}), 400
+    payload, status, replayed = idempotency.run(f"{scope}:{key}" if key else None, lambda: compute(key))
+    response = make_response(jsonify(payload), status)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def metrics_authorized(authorization):
+    """METRICS_TOKEN দেওয়া থাকলে Authorization হেডার মিলতে হবে (asgi.py ও এটি ব্যবহার করে)।"""
+    return not METRICS_TOKEN or hmac.compare_digest(authorization or '', f"Bearer {METRICS_TOKEN}")
+
+def client_ip():
+    # প্রক্সি (Render) X-Forwarded-For এর শেষে আসল IP যোগ করে; আগের অংশ ক্লায়েন্ট নিজেই বানাতে পারে
+    return request.access_route[-1] if request.access_route else request.remote_addr
+
+def rate_limited(scope, user_id):
+    """সীমা ছাড়ালে Retry-After সহ 429 রেসপন্স, না হলে None। Firestore ছোঁয়ার আগে ডাকতে হবে।"""
+    retry_after = rate_limiter.check(scope, user_id, client_ip())
+    if retry_after is None:
+        return None
+    response = make_response(jsonify({"error": f"Too many requests. Try again in {retry_after}s."}), 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def is_channel_member(user_id):
+    """Bot API getChatMember দিয়ে যাচাই; TELEGRAM_CHANNEL ছাড়া টাস্কটিই বন্ধ, তাই এখানে আসে না।"""
+    query = urlencode({'chat_id': TELEGRAM_CHANNEL, 'user_id': user_id})
+    with urllib.request.urlopen(f"https://api.telegram.org/bot{BOT_TOKEN}/getChatMember?{query}", timeout=5) as response:
+        status = json.load(response).get('result', {}).get('status')
+    return status in ('creator', 'administrator', 'member', 'restricted')
+
+def credit_task(user_id, planner, name, kind):
+    """বিজ্ঞাপন/টাস্ক রিওয়ার্ড একটি ট্রানজ্যাকশনে (লেজার ইভেন্ট সহ) দেয়; `(payload, status)` ফেরত দেয়।"""
+    # আইডি বানিয়ে রিওয়ার্ড নেওয়া যাবে না - ইউজার আগে /api/user বা /start দিয়ে তৈরি হতে হয়
+    if get_user_data(user_id) is None:
+        return {"error": "User not found"}, 404
+    def plan(user, folded):
+        result, increments, values = planner(user, folded)
+        if increments is None:
+            return result, None
+        change = {'increments': increments, 'values': values}
+        result["ledgerDue"] = ledger.attach(user_id, user, change, kind)
+        return result, change
+    try:
+        result = storage.apply_user_change(user_id, plan, name, fold=referral_counters.fold)
+        user_cache.invalidate(user_id)
+        if result.pop("ledgerDue", False):
+            compact_ledger(user_id)
+        return result, 200
+    except UserNotFound:
+        return {"error": "User not found"}, 404
+    except Exception as e:
+        logging.error(f"API Error on {name}: {e}")
+        return {"error": "Could not credit reward"}, 500
+
+def load_or_create_user(user_id, username):
+    """প্রোফাইল (অপেক্ষমাণ রেফারেল ডেল্টা ও আজকের দিনের কাউন্টার সহ) এবং নতুন তৈরি হলো কিনা ফেরত দেয়।"""
+    user_data = get_user_data(user_id)
+    if user_data is not None:
+        return effective(referral_counters.overlay(user_id, user_data)), False
+    user_data, placement = create_new_user(user_id, username)
+    return user_data, placement is not None  # placement None: অন্য রিকোয়েস্ট আগেই তৈরি করেছে
+
+_leaderboard_cache = {}  # board -> (মেয়াদ শেষের সময়, ডেটা)
+
+def get_cached_leaderboard(board='withdrawn'):
+    """লিডারবোর্ড ডকুমেন্ট প্রসেসের মেমরিতে LEADERBOARD_CACHE_TTL সেকেন্ড রাখে।"""
+    cached = _leaderboard_cache.get(board)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    data = storage.get_document('leaderboard', BOARDS[board]['doc']) or {"players": []}
+    _leaderboard_cache[board] = (time.time() + LEADERBOARD_CACHE_TTL, data)
+    return data
+
+def json_etag(payload):
+    """`(body, etag)`; asgi.py ও একই ETag ব্যবহার করে।"""
+    body = json.dumps(payload, separators=(',', ':'), default=str)
+    return body, f'"{hashlib.sha1(body.encode()).hexdigest()[:20]}"'
+
+def etag_response(payload, status=200):
+    """JSON রেসপন্সে ETag বসায়; ক্লায়েন্টের If-None-Match মিললে 304 দেয়।"""
+    body, etag = json_etag(payload)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = make_response('', 304)
+    else:
+        response = make_response(body, status)
+        response.mimetype = 'application/json'
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def public_leaderboard(doc, board='withdrawn'):
+    """লিডারবোর্ড ডক থেকে userId/updatedAt বাদ দিয়ে শুধু rank, username ও বোর্ডের ফিল্ড রাখে।"""
+    field = BOARDS[board]['field']
+    players = [{'rank': p['rank'], 'username': p['username'], field: p.get(field, 0)} for p in doc.get('players', [])]
+    return {**doc, 'players': players}
+
+def bootstrap_payload(user_id, username):
+    """/api/bootstrap এর `(payload, created)` (asgi.py ও এটি ব্যবহার করে)।"""
+    user_data, created = load_or_create_user(user_id, username)
+    players = public_leaderboard(get_cached_leaderboard())['players']
+    return {"user": user_data, "leaderboard": {"players": players}, "pricing": WITHDRAWAL_PRICING,
+            "tasks": {"dailyAdLimit": DAILY_AD_LIMIT, "telegramTask": bool(TELEGRAM_CHANNEL),
+                      "telegramChannelUrl": TELEGRAM_CHANNEL_URL}}, created
 
 # --- স্ট্যাটিক ফাইল সার্ভ করার জন্য রুট ---
+# স্টার্টআপে হ্যাশ করা ও কম্প্রেস করা অ্যাসেট তৈরি (assets.py)
+if ASSET_PIPELINE:
+    try:
+        build_assets(app.static_folder)
+    except Exception as e:
+        logging.error(f"Asset pipeline failed, serving raw static files: {e}")
+        ASSET_PIPELINE = False
+
+def send_compressed(directory, filename, cache_control):
+    """আগে থেকে কম্প্রেস করা ভ্যারিয়েন্ট (br/gzip) থাকলে সেটি পাঠায়।"""
+    path = os.path.realpath(os.path.join(directory, filename))
+    if not path.startswith(os.path.realpath(directory) + os.sep) or not os.path.isfile(path):
+        return jsonify({"error": "Not found"}), 404
+    encoding, served_path = pick_encoding(request.headers.get('Accept-Encoding'), path)
+    response = send_file(served_path, download_name=os.path.basename(path), conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 @app.route('/')
 def serve_index():
+    if ASSET_PIPELINE:
+        return send_compressed(os.path.join(app.static_folder, DIST_DIR), 'index.html', 'no-cache')
     return send_from_directory(app.static_folder, 'index.html')
 
+@app.route(f'/{DIST_DIR}/<path:path>')
+def serve_hashed_asset(path):
+    return send_compressed(os.path.join(app.static_folder, DIST_DIR), path, 'public, max-age=31536000, immutable')
+
 @app.route('/<path:path>')
 def serve_static_files(path):
     if path != "index.html":
@@ -75,146 +237,238 @@ def serve_static_files(path):
 @app.route("/api/user", methods=['POST'])
 def get_or_create_user():
     data = request.json
-    user_id = data.get('user_id')
+    user_id = authenticated_user_id(data)
     username = data.get('username', 'N/A')
     if not user_id: return jsonify({"error": "User ID missing"}), 400
     try:
-        user_doc = get_user_ref(user_id).get()
-        if user_doc.exists:
-            return jsonify(user_doc.to_dict()), 200
-        else:
-            new_user = create_new_user(user_id, username)
-            return jsonify(new_user), 201
+        user_data, created = load_or_create_user(user_id, username)
+        return jsonify(user_data), 201 if created else 200
     except Exception as e:
         logging.error(f"API Error on /api/user: {e}")
         return jsonify({"error": "Server error"}), 500
 
+@app.route("/api/bootstrap", methods=['POST'])
+def bootstrap():
+    """Mini App খোলার সময় একটি রিকোয়েস্টেই ইউজার, লিডারবোর্ড এবং উইথড্রয়াল প্রাইসিং দেয়।"""
+    data = request.json
+    user_id = authenticated_user_id(data)
+    username = data.get('username', 'N/A')
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    try:
+        payload, created = bootstrap_payload(user_id, username)
+        return etag_response(payload, 201 if created else 200)
+    except Exception as e:
+        logging.error(f"API Error on /api/bootstrap: {e}")
+        return jsonify({"error": "Server error"}), 500
+
 @app.route("/api/claim-gems", methods=['POST'])
 def claim_gems():
-    user_id = request.json.get('user_id')
+    user_id = authenticated_user_id(request.json)
     if not user_id: return jsonify({"error": "User ID missing"}), 400
+    limited = rate_limited('claim-gems', user_id)
+    if limited: return limited
+    return idempotent(f"claim-gems:{user_id}", lambda key: claim_gems_for(user_id))
+
+def claim_gems_for(user_id):
+    """gem claim এর `(payload, status)`; async Firestore না থাকলে asgi.py ও এটি থ্রেডে চালায়।"""
+    if get_user_data(user_id) is None:
+        return {"error": "User not found"}, 404
+    def plan(user, folded):
+        result, increments, values = plan_gem_claim(user, folded)
+        if increments is None:
+            return result, None
+        change = {'increments': increments, 'values': values}
+        result["username"] = user.get('username')
+        result["ledgerDue"] = ledger.attach(user_id, user, change, 'claim')
+        return result, change
     try:
-        user_ref = get_user_ref(user_id)
-        @firestore.transactional
-        def update_gems_transaction(transaction, doc_ref):
-            today_str = str(date.today())
-            snapshot = doc_ref.get(transaction=transaction)
-            unclaimed = snapshot.get('unclaimedGems')
-            if unclaimed < 2:
-                return {"success": False, "message": "You need at least 2 gems."}
-            last_claim_date = snapshot.get('lastGemClaimDate')
-            claimed_today = snapshot.get('gemsClaimedToday')
-            if last_claim_date != today_str:
-                claimed_today = 0
-                transaction.update(doc_ref, {'lastGemClaimDate': today_str})
-            if claimed_today >= 6:
-                return {"success": False, "message": "Daily gem claiming limit reached (6/day)."}
-            transaction.update(doc_ref, {
-                'gems': firestore.Increment(2), 'unclaimedGems': firestore.Increment(-2),
-                'gemsClaimedToday': firestore.Increment(2)
-            })
-            return {"success": True, "message": "2 Gems claimed!",
-                    "data": {"gems": snapshot.get('gems') + 2, "unclaimedGems": snapshot.get('unclaimedGems') - 2}}
-        result = update_gems_transaction(db.transaction(), user_ref)
-        return jsonify(result), 200
+        result = storage.apply_user_change(user_id, plan, 'claim_gems', fold=referral_counters.fold)
+        user_cache.invalidate(user_id)
+        if result.pop("ledgerDue", False):
+            compact_ledger(user_id)
+        if result["success"]:
+            leaderboards.record('gems', user_id, result.pop("username"), result["data"]["gems"])
+            leaderboards.maybe_flush()
+        return result, 200
+    except UserNotFound:
+        return {"error": "User not found"}, 404
     except Exception as e:
         logging.error(f"API Error on /api/claim-gems: {e}")
-        return jsonify({"error": "Could not claim gems"}), 500
+        return {"error": "Could not claim gems"}, 500
 
 @app.route('/api/withdrawal', methods=['POST'])
 def request_withdrawal():
     data = request.json
-    user_id = data.get('user_id')
-    amount = float(data.get('amount'))
+    user_id = authenticated_user_id(data)
+    amount = parse_amount(data.get('amount'))
     method = data.get('method')
-    if not all([user_id, amount, method, data.get('account')]):
+    if not all([user_id, method, data.get('account')]) or data.get('amount') is None:
         return jsonify({'error': 'Missing fields'}), 400
-    required_gems = 0
-    if method in ['Bkash', 'Nagad']:
-        if amount == 500: required_gems = 29
-        elif amount == 1000: required_gems = 49
-        elif amount == 1500: required_gems = 79
-        else: required_gems = (amount / 500) * 50
-    elif method == 'Binance':
-        if amount == 5: required_gems = 58
-        elif amount == 10: required_gems = 100
-        elif amount == 15: required_gems = 150
-        else: required_gems = amount * 10
+    if amount is None: return jsonify({'error': 'Invalid amount'}), 400
+    required_gems = required_gems_for(method, amount)
+    if required_gems is None: return jsonify({'error': 'Unknown payment method'}), 400
+    limited = rate_limited('withdrawal', user_id)
+    if limited: return limited
+    return idempotent(f"withdrawal:{user_id}",
+                      lambda key: withdraw_for(user_id, amount, method, data.get('account'), required_gems, key))
+
+def withdraw_for(user_id, amount, method, account, required_gems, key):
+    """উইথড্রয়ালের `(payload, status)`; async Firestore না থাকলে asgi.py ও এটি থ্রেডে চালায়।"""
+    # কী থাকলে withdrawal ডকুমেন্টের আইডি সেটিই, তাই অন্য worker-এ পৌঁছানো ডুপ্লিকেটও দ্বিতীয়বার লেখা হয় না
+    doc_id = f"{user_id}_{key or uuid.uuid4().hex}"
+    def plan(user, folded):
+        result, increments = plan_withdrawal(user, amount, required_gems, folded)
+        if increments is None:
+            return result, None
+        result["username"] = user.get('username')
+        record = {'userId': user_id, 'amount': amount, 'method': method, 'requiredGems': int(required_gems),
+                  'account': account, 'status': 'pending', 'timestamp': SERVER_TIMESTAMP}
+        change = {'increments': increments, 'records': [('withdrawals', doc_id, record)]}
+        result["ledgerDue"] = ledger.attach(user_id, user, change, 'withdrawal', ref=doc_id)
+        return result, change
+    def already_submitted(existing):
+        return {"success": True, "message": "Withdrawal request already submitted."}
     try:
-        user_ref = get_user_ref(user_id)
-        @firestore.transactional
-        def withdrawal_transaction(transaction, doc_ref):
-            snapshot = doc_ref.get(transaction=transaction)
-            balance = snapshot.get('balance')
-            gems = snapshot.get('gems')
-            if balance < amount: return {"success": False, "error": "Insufficient balance."}
-            if gems < required_gems: return {"success": False, "error": f"Insufficient gems. You need {int(required_gems)} gems."}
-            transaction.update(doc_ref, {'balance': firestore.Increment(-amount), 'gems': firestore.Increment(-int(required_gems))})
-            db.collection('withdrawals').add({
-                'userId': user_id, 'amount': amount, 'method': method,
-                'account': data.get('account'), 'status': 'pending', 'timestamp': firestore.SERVER_TIMESTAMP
-            })
-            return {"success": True, "message": "Withdrawal request submitted!",
-                    "data": {"balance": balance - amount, "gems": gems - int(required_gems)}}
-        result = withdrawal_transaction(db.transaction(), user_ref)
-        return jsonify(result), 200
+        result = storage.apply_user_change(user_id, plan, 'withdrawal', fold=referral_counters.fold,
+                                           guard=('withdrawals', doc_id) if key else None,
+                                           on_duplicate=already_submitted)
+        user_cache.invalidate(user_id)
+        if result.pop("ledgerDue", False):
+            compact_ledger(user_id)
+        if "username" in result:
+            leaderboards.record('gems', user_id, result.pop("username"), result["data"]["gems"])
+            leaderboards.maybe_flush()
+        return result, 200
+    except UserNotFound:
+        return {'error': 'User not found'}, 404
     except Exception as e:
         logging.error(f"API Error on /api/withdrawal: {e}")
-        return jsonify({'error': 'Server error during withdrawal'}), 500
+        return {'error': 'Server error during withdrawal'}, 500
+
+@app.route("/api/watch-ad", methods=['POST'])
+def watch_ad():
+    user_id = authenticated_user_id(request.json)
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    limited = rate_limited('watch-ad', user_id)
+    if limited: return limited
+    return idempotent(f"watch-ad:{user_id}", lambda key: credit_task(user_id, plan_ad_watch, 'watch_ad', 'ad_reward'))
+
+@app.route("/api/join-telegram", methods=['POST'])
+def join_telegram():
+    user_id = authenticated_user_id(request.json)
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    # চ্যানেল কনফিগার না থাকলে যাচাই করা যায় না, তাই টাস্কটি নেই
+    if not TELEGRAM_CHANNEL: return jsonify({"error": "Task not available"}), 404
+    limited = rate_limited('join-telegram', user_id)
+    if limited: return limited
+    def join(key):
+        try:
+            if not is_channel_member(user_id):
+                return {"success": False, "message": "Please join the channel first."}, 200
+        except Exception as e:
+            logging.error(f"Channel membership check failed for {user_id}: {e}")
+            return {"error": "Could not verify channel membership"}, 502
+        return credit_task(user_id, plan_join_telegram, 'join_telegram', 'task_reward')
+    return idempotent(f"join-telegram:{user_id}", join)
+
+def history_params(data):
+    """/api/history এর `(limit, cursor)` যাচাই করে; ভুল হলে None (asgi.py ও এটি ব্যবহার করে)।"""
+    limit, cursor = data.get('limit', 20), data.get('cursor')
+    if isinstance(limit, str) and limit.isdigit(): limit = int(limit)
+    if not isinstance(limit, int) or isinstance(limit, bool): return None
+    if cursor is not None and not isinstance(cursor, str): return None
+    return limit, cursor
+
+@app.route("/api/history", methods=['POST'])
+def get_history():
+    """ইউজারের লেজার ইভেন্ট, নতুন থেকে পুরনো; পরের পাতার জন্য nextCursor ফেরত পাঠাতে হবে।"""
+    data = request.json
+    user_id = authenticated_user_id(data)
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    params = history_params(data)
+    if params is None: return jsonify({"error": "Invalid limit or cursor"}), 400
+    try:
+        events, next_cursor = ledger.history(user_id, *params)
+        return jsonify({"events": events, "nextCursor": next_cursor}), 200
+    except Exception as e:
+        logging.error(f"API Error on /api/history: {e}")
+        return jsonify({"error": "Could not fetch history"}), 500
+
+def referral_page(user_id, data):
+    """downline এর একটি পাতা ও স্তর অনুযায়ী সংখ্যা (asgi.py ও এটি ব্যবহার করে)।"""
+    referrals, next_cursor = referral_index.downline(user_id, data.get('limit', 20), data.get('cursor'), data.get('level'))
+    user_data = referral_counters.overlay(user_id, dict(get_user_data(user_id) or {}))
+    return {"referrals": referrals, "nextCursor": next_cursor, "counts": level_counts(user_data)}
+
+@app.route("/api/referrals", methods=['POST'])
+def get_referrals():
+    """ইউজারের downline, নতুন থেকে পুরনো; পরের পাতার জন্য nextCursor ফেরত পাঠাতে হবে।"""
+    data = request.json
+    user_id = authenticated_user_id(data)
+    if not user_id: return jsonify({"error": "User ID missing"}), 400
+    try:
+        return jsonify(referral_page(user_id, data)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"API Error on /api/referrals: {e}")
+        return jsonify({"error": "Could not fetch referrals"}), 500
 
 @app.route("/api/leaderboard", methods=['GET'])
 def get_leaderboard():
+    board = request.args.get('board', 'withdrawn')
+    if board not in BOARDS: return jsonify({"error": "Unknown leaderboard"}), 400
     try:
-        doc = db.collection('leaderboard').document('top_players').get()
-        return jsonify(doc.to_dict() if doc.exists else {"players": []}), 200
+        return jsonify(public_leaderboard(get_cached_leaderboard(board), board)), 200
     except Exception as e:
         logging.error(f"API Error on /api/leaderboard: {e}")
         return jsonify({"error": "Could not fetch leaderboard"}), 500
 
-# --- Telegram Bot Command Handlers (Worker এর জন্য) ---
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    user = update.effective_user
-    user_id, username = str(user.id), user.username or user.first_name
-    referrer_id = context.args[0] if context.args and context.args[0].isdigit() and context.args[0] != user_id else None
-    if not get_user_ref(user_id).get().exists:
-        create_new_user(user_id, username, referrer_id)
-        if referrer_id:
-            try:
-                get_user_ref(referrer_id).update({
-                    'balance': firestore.Increment(25.0), 'unclaimedGems': firestore.Increment(2),
-                    'refs': firestore.Increment(1)
-                })
-                await context.bot.send_message(chat_id=referrer_id,
-                    text=f"🎉 Congratulations! {user.first_name} joined using your link. You received 25 TK and 2 Gems!")
-            except Exception as e:
-                logging.error(f"Failed to reward referrer {referrer_id}: {e}")
-    keyboard = [[InlineKeyboardButton("🚀 Open HubCoin Miner", web_app=WebAppInfo(url=FRONTEND_URL))]]
-    await update.message.reply_html(
-        rf"👋 Welcome, {user.mention_html()}! Click the button below to start earning.",
-        reply_markup=InlineKeyboardMarkup(keyboard))
-
-async def update_leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if update.effective_user.id != ADMIN_TELEGRAM_ID:
-        return await update.message.reply_text("⛔ You are not authorized.")
-    await update.message.reply_text("⏳ Updating leaderboard...")
+@app.route("/api/cache/stats", methods=['GET'])
+def get_cache_stats():
+    if not METRICS_TOKEN: return jsonify({"error": "Not found"}), 404
+    if not metrics_authorized(request.headers.get('Authorization')): return jsonify({"error": "Forbidden"}), 403
+    return jsonify(user_cache.stats()), 200
+
+@app.route("/metrics", methods=['GET'])
+def get_metrics():
+    """Prometheus স্ক্রেপের জন্য এই worker-এর মেট্রিক।"""
+    if not metrics_authorized(request.headers.get('Authorization')): return jsonify({"error": "Forbidden"}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route(WEBHOOK_PATH, methods=['POST'])
+def telegram_webhook():
+    if bot_bridge is None: return jsonify({"error": "Webhook not enabled"}), 404
+    if not bot_bridge.submit(request.json, request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"ok": True}), 200
+
+# ওয়েব অ্যাপের ভেতরে webhook মোডে বট (প্রতিটি gunicorn worker-এ একটি করে)
+# telegram শুধু তখনই ইমপোর্ট হয়
+bot_bridge = None
+if BOT_WEBHOOK_MOUNT:
+    from botkit import WebhookBridge, hold_process_lock
+    from bot import build_bot_application
+    # JobQueue এর full-scan ও notifier শুধু lock পাওয়া একটি worker-এ চলে
+    application = build_bot_application(background=hold_process_lock())
+    bot_bridge = WebhookBridge(application, f"{WEBHOOK_URL}{WEBHOOK_PATH}" if WEBHOOK_URL else None, WEBHOOK_SECRET)
+    bot_bridge.start()
+    # মাউন্ট করা বটে post_shutdown চলে না; worker বন্ধ হওয়ার সময় বাফার করা ডেল্টা যেন না হারায়
+    atexit.register(leaderboards.flush)
+    atexit.register(referral_counters.flush)
+
+# --- প্রি-ওয়ার্ম ---
+def prewarm():
+    """প্রথম রিকোয়েস্টের আগেই Firestore সংযোগ ও লিডারবোর্ড ক্যাশ তৈরি করে।"""
+    started = time.perf_counter()
     try:
-        query = db.collection('users').order_by('totalWithdrawn', direction=firestore.Query.DESCENDING).limit(20)
-        top_users = [{'rank': i + 1, 'username': doc.to_dict().get('username', 'N/A'),
-                      'totalWithdrawn': doc.to_dict().get('totalWithdrawn', 0)} for i, doc in enumerate(query.stream())]
-        db.collection('leaderboard').document('top_players').set({'players': top_users, 'lastUpdated': firestore.SERVER_TIMESTAMP})
-        await update.message.reply_text(f"✅ Leaderboard updated with {len(top_users)} players!")
+        get_cached_leaderboard()
+        logging.info(f"Prewarm finished in {time.perf_counter() - started:.2f}s")
     except Exception as e:
-        logging.error(f"Leaderboard update failed: {e}")
-        await update.message.reply_text(f"❌ Failed to update leaderboard. Error: {e}")
-
-# --- এই অংশটি শুধুমাত্র Worker হিসেবে চালানোর জন্য ---
-def run_bot():
-    """টেলিগ্রাম বটটি পোলিং মোডে চালায়।"""
-    application = Application.builder().token(BOT_TOKEN).build()
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("updateleaderboard", update_leaderboard_command))
-    logging.info("Starting Telegram bot polling...")
-    application.run_polling()
+        logging.error(f"Prewarm failed: {e}")
+
+if WEB_PREWARM:
+    threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
 
 # --- এই অংশটি শুধুমাত্র লোকাল টেস্টিং এর জন্য ---
 if __name__ == "__main__":
@@ -222,5 +476,5 @@ if __name__ == "__main__":
     # বটটি আলাদা Worker হিসেবে চালানো হবে।
     # লোকাল টেস্টিং এর জন্য, আমরা দুটি আলাদা টার্মিনালে চালাবো:
     # 1. gunicorn server:app
-    # 2. python -c 'from server import run_bot; run_bot()'
-    pass
\ No newline at end of file
+    # 2. python bot.py
+    pass
@@ -0,0 +1,117 @@
+"""ওয়েব ও বট দুই প্রসেসের শেয়ার করা অবজেক্ট ও সহকারী ফাংশন।
+
+Firebase ইমপোর্টের সময় চালু হয় না। `db` একটি অলস (lazy) প্রক্সি - প্রথম
+Firestore কলেই `firestore_client()` ক্রেডেনশিয়াল পড়ে ক্লায়েন্ট তৈরি করে।
+তাই gunicorn worker ও বট দ্রুত চালু হয়, আর gRPC চ্যানেল fork এর পরে
+worker-এর ভেতরেই তৈরি হয়। ওয়েবে প্রথম রিকোয়েস্টের আগেই সংযোগ চাইলে
+WEB_PREWARM=1 (server.py)।
+"""
+import json
+import logging
+import threading
+
+from config import firebase_config_str
+from cache import build_user_cache
+from leaderboard import LeaderboardEngine
+from counters import build_counters, StorageCounters
+from notifier import Notifier
+from storage import build_storage, STORAGE_BACKEND
+from ledger import Ledger
+from withdrawals import WithdrawalPipeline
+from referrals import ReferralIndex
+from rewards import new_user_profile
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def init_firebase():
+    import firebase_admin
+    from firebase_admin import credentials
+    if not firebase_admin._apps: # পুনরায় ইনিশিয়ালাইজেশন এড়ানোর জন্য চেক
+        firebase_admin.initialize_app(credentials.Certificate(json.loads(firebase_config_str)))
+        logging.info("Firebase successfully initialized!")
+
+
+def firestore_client():
+    """প্রথম ডাকে Firebase ইনিশিয়ালাইজ করে Firestore ক্লায়েন্ট দেয়; পরে একই ক্লায়েন্ট।"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from firebase_admin import firestore
+            try:
+                init_firebase()
+                _client = firestore.client()
+            except Exception as e:
+                logging.error(f"Firebase initialization failed: {e}")
+                raise
+    return _client
+
+
+class LazyFirestore:
+    """Firestore ক্লায়েন্টের জায়গায় দেওয়া যায়; প্রথম ব্যবহারে ক্লায়েন্ট তৈরি হয়।"""
+
+    def __getattr__(self, name):
+        return getattr(firestore_client(), name)
+
+
+# STORAGE_BACKEND=sqlite হলে Firebase লাগে না
+db = LazyFirestore() if STORAGE_BACKEND == 'firestore' else None
+
+# ডেটা স্তর (Firestore বা SQLite), বিস্তারিত storage.py তে
+storage = build_storage(db)
+# ইউজার প্রোফাইল ক্যাশ (LRU + TTL), বিস্তারিত cache.py তে
+user_cache = build_user_cache()
+# ইনক্রিমেন্টাল লিডারবোর্ড, বিস্তারিত leaderboard.py তে
+leaderboards = LeaderboardEngine(storage)
+# রেফারেল রিওয়ার্ডের Increment গুলো (direct / buffered / sharded), বিস্তারিত counters.py তে
+if storage.name == 'firestore':
+    referral_counters = build_counters(storage.db, on_write=user_cache.invalidate)
+else:
+    referral_counters = StorageCounters(storage, on_write=user_cache.invalidate)
+# ব্যালান্সের append-only লেজার ও snapshot, বিস্তারিত ledger.py তে
+ledger = Ledger(storage, overlay=referral_counters.overlay)
+# pending উইথড্রয়াল রিভিউ, বিস্তারিত withdrawals.py তে
+withdrawal_pipeline = WithdrawalPipeline(storage, leaderboards, on_user_change=user_cache.invalidate)
+# রেফারেল গ্রাফ (ancestors ও downline), বিস্তারিত referrals.py তে
+referral_index = ReferralIndex(storage)
+# টেলিগ্রামে বাইরে যাওয়া মেসেজের কিউ, বিস্তারিত notifier.py তে
+notifier = Notifier()
+
+# --- Helper Functions (সহকারী ফাংশন) ---
+def create_new_user(user_id, username, referrer_id=None):
+    """ইউজার তৈরি করে রেফারেল ইনডেক্সে বসায়; `(user_data, placement)` ফেরত দেয়।
+
+    অন্য কোনো রিকোয়েস্ট আগেই তৈরি করে ফেললে placement None এবং user_data
+    সেই সংরক্ষিত প্রোফাইল - তখন কোনো রেফারেল রিওয়ার্ড দেওয়া যাবে না।
+    """
+    user_data = new_user_profile(username, referrer_id)
+    if not storage.create_user(user_id, user_data):
+        return storage.get_user(user_id) or user_data, None
+    user_cache.set(user_id, user_data)
+    logging.info(f"New user created: {user_id}, Referred by: {referrer_id}")
+    try:
+        placement = referral_index.add(user_id, referrer_id, username)
+    except Exception as e:
+        # ইনডেক্স না লিখতে পারলেও সরাসরি রেফারার আগের মতো রিওয়ার্ড পায়
+        logging.error(f"Referral index update failed for {user_id}: {e}")
+        placement = {'ancestors': [str(referrer_id)] if referrer_id else [], 'flagged': None, 'withheld': set()}
+    return user_data, placement
+
+def get_user_data(user_id):
+    """ক্যাশ থেকে প্রোফাইল দেয়, না পেলে storage থেকে পড়ে ক্যাশে রাখে।"""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user_data = storage.get_user(user_id)
+    if user_data is None:
+        return None
+    user_cache.set(user_id, user_data)
+    return user_data
+
+def compact_ledger(user_id):
+    """লেজার snapshot এগিয়ে নেয়; ব্যর্থ হলে শুধু লগ (পরের ইভেন্টে আবার চেষ্টা হবে)।"""
+    try:
+        ledger.compact(user_id)
+    except Exception as e:
+        logging.error(f"Ledger compaction failed for {user_id}: {e}")
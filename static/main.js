@@ -7,6 +7,8 @@ document.addEventListener("DOMContentLoaded", function() {
     const API_BASE_URL = 'https://hubcoin-tuft.onrender.com/api'; 
     // ⚠️ আপনার টেলিগ্রাম বটের ইউজারনেম দিন
     const BOT_USERNAME = 'HubCoin_minerbot'; 
+    // বিজ্ঞাপনের দৈর্ঘ্য; সার্ভারও একজন ইউজারকে প্রায় এর চেয়ে ঘন ঘন রিওয়ার্ড দেয় না
+    const AD_WATCH_SECONDS = 15;
 
     const elements = {
         loadingOverlay: document.getElementById('loading-overlay'),
@@ -18,6 +20,7 @@ document.addEventListener("DOMContentLoaded", function() {
         totalRefs: document.getElementById('total-refs'),
         totalAdWatch: document.getElementById('total-ad-watch'),
         todayIncome: document.getElementById('today-income'),
+        adsLeft: document.getElementById('ads-left'),
         refLink: document.getElementById('ref-link'),
         unclaimedGems: document.getElementById('unclaimed-gems'),
         navButtons: document.querySelectorAll('.nav-button'),
@@ -44,22 +47,48 @@ document.addEventListener("DOMContentLoaded", function() {
     };
 
     let currentUserData = {};
+    let leaderboardData = null;
+    // টাস্কের সেটিং সার্ভার থেকে (/api/bootstrap) আসে
+    let taskConfig = { dailyAdLimit: 10, telegramTask: false, telegramChannelUrl: null };
     let withdrawalState = {
         method: null,
         amount: null,
         isCustom: false,
-        requiredGems: 0
+        requiredGems: 0,
+        idempotencyKey: null // একই ফর্মের ডবল-ট্যাপ বা retry তে একই কী যায়
     };
     const user = tg.initDataUnsafe?.user;
+    // initData একবার যাচাই হলে সার্ভার একটি ছোট session টোকেন দেয়; পরের কলগুলোতে সেটিই যায়
+    let sessionToken = sessionStorage.getItem('hubcoin_session');
+
+    function authHeaders(extra = {}) {
+        const headers = { 'Content-Type': 'application/json', ...extra };
+        if (sessionToken) headers['Authorization'] = `Bearer ${sessionToken}`;
+        return headers;
+    }
+
+    function rememberSession(response) {
+        const token = response.headers.get('X-Session-Token');
+        if (token) {
+            sessionToken = token;
+            sessionStorage.setItem('hubcoin_session', token);
+        }
+    }
 
     // --- API কমিউনিকেশন ---
-    async function fetchApi(endpoint, method = 'POST', body = {}) {
+    function newIdempotencyKey() {
+        if (window.crypto?.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    async function fetchApi(endpoint, method = 'POST', body = {}, extraHeaders = {}) {
         try {
             const response = await fetch(`${API_BASE_URL}${endpoint}`, {
                 method: method,
-                headers: { 'Content-Type': 'application/json' },
+                headers: authHeaders(extraHeaders),
                 body: JSON.stringify({ ...body, user_id: user?.id, user_data: tg.initData })
             });
+            rememberSession(response);
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
@@ -72,6 +101,37 @@ document.addEventListener("DOMContentLoaded", function() {
         }
     }
 
+    // --- বুটস্ট্র্যাপ: এক রিকোয়েস্টে ইউজার, লিডারবোর্ড ও প্রাইসিং ---
+    // আগের রেসপন্স ETag সহ localStorage এ রাখা হয়; সার্ভার 304 দিলে সেটিই ব্যবহার হয়।
+    const BOOTSTRAP_CACHE_KEY = `hubcoin_bootstrap_${user?.id}`;
+
+    async function fetchBootstrap() {
+        let cached = null;
+        try { cached = JSON.parse(localStorage.getItem(BOOTSTRAP_CACHE_KEY)); } catch (e) { cached = null; }
+        try {
+            const headers = authHeaders(cached?.etag ? { 'If-None-Match': cached.etag } : {});
+            const response = await fetch(`${API_BASE_URL}/bootstrap`, {
+                method: 'POST',
+                headers: headers,
+                body: JSON.stringify({ username: user.username || user.first_name, user_id: user?.id, user_data: tg.initData })
+            });
+            rememberSession(response);
+            if (response.status === 304 && cached) return cached.data;
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+            }
+            const data = await response.json();
+            const etag = response.headers.get('ETag');
+            if (etag) localStorage.setItem(BOOTSTRAP_CACHE_KEY, JSON.stringify({ etag, data }));
+            return data;
+        } catch (error) {
+            console.error('API Error at /bootstrap:', error);
+            Swal.fire('Error', error.message, 'error');
+            return null;
+        }
+    }
+
     // --- UI আপডেট ফাংশন ---
     function updateUI(data) {
         currentUserData = data;
@@ -82,9 +142,28 @@ document.addEventListener("DOMContentLoaded", function() {
         elements.totalAdWatch.textContent = data.adWatch;
         elements.todayIncome.textContent = `৳ ${data.todayIncome.toFixed(2)}`;
         elements.unclaimedGems.textContent = data.unclaimedGems || 0;
+        elements.adsLeft.textContent = `${Math.max(0, taskConfig.dailyAdLimit - (data.adWatchToday || 0))}/${taskConfig.dailyAdLimit}`;
         elements.refLink.textContent = `https://t.me/${BOT_USERNAME}?start=${user?.id}`;
     }
 
+    // --- টাস্ক ও রিওয়ার্ড ---
+    // প্রতিটি ক্লিকে নতুন Idempotency-Key; অনুরোধ চলাকালীন বাটন বন্ধ থাকে
+    async function runTask(button, endpoint) {
+        button.disabled = true;
+        try {
+            const result = await fetchApi(endpoint, 'POST', {}, { 'Idempotency-Key': newIdempotencyKey() });
+            if (!result) return;
+            if (result.success) {
+                updateUI({ ...currentUserData, ...result.data });
+                Swal.fire({ toast: true, position: 'top-end', text: result.message, showConfirmButton: false, timer: 1500, icon: 'success' });
+            } else {
+                Swal.fire('Oops', result.message, 'info');
+            }
+        } finally {
+            button.disabled = false;
+        }
+    }
+
     // --- পেজ পরিবর্তন ---
     function switchPage(targetPageId) {
         elements.pages.forEach(page => page.classList.remove('page-active'));
@@ -92,11 +171,8 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 
     // --- উইথড্রয়াল মডাল লজিক ---
-    const withdrawalConfig = {
-        'Bkash': { type: 'TK', amounts: [500, 1000, 1500], gems: [29, 49, 79], customGemRate: 50 },
-        'Nagad': { type: 'TK', amounts: [500, 1000, 1500], gems: [29, 49, 79], customGemRate: 50 },
-        'Binance': { type: 'USD', amounts: [5, 10, 15], gems: [58, 100, 150], customGemRate: 10 } // প্রতি ডলারের জন্য ১০ জেম (উদাহরণ)
-    };
+    // প্রাইসিং টেবিল সার্ভার থেকে (/api/bootstrap) আসে
+    let withdrawalConfig = {};
 
     function updateAmountButtons() {
         elements.amountOptions.innerHTML = '';
@@ -124,6 +200,7 @@ document.addEventListener("DOMContentLoaded", function() {
     function checkCanSubmit() {
         const { amount, method, requiredGems } = withdrawalState;
         const account = elements.accountInput.value;
+        withdrawalState.idempotencyKey = null; // ফর্ম বদলালে নতুন অনুরোধ
         if (amount && method && account) {
             if (currentUserData.balance >= amount && currentUserData.gems >= requiredGems) {
                 elements.submitWithdrawalBtn.disabled = false;
@@ -148,9 +225,18 @@ document.addEventListener("DOMContentLoaded", function() {
                 .then(() => Swal.fire({ toast: true, position: 'top-end', text: 'Copied!', showConfirmButton: false, timer: 1500, icon: 'success' }));
         });
 
-        elements.watchAdBtn.addEventListener('click', async () => { /* ... Watch Ad Logic ... */ });
-        elements.joinTelegramBtn.addEventListener('click', async () => { /* ... Join Telegram Logic ... */ });
-        elements.claimGemsBtn.addEventListener('click', async () => { /* ... Claim Gems Logic ... */ });
+        elements.watchAdBtn.addEventListener('click', async () => {
+            await Swal.fire({ title: 'Watching ad...', timer: AD_WATCH_SECONDS * 1000, timerProgressBar: true,
+                              allowOutsideClick: false, didOpen: () => Swal.showLoading() });
+            await runTask(elements.watchAdBtn, '/watch-ad');
+        });
+        elements.joinTelegramBtn.addEventListener('click', async () => {
+            if (taskConfig.telegramChannelUrl) tg.openTelegramLink(taskConfig.telegramChannelUrl);
+            const confirm = await Swal.fire({ title: 'Join our channel', text: 'Tap Verify after joining the channel.',
+                                              showCancelButton: true, confirmButtonText: 'Verify' });
+            if (confirm.isConfirmed) await runTask(elements.joinTelegramBtn, '/join-telegram');
+        });
+        elements.claimGemsBtn.addEventListener('click', () => runTask(elements.claimGemsBtn, '/claim-gems'));
 
         // --- প্রোফাইল এবং মডাল ---
         elements.requestWithdrawalCard.addEventListener('click', () => elements.withdrawalModal.style.display = 'flex');
@@ -196,11 +282,7 @@ document.addEventListener("DOMContentLoaded", function() {
             const config = withdrawalConfig[withdrawalState.method];
             if (amount > 0 && config) {
                 withdrawalState.amount = amount;
-                if (config.type === 'TK') {
-                    withdrawalState.requiredGems = Math.ceil(amount / 500) * config.customGemRate;
-                } else {
-                    withdrawalState.requiredGems = Math.ceil(amount) * config.customGemRate;
-                }
+                withdrawalState.requiredGems = Math.ceil(amount / config.customUnit) * config.customGemRate;
                 elements.customGemRequirementMsg.textContent = `Requires ${withdrawalState.requiredGems} Gems.`;
             } else {
                 withdrawalState.amount = null;
@@ -211,22 +293,54 @@ document.addEventListener("DOMContentLoaded", function() {
         elements.accountInput.addEventListener('input', checkCanSubmit);
 
         elements.submitWithdrawalBtn.addEventListener('click', async () => {
+            if (!withdrawalState.idempotencyKey) withdrawalState.idempotencyKey = newIdempotencyKey();
             Swal.fire({ title: 'Processing...', allowOutsideClick: false, didOpen: () => Swal.showLoading() });
             const result = await fetchApi('/withdrawal', 'POST', {
                 amount: withdrawalState.amount,
                 method: withdrawalState.method,
                 account: elements.accountInput.value
-            });
+            }, { 'Idempotency-Key': withdrawalState.idempotencyKey });
             if (result && result.success) {
                 elements.withdrawalModal.style.display = 'none';
                 Swal.fire('Success!', result.message, 'success');
-                updateUI(result.data); // ব্যালেন্স এবং জেম আপডেট করুন
+                updateUI({ ...currentUserData, ...result.data }); // ব্যালেন্স এবং জেম আপডেট করুন
             }
         });
     }
     
     // --- লিডারবোর্ড লোড করা ---
-    async function loadLeaderboard() { /* ... Leaderboard Logic ... */ }
+    async function loadLeaderboard() {
+        if (!leaderboardData) {
+            try {
+                const response = await fetch(`${API_BASE_URL}/leaderboard`);
+                if (response.ok) leaderboardData = await response.json();
+            } catch (error) {
+                console.error('API Error at /leaderboard:', error);
+            }
+        }
+        const list = document.getElementById('leaderboard-list');
+        const players = leaderboardData?.players || [];
+        if (!players.length) {
+            list.innerHTML = '<p style="text-align: center; color: var(--text-light); margin-top: 40px;">No players yet.</p>';
+            return;
+        }
+        list.innerHTML = '';
+        players.forEach(player => {
+            const item = document.createElement('div');
+            item.className = 'leaderboard-item';
+            const rank = document.createElement('span');
+            rank.className = 'rank';
+            rank.textContent = `#${player.rank}`;
+            const name = document.createElement('span');
+            name.className = 'username';
+            name.textContent = player.username;
+            const amount = document.createElement('span');
+            amount.className = 'amount';
+            amount.textContent = `৳ ${Number(player.totalWithdrawn || 0).toFixed(2)}`;
+            item.append(rank, name, amount);
+            list.appendChild(item);
+        });
+    }
 
     // --- অ্যাপ ইনিশিয়ালাইজেশন ---
     async function initializeApp() {
@@ -242,10 +356,15 @@ document.addEventListener("DOMContentLoaded", function() {
         //     if(photos.total_count > 0) elements.userProfilePic.src = photos.photos[0][0].file_id;
         // } catch (e) { console.error("Could not load profile photo", e); }
 
-        const userData = await fetchApi('/user', 'POST', { username: user.username || user.first_name });
+        const bootstrapData = await fetchBootstrap();
         
-        if (userData) {
-            updateUI(userData);
+        if (bootstrapData) {
+            withdrawalConfig = bootstrapData.pricing;
+            taskConfig = bootstrapData.tasks || taskConfig;
+            // সার্ভারে চ্যানেল কনফিগার না থাকলে Join Telegram টাস্ক দেখানো হয় না
+            if (!taskConfig.telegramTask) elements.joinTelegramBtn.closest('.task-card').style.display = 'none';
+            leaderboardData = bootstrapData.leaderboard;
+            updateUI(bootstrapData.user);
             setupEventListeners();
         }
 
@@ -254,8 +373,4 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 
     initializeApp();
-});
-
-// Helper functions for tasks and leaderboard can be added here
-// For example:
-async function claimGemsLogic() { /* ... */ }
\ No newline at end of file
+});
\ No newline at end of file
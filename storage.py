@@ -0,0 +1,448 @@
+"""ডেটা রাখার স্তর: Firestore অথবা এমবেডেড SQLite।
+
+server.py আর সরাসরি Firestore ক্লায়েন্ট ডাকে না; সব ইউজার রিড/রাইট, gem
+claim ও withdrawal এর ট্রানজ্যাকশন এবং লিডারবোর্ড ডকুমেন্ট এই ইন্টারফেস
+দিয়ে যায়। দুটি ব্যাকএন্ড:
+
+*   `firestore` - আগের মতো Firebase (ডিফল্ট)।
+*   `sqlite`    - একটি লোকাল ফাইল (WAL মোড), সব gunicorn worker শেয়ার করে।
+                  ছোট ডিপ্লয়মেন্ট, অফলাইন টেস্ট ও বেঞ্চমার্কের জন্য।
+
+ডকুমেন্ট মডেল দুই জায়গাতেই এক: `collection/id -> dict`। ইউজারের পরিবর্তন
+`plan(user, folded) -> (result, change)` ফাংশন দিয়ে হয়, যেখানে change হলো
+`{'increments': {...}, 'values': {...}, 'records': [(collection, doc_id, data)]}`
+অথবা None (কিছু লেখা হবে না); doc_id None হলে নতুন আইডি তৈরি হয়। পুরো
+plan + write একটি atomic ইউনিট।
+
+Environment ভেরিয়েবল:
+    STORAGE_BACKEND   firestore | sqlite   (ডিফল্ট: firestore)
+    STORAGE_PATH      sqlite ব্যাকএন্ডের ফাইল (ডিফল্ট: hubcoin_data.sqlite3)
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+
+from metrics import track_firestore, track_transaction
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").lower()
+STORAGE_PATH = os.getenv("STORAGE_PATH", "hubcoin_data.sqlite3")
+BATCH_LIMIT = 500  # Firestore-এর এক batch-এ সর্বোচ্চ রাইট
+
+
+class _ServerTimestamp:
+    """লেখার সময় ব্যাকএন্ড নিজের সময় বসাবে (Firestore-এ SERVER_TIMESTAMP)।"""
+
+    def __repr__(self):
+        return 'SERVER_TIMESTAMP'
+
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+class UserNotFound(KeyError):
+    """`apply_user_change` এর ইউজার ডকুমেন্ট নেই - দুই ব্যাকএন্ডেই একই ত্রুটি।"""
+
+
+class Increment:
+    """`commit_batch` এর update-এ ফিল্ডের মান এতটা বাড়ানো হবে।"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class FirestoreStorage:
+    name = 'firestore'
+
+    def __init__(self, db, firestore_module=None):
+        self.db = db
+        self._fs = firestore_module
+
+    @property
+    def fs(self):
+        # firebase_admin প্রথম ব্যবহারে ইমপোর্ট হয়, যাতে প্রসেস দ্রুত চালু হয়
+        if self._fs is None:
+            from firebase_admin import firestore
+            self._fs = firestore
+        return self._fs
+
+    def _user_ref(self, user_id):
+        return self.db.collection('users').document(str(user_id))
+
+    def _resolve_value(self, value):
+        if value is SERVER_TIMESTAMP:
+            return self.fs.SERVER_TIMESTAMP
+        if isinstance(value, Increment):
+            return self.fs.Increment(value.value)
+        return value
+
+    def _resolve(self, data):
+        return {key: self._resolve_value(value) for key, value in data.items()}
+
+    def _as_update(self, change):
+        update = {field: self.fs.Increment(value) for field, value in (change.get('increments') or {}).items()}
+        update.update(change.get('values') or {})
+        return self._resolve(update)
+
+    def get_user(self, user_id):
+        with track_firestore('read'):
+            doc = self._user_ref(user_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def create_user(self, user_id, data):
+        """ডকুমেন্ট না থাকলেই তৈরি করে; আগে থেকে থাকলে False (একসাথে দুটি /start এলে একটিই জেতে)।"""
+        # নকল Firestore (benchmarks) নিজের AlreadyExists দেয়
+        already_exists = getattr(self.fs, 'AlreadyExists', None)
+        if already_exists is None:
+            from google.api_core.exceptions import AlreadyExists as already_exists
+        try:
+            with track_firestore('write'):
+                self._user_ref(user_id).create(self._resolve(data))
+        except already_exists:
+            return False
+        return True
+
+    def increment_user(self, user_id, deltas):
+        with track_firestore('write'):
+            self._user_ref(user_id).update({field: self.fs.Increment(value) for field, value in deltas.items()})
+
+    def apply_user_change(self, user_id, plan, name, fold=None, guard=None, on_duplicate=None):
+        """ইউজার ডকুমেন্ট ট্রানজ্যাকশনে পড়ে plan চালায় এবং change লেখে।
+
+        `fold(transaction, doc_ref)` দিলে (sharded কাউন্টার) snapshot পড়ার পরে
+        ডাকা হয় এবং তার ডেল্টা plan-এ যায়। `guard=(collection, doc_id)` ডকুমেন্টটি
+        আগে থেকেই থাকলে কিছু লেখা হয় না, `on_duplicate(existing)` এর ফল ফেরত যায়।
+        ইউজার না থাকলে UserNotFound - কোনো ডকুমেন্ট তৈরি হয় না।
+        """
+        @self.fs.transactional
+        @track_transaction(name)
+        def run(transaction, doc_ref):
+            if guard is not None:
+                with track_firestore('read'):
+                    existing = self.db.collection(guard[0]).document(guard[1]).get(transaction=transaction)
+                if existing.exists:
+                    return on_duplicate(existing.to_dict())
+            with track_firestore('read'):
+                snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                raise UserNotFound(user_id)
+            folded = fold(transaction, doc_ref) if fold else {}
+            result, change = plan(snapshot.to_dict(), folded)
+            if change is not None:
+                records = change.get('records') or []
+                with track_firestore('write', count=1 + len(records)):
+                    transaction.update(doc_ref, self._as_update(change))
+                    for collection, doc_id, data in records:
+                        transaction.set(self.db.collection(collection).document(doc_id), self._resolve(data))
+            return result
+        with track_firestore('transaction'):
+            return run(self.db.transaction(), self._user_ref(user_id))
+
+    def run_transaction(self, plan, name):
+        """`plan(read) -> (result, writes)` ট্রানজ্যাকশনে চালায়।
+
+        `read(collection, doc_ids)` ট্রানজ্যাকশনের ভেতরে `{doc_id: data}` পড়ে;
+        writes হলো `commit_batch` এর মতো `[(op, collection, doc_id, data)]`
+        (সর্বোচ্চ BATCH_LIMIT টি)। conflict হলে plan আবার চলে, তাই plan-এ বাইরের
+        কোনো অবস্থা বদলানো যাবে না।
+        """
+        @self.fs.transactional
+        @track_transaction(name)
+        def run(transaction):
+            def read(collection, doc_ids):
+                refs = [self.db.collection(collection).document(str(doc_id)) for doc_id in doc_ids]
+                if not refs:
+                    return {}
+                with track_firestore('read', count=len(refs)):
+                    return {doc.id: doc.to_dict() for doc in transaction.get_all(refs) if doc.exists}
+            result, writes = plan(read)
+            with track_firestore('write', count=len(writes)):
+                for op, collection, doc_id, data in writes:
+                    getattr(transaction, op)(self.db.collection(collection).document(str(doc_id)), self._resolve(data))
+            return result
+        with track_firestore('transaction'):
+            return run(self.db.transaction())
+
+    def get_document(self, collection, doc_id):
+        with track_firestore('read'):
+            doc = self.db.collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def set_document(self, collection, doc_id, data):
+        with track_firestore('write'):
+            self.db.collection(collection).document(doc_id).set(self._resolve(data))
+
+    def merge_document(self, collection, doc_id, merge):
+        """`merge(stored or {}) -> new data` ট্রানজ্যাকশনে চালিয়ে লেখে।"""
+        @self.fs.transactional
+        def run(transaction, doc_ref):
+            snapshot = doc_ref.get(transaction=transaction)
+            transaction.set(doc_ref, self._resolve(merge(snapshot.to_dict() if snapshot.exists else {})))
+        run(self.db.transaction(), self.db.collection(collection).document(doc_id))
+
+    def get_documents(self, collection, doc_ids):
+        """একাধিক ডকুমেন্ট একটি রাউন্ড-ট্রিপে; `{doc_id: data}` (না থাকলে বাদ)।"""
+        refs = [self.db.collection(collection).document(str(doc_id)) for doc_id in doc_ids]
+        if not refs:
+            return {}
+        with track_firestore('read', count=len(refs)):
+            return {doc.id: doc.to_dict() for doc in self.db.get_all(refs) if doc.exists}
+
+    def page_documents(self, collection, equals=None, order_by=None, limit=50, cursor=None, descending=False,
+                       start=None):
+        """`(rows, next_cursor)` - rows হলো `(doc_id, data)`; cursor হলো আগের পাতার শেষ ডকুমেন্টের আইডি।
+
+        order_by না দিলে ডকুমেন্ট আইডি অনুযায়ী সাজানো। equals ও order_by একসাথে
+        দিলে Firestore-এ composite index লাগে। start দিলে order_by ফিল্ডের মান
+        start থেকে শুরু (descending হলে start পর্যন্ত); সময়ের জন্য datetime দিন।
+        """
+        query = self.db.collection(collection)
+        for key, value in (equals or {}).items():
+            query = query.where(key, '==', value)
+        if start is not None and order_by:
+            query = query.where(order_by, '<=' if descending else '>=', start)
+        direction = self.fs.Query.DESCENDING if descending else self.fs.Query.ASCENDING
+        if order_by or descending:
+            query = query.order_by(order_by or '__name__', direction=direction)
+        if cursor:
+            with track_firestore('read'):
+                last = self.db.collection(collection).document(cursor).get()
+            if last.exists:
+                query = query.start_after(last)
+        with track_firestore('read'):
+            docs = list(query.limit(limit).stream())
+        rows = [(doc.id, doc.to_dict()) for doc in docs]
+        return rows, (rows[-1][0] if len(rows) == limit else None)
+
+    def commit_batch(self, writes):
+        """`[(op, collection, doc_id, data)]` (op: 'set' বা 'update') BATCH_LIMIT এর টুকরোয় লেখে।
+
+        প্রতিটি টুকরো আলাদা atomic commit; কয়টি commit হলো তা ফেরত দেয়।
+        """
+        commits = 0
+        for start in range(0, len(writes), BATCH_LIMIT):
+            chunk = writes[start:start + BATCH_LIMIT]
+            batch = self.db.batch()
+            for op, collection, doc_id, data in chunk:
+                getattr(batch, op)(self.db.collection(collection).document(str(doc_id)), self._resolve(data))
+            with track_firestore('write', count=len(chunk)):
+                batch.commit()
+            commits += 1
+        return commits
+
+    def top_users(self, field, limit, equals=None):
+        """field অনুযায়ী বড় থেকে ছোট `(user_id, data)` তালিকা; equals দিলে সেই ফিল্ডগুলো মিলতে হবে।"""
+        query = self.db.collection('users')
+        for key, value in (equals or {}).items():
+            query = query.where(key, '==', value)
+        query = query.order_by(field, direction=self.fs.Query.DESCENDING).limit(limit)
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def iter_user_ids(self, page_size=500):
+        """users কালেকশনের আইডিগুলো পাতা ধরে দেয় - মেমরিতে একবারে শুধু এক পাতা থাকে।"""
+        query = self.db.collection('users').order_by('__name__').select([]).limit(page_size)
+        last = None
+        while True:
+            page = list((query.start_after(last) if last is not None else query).stream())
+            if not page:
+                return
+            for doc in page:
+                yield doc.id
+            last = page[-1]
+
+
+class SQLiteStorage:
+    """একটি `documents` টেবিলে JSON হিসেবে রাখা ডকুমেন্ট।
+
+    প্রতিটি atomic কাজ `BEGIN IMMEDIATE` ট্রানজ্যাকশনে চলে, তাই একাধিক
+    প্রসেস একসাথে claim/withdrawal করলেও একটির পর একটি হয় - Firestore
+    ট্রানজ্যাকশনের মতোই কোনো আপডেট হারায় না।
+    """
+    name = 'sqlite'
+
+    def __init__(self, path=STORAGE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS documents ("
+                         "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+                         "PRIMARY KEY (collection, id))")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn, collection, doc_id):
+        row = conn.execute("SELECT data FROM documents WHERE collection = ? AND id = ?",
+                           (collection, str(doc_id))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn, collection, doc_id, data, current=None):
+        """current দিলে data তার উপর মেলানো হয় (update)।"""
+        merged = dict(current or {})
+        for key, value in data.items():
+            merged[key] = _sqlite_value(value, merged.get(key, 0))
+        data = merged
+        conn.execute("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                     (collection, str(doc_id), json.dumps(data, default=str)))
+
+    def _atomic(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def get_user(self, user_id):
+        return self._read(self._conn(), 'users', user_id)
+
+    def create_user(self, user_id, data):
+        data = {key: _sqlite_value(value, 0) for key, value in data.items()}
+        try:
+            # REPLACE ছাড়া INSERT - আগে থেকে থাকলে primary key এ আটকে যায়
+            self._conn().execute("INSERT INTO documents (collection, id, data) VALUES ('users', ?, ?)",
+                                 (str(user_id), json.dumps(data, default=str)))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def increment_user(self, user_id, deltas):
+        def run(conn):
+            user = self._read(conn, 'users', user_id)
+            if user is None:
+                raise KeyError(f"user {user_id} does not exist")
+            for field, value in deltas.items():
+                user[field] = user.get(field, 0) + value
+            self._write(conn, 'users', user_id, user)
+        self._atomic(run)
+
+    def apply_user_change(self, user_id, plan, name, fold=None, guard=None, on_duplicate=None):
+        # SQLite-এ shard নেই, তাই fold সবসময় খালি
+        def run(conn):
+            if guard is not None:
+                existing = self._read(conn, *guard)
+                if existing is not None:
+                    return on_duplicate(existing)
+            user = self._read(conn, 'users', user_id)
+            if user is None:
+                # Firestore এর update এর মতো: নেই এমন ইউজারের জন্য নতুন ডকুমেন্ট লেখা হয় না
+                raise UserNotFound(user_id)
+            result, change = plan(dict(user), {})
+            if change is not None:
+                for field, value in (change.get('increments') or {}).items():
+                    user[field] = user.get(field, 0) + value
+                user.update(change.get('values') or {})
+                self._write(conn, 'users', user_id, user)
+                for collection, doc_id, data in change.get('records') or []:
+                    self._write(conn, collection, doc_id or uuid.uuid4().hex, data)
+            return result
+        return self._atomic(run)
+
+    def get_document(self, collection, doc_id):
+        return self._read(self._conn(), collection, doc_id)
+
+    def set_document(self, collection, doc_id, data):
+        self._write(self._conn(), collection, doc_id, data)
+
+    def merge_document(self, collection, doc_id, merge):
+        self._atomic(lambda conn: self._write(conn, collection, doc_id,
+                                              merge(self._read(conn, collection, doc_id) or {})))
+
+    def get_documents(self, collection, doc_ids):
+        conn = self._conn()
+        return {str(doc_id): data for doc_id in doc_ids
+                if (data := self._read(conn, collection, doc_id)) is not None}
+
+    def page_documents(self, collection, equals=None, order_by=None, limit=50, cursor=None, descending=False,
+                       start=None):
+        conn = self._conn()
+        op, direction = ('<', ' DESC') if descending else ('>', '')
+        sql, params = "SELECT id, data FROM documents WHERE collection = ?", [collection]
+        for key, value in (equals or {}).items():
+            sql += " AND json_extract(data, ?) = ?"
+            params += [f"$.{key}", value]
+        if start is not None and order_by:
+            sql += f" AND json_extract(data, ?) {'<=' if descending else '>='} ?"
+            params += [f"$.{order_by}", start.timestamp() if isinstance(start, datetime) else start]
+        if cursor:
+            last = self._read(conn, collection, cursor)
+            if order_by and last is not None:
+                sql += f" AND (json_extract(data, ?) {op} ? OR (json_extract(data, ?) = ? AND id {op} ?))"
+                params += [f"$.{order_by}", last.get(order_by), f"$.{order_by}", last.get(order_by), cursor]
+            else:
+                sql += f" AND id {op} ?"
+                params.append(cursor)
+        sql += (f" ORDER BY json_extract(data, ?){direction}, id{direction}" if order_by
+                else f" ORDER BY id{direction}") + " LIMIT ?"
+        params += ([f"$.{order_by}"] if order_by else []) + [limit]
+        rows = [(row[0], json.loads(row[1])) for row in conn.execute(sql, params)]
+        return rows, (rows[-1][0] if len(rows) == limit else None)
+
+    def _apply_writes(self, conn, writes):
+        for op, collection, doc_id, data in writes:
+            current = self._read(conn, collection, doc_id)
+            if op == 'update' and current is None:
+                raise KeyError(f"{collection}/{doc_id} does not exist")
+            self._write(conn, collection, doc_id, data, current if op == 'update' else None)
+
+    def run_transaction(self, plan, name):
+        def run(conn):
+            read = lambda collection, doc_ids: {str(doc_id): data for doc_id in doc_ids
+                                                if (data := self._read(conn, collection, doc_id)) is not None}
+            result, writes = plan(read)
+            self._apply_writes(conn, writes)
+            return result
+        return self._atomic(run)
+
+    def commit_batch(self, writes):
+        commits = 0
+        for start in range(0, len(writes), BATCH_LIMIT):
+            chunk = writes[start:start + BATCH_LIMIT]
+            self._atomic(lambda conn: self._apply_writes(conn, chunk))
+            commits += 1
+        return commits
+
+    def top_users(self, field, limit, equals=None):
+        sql, params = "SELECT id, data FROM documents WHERE collection = 'users'", []
+        for key, value in (equals or {}).items():
+            sql += " AND json_extract(data, ?) = ?"
+            params += [f"$.{key}", value]
+        sql += " AND json_extract(data, ?) IS NOT NULL ORDER BY json_extract(data, ?) DESC LIMIT ?"
+        params += [f"$.{field}", f"$.{field}", limit]
+        return [(row[0], json.loads(row[1])) for row in self._conn().execute(sql, params)]
+
+    def iter_user_ids(self, page_size=500):
+        last = ''
+        while True:
+            page = [row[0] for row in self._conn().execute(
+                "SELECT id FROM documents WHERE collection = 'users' AND id > ? ORDER BY id LIMIT ?", (last, page_size))]
+            if not page:
+                return
+            yield from page
+            last = page[-1]
+
+
+def _sqlite_value(value, current):
+    if value is SERVER_TIMESTAMP:
+        return time.time()
+    if isinstance(value, Increment):
+        return current + value.value
+    return value
+
+
+def build_storage(db=None, backend=STORAGE_BACKEND):
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    return FirestoreStorage(db)
@@ -0,0 +1,188 @@
+"""উইথড্রয়াল রিভিউ পাইপলাইন।
+
+`/api/withdrawal` রিকোয়েস্টগুলো `withdrawals` কালেকশনে `pending` হিসেবে
+জমা হয়। এখানে সেগুলো সময় অনুযায়ী পাতা ধরে (cursor) পড়া হয় এবং অ্যাডমিন
+একসাথে অনেকগুলো approve বা reject করতে পারেন:
+
+*   approve - স্ট্যাটাস `approved`, ইউজারের `totalWithdrawn` ও সাপ্তাহিক
+    `weeklyWithdrawn` বাড়ে, লিডারবোর্ড আপডেট হয়।
+*   reject  - স্ট্যাটাস `rejected`, কাটা ব্যালান্স ও জেম ফেরত যায় এবং
+    লেজারে `withdrawal_refund` ইভেন্ট লেখা হয়।
+
+প্রতিটি টুকরো (সর্বোচ্চ ৫০০টি রাইট) একটি ট্রানজ্যাকশনে লেখা হয়, যা আগে
+withdrawal গুলো আবার পড়ে শুধু এখনো `pending` গুলো প্রসেস করে - তাই দুটি
+প্রসেস বা অ্যাডমিন একসাথে রিভিউ করলেও একটি রিকোয়েস্ট দুবার প্রসেস হয় না।
+
+Environment ভেরিয়েবল:
+    WITHDRAWAL_PAGE_SIZE  ড্রেইন করার সময় প্রতি পাতায় কতটি পড়া হবে (ডিফল্ট: 250)
+"""
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+
+from leaderboard import current_week_key
+from ledger import event_record
+from rewards import required_gems_for
+from storage import Increment, SERVER_TIMESTAMP, BATCH_LIMIT
+
+WITHDRAWAL_PAGE_SIZE = int(os.getenv("WITHDRAWAL_PAGE_SIZE", 250))
+# প্রতিটি উইথড্রয়ালে সর্বোচ্চ তিনটি রাইট (withdrawal + ইউজার + লেজার ইভেন্ট),
+# তাই এক commit-এ এক-তৃতীয়াংশ
+CHUNK_SIZE = BATCH_LIMIT // 3
+
+
+class WithdrawalPipeline:
+    def __init__(self, storage, leaderboards=None, on_user_change=None, page_size=WITHDRAWAL_PAGE_SIZE):
+        self.storage = storage
+        self.leaderboards = leaderboards
+        # প্রতিটি পরিবর্তিত ইউজারের জন্য ডাকা হয় (যেমন ক্যাশ invalidate করতে)
+        self.on_user_change = on_user_change or (lambda user_id: None)
+        self.page_size = page_size
+        self._lock = threading.Lock()
+
+    def pending(self, limit=10, cursor=None):
+        """পুরনো থেকে নতুন `(rows, next_cursor)`; rows হলো `(withdrawal_id, data)`।"""
+        return self.storage.page_documents('withdrawals', {'status': 'pending'}, 'timestamp', limit, cursor)
+
+    def iter_pending(self):
+        """সব pending রিকোয়েস্ট পাতা ধরে দেয় - মেমরিতে একবারে শুধু এক পাতা থাকে।"""
+        cursor = None
+        while True:
+            rows, cursor = self.pending(self.page_size, cursor)
+            yield from rows
+            if cursor is None:
+                return
+
+    def approve(self, ids=None, limit=None, admin_id=None):
+        """ids দিলে শুধু সেগুলো, না দিলে সব pending (limit পর্যন্ত) approve করে।"""
+        return self._run('approved', ids, limit, admin_id)
+
+    def reject(self, ids, admin_id=None, reason=None):
+        return self._run('rejected', ids, None, admin_id, reason)
+
+    def _run(self, status, ids, limit, admin_id, reason=None):
+        with self._lock:
+            started = time.perf_counter()
+            report = {'action': status, 'processed': 0, 'skipped': 0, 'commits': 0, 'amount': 0.0, 'orphaned': 0}
+            chunk = []
+            for withdrawal_id, data in self._select(ids, limit, report):
+                chunk.append((withdrawal_id, data))
+                if len(chunk) >= CHUNK_SIZE:
+                    self._process(chunk, status, admin_id, reason, report)
+                    chunk = []
+            if chunk:
+                self._process(chunk, status, admin_id, reason, report)
+            if self.leaderboards is not None and status == 'approved':
+                self.leaderboards.maybe_flush()
+            elapsed = time.perf_counter() - started
+            report['elapsedSec'] = round(elapsed, 3)
+            report['perSec'] = round(report['processed'] / elapsed, 1) if elapsed else 0.0
+            logging.info(f"Withdrawal review finished: {report}")
+            return report
+
+    def _select(self, ids, limit, report):
+        if ids is None:
+            for count, row in enumerate(self.iter_pending()):
+                if limit is not None and count >= limit:
+                    return
+                yield row
+            return
+        for start in range(0, len(ids), CHUNK_SIZE):
+            wanted = ids[start:start + CHUNK_SIZE]
+            found = self.storage.get_documents('withdrawals', wanted)
+            for withdrawal_id in wanted:
+                data = found.get(withdrawal_id)
+                if data is None or data.get('status') != 'pending':
+                    report['skipped'] += 1
+                    continue
+                yield withdrawal_id, data
+
+    def _plan(self, read, ids, status, admin_id, reason):
+        # ট্রানজ্যাকশনের ভেতরে আবার পড়া: অন্য প্রসেস বা অ্যাডমিন এর মধ্যে প্রসেস করে থাকলে বাদ
+        current = read('withdrawals', ids)
+        rows = [(withdrawal_id, current[withdrawal_id]) for withdrawal_id in ids
+                if (current.get(withdrawal_id) or {}).get('status') == 'pending']
+        users = read('users', list({str(data['userId']) for _, data in rows}))
+        per_user = defaultdict(lambda: defaultdict(float))
+        writes, amount_total, orphaned = [], 0.0, 0
+        for withdrawal_id, data in rows:
+            update = {'status': status, 'processedAt': SERVER_TIMESTAMP, 'processedBy': admin_id}
+            if reason:
+                update['rejectReason'] = reason
+            writes.append(('update', 'withdrawals', withdrawal_id, update))
+            amount = float(data.get('amount', 0))
+            amount_total += amount
+            if str(data['userId']) not in users:
+                # মালিক মুছে গেছে: ফেরত দেওয়ার কেউ নেই, তাই refund বা লেজার ইভেন্টও নয়
+                logging.warning(f"Withdrawal {withdrawal_id} owner {data['userId']} no longer exists, no balance update")
+                orphaned += 1
+                continue
+            deltas = per_user[str(data['userId'])]
+            if status == 'approved':
+                deltas['totalWithdrawn'] += amount
+            else:
+                gems = data.get('requiredGems')
+                if gems is None:  # requiredGems রাখার আগের রিকোয়েস্ট
+                    gems = required_gems_for(data.get('method'), amount) or 0
+                deltas['balance'] += amount
+                deltas['gems'] += int(gems)
+                deltas['ledgerPending'] += 1
+                refund = {'balance': amount, 'gems': int(gems)}
+                writes.append(('set', *event_record(data['userId'], 'withdrawal_refund', refund, ref=withdrawal_id)))
+
+        week = current_week_key()
+        for user_id, deltas in per_user.items():
+            user = users[user_id]
+            update = {field: Increment(_as_number(field, value)) for field, value in deltas.items()}
+            if status == 'approved':
+                # সাপ্তাহিক বোর্ড: নতুন সপ্তাহে শূন্য থেকে শুরু
+                if user.get('weekKey') == week:
+                    update['weeklyWithdrawn'] = Increment(deltas['totalWithdrawn'])
+                else:
+                    update['weekKey'], update['weeklyWithdrawn'] = week, deltas['totalWithdrawn']
+            writes.append(('update', 'users', user_id, update))
+
+        return (rows, per_user, users, amount_total, orphaned), writes
+
+    def _process(self, chunk, status, admin_id, reason, report):
+        ids = [withdrawal_id for withdrawal_id, _ in chunk]
+        rows, per_user, users, amount, orphaned = self.storage.run_transaction(
+            lambda read: self._plan(read, ids, status, admin_id, reason), 'withdrawal_review')
+        report['commits'] += 1
+        report['processed'] += len(rows)
+        report['skipped'] += len(ids) - len(rows)
+        report['amount'] += amount
+        report['orphaned'] += orphaned
+        week = current_week_key()
+        for user_id, deltas in per_user.items():
+            self.on_user_change(user_id)
+            user = users[user_id]
+            if status == 'approved' and self.leaderboards is not None:
+                weekly = deltas['totalWithdrawn'] + (user.get('weeklyWithdrawn', 0) if user.get('weekKey') == week else 0)
+                self.leaderboards.record('withdrawn', user_id, user.get('username'),
+                                         user.get('totalWithdrawn', 0) + deltas['totalWithdrawn'])
+                self.leaderboards.record('weekly', user_id, user.get('username'), weekly)
+
+
+def _as_number(field, value):
+    # gems ও ইভেন্টের সংখ্যা পূর্ণসংখ্যা, টাকার অঙ্ক দশমিক
+    return int(value) if field in ('gems', 'ledgerPending') else float(value)
+
+
+def format_pending(rows, next_cursor):
+    if not rows:
+        return "✅ No pending withdrawals."
+    lines = [f"• {withdrawal_id} - {data.get('amount')} via {data.get('method')} "
+             f"to {data.get('account')} (user {data.get('userId')})" for withdrawal_id, data in rows]
+    if next_cursor:
+        lines.append(f"\nMore: /pending {next_cursor}")
+    return "\n".join(lines)
+
+
+def format_report(report):
+    return (f"✅ {report['action'].capitalize()} {report['processed']} withdrawals "
+            f"(total {round(report['amount'], 2)}) in {report['elapsedSec']}s - "
+            f"{report['perSec']}/s, {report['commits']} commits, {report['skipped']} skipped"
+            + (f", {report['orphaned']} with missing owners (no refund)." if report['orphaned'] else "."))